@@ -0,0 +1,3 @@
+"""画师资料管理器的核心库：数据库、图片、缩略图和Excel导入导出，不依赖Qt。
+
+界面见 main.py，命令行见 python -m artist_manager --help"""
@@ -0,0 +1,208 @@
+"""命令行批处理：python -m artist_manager <命令>
+
+进度和结果以JSON Lines输出到标准输出，每行一个事件，例如
+    {"command": "import", "event": "progress", "done": 5000, "total": 12000}
+    {"command": "import", "event": "done", "inserted": 12000, "elapsed": 3.2}
+出错时输出 "error" 事件并以非零状态退出，其他诊断信息输出到标准错误。每个命令使用独立的数据库连接（WAL），可以和界面或其他命令同时运行。
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+from .db import DatabaseManager
+from .image_store import get_image_store
+from .images import resolve_image_path, clean_temp_images, image_db_path
+from .settings import ensure_directories, IMAGE_DIR
+from .thumbs import get_thumbnail_cache, refresh_thumbnails, clean_legacy_thumbnails
+
+# gc只清理超过这个时间（秒）未修改的临时图片，界面中正在编辑、尚未保存的粘贴图片不受影响
+TEMP_IMAGE_MAX_AGE = 24 * 3600
+
+
+class ProgressReporter:
+    """输出JSON Lines事件，进度事件按时间间隔节流"""
+
+    def __init__(self, command, stream=None, interval=0.2):
+        self.command = command
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._last = 0.0
+
+    def emit(self, event, **fields):
+        record = {"command": self.command, "event": event, **fields}
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+    def progress(self, done, total):
+        now = time.perf_counter()
+        if done < total and now - self._last < self.interval:
+            return
+        self._last = now
+        self.emit("progress", done=done, total=total)
+
+    def done(self, **fields):
+        self.emit("done", elapsed=round(time.perf_counter() - self.started, 3), **fields)
+
+
+def cmd_import(db, args, reporter):
+    row_ids = db.import_from_excel(args.file, progress_callback=reporter.progress)
+    reporter.done(inserted=len(row_ids))
+
+
+def cmd_export(db, args, reporter):
+    count = db.export_to_file(args.file, args.search, args.sort, args.descending,
+                              progress_callback=reporter.progress)
+    reporter.done(exported=count, file=args.file)
+
+
+def cmd_scan(db, args, reporter):
+    report = db.scan_images(args.fix, reporter.progress)
+    for row_id, slot, path in report["missing"]:
+        reporter.emit("missing", row_id=row_id, slot=slot, path=path)
+    for row_id, slot, path in report["found"]:
+        reporter.emit("found", row_id=row_id, slot=slot, path=path)
+    for name in report["orphaned"]:
+        reporter.emit("orphaned", path=name)
+    # 写回找到的图片之后仍然没有任何图片的画师
+    without_images = db.get_artists_without_images()
+    for row in without_images:
+        reporter.emit("no_images", row_id=row[1], artist_id=row[2], common_name=row[3])
+    reporter.done(found=len(report["found"]), missing=len(report["missing"]), orphaned=len(report["orphaned"]),
+                  without_images=len(without_images), updated=report["updated"])
+
+
+def cmd_owners(db, args, reporter):
+    """列出使用指定图片文件的画师，图片目录中的文件可以只写文件名"""
+    count = 0
+    for path in args.paths:
+        for row in db.get_artists_by_image(image_db_path(path)):
+            reporter.emit("artist", path=path, row_id=row[1], artist_id=row[2], common_name=row[3])
+            count += 1
+    reporter.done(artists=count)
+
+
+def cmd_thumbs(db, args, reporter):
+    """为数据库引用的图片生成缩略图，多进程并行，已有最新缩略图的跳过（--force时重新生成）"""
+    def on_result(src, success):
+        if not success:
+            reporter.emit("failed", path=src)
+
+    paths = [resolve_image_path(path) for path in db.get_image_paths()]
+    generated, failed, _ = refresh_thumbnails(paths, args.workers, args.force, reporter.progress,
+                                              on_result=on_result)
+    reporter.done(generated=generated, failed=failed, **get_thumbnail_cache().stats())
+
+
+def cmd_dedup(db, args, reporter):
+    """把图片目录中已有的图片放入内容寻址存储，相同内容的文件替换为指向同一份数据的链接"""
+    store = get_image_store()
+    if store is None:
+        raise RuntimeError("需要先设置 ARTIST_MANAGER_IMAGE_STORE=content")
+    paths = db.get_image_paths()
+    hashes = {}
+    saved_bytes = 0
+    for done, path in enumerate(paths, 1):
+        src = resolve_image_path(path)
+        # 只处理图片目录中的文件，外部文件保持不动
+        if os.path.normcase(os.path.dirname(os.path.abspath(src))) == os.path.normcase(os.path.abspath(IMAGE_DIR)) \
+                and os.path.isfile(src):
+            st = os.stat(src)
+            digest, changed = store.store(src, src)
+            hashes[path] = digest
+            if changed and st.st_nlink == 1:
+                saved_bytes += st.st_size
+        reporter.progress(done, len(paths))
+    db.set_image_hashes(hashes)
+    reporter.done(images=len(hashes), saved_bytes=saved_bytes, **store.stats())
+
+
+def cmd_metadata(db, args, reporter):
+    """增量索引图片中的生成参数（只读取PNG文本块），--search 时列出参数匹配的图片"""
+    report = db.index_image_metadata(args.force, reporter.progress)
+    if args.search:
+        for artist_id, common_name, slot, path, generator, model, seed in db.find_images_by_metadata(args.search):
+            reporter.emit("match", artist_id=artist_id, common_name=common_name, slot=slot, path=path,
+                          generator=generator, model=model, seed=seed)
+    reporter.done(**report)
+
+
+def cmd_gc(db, args, reporter):
+    """清理一天前的临时图片、旧版缩略图、失效或超出预算的缩略图、不再引用的图片内容，并整理数据库"""
+    temp_images = clean_temp_images(older_than=time.time() - TEMP_IMAGE_MAX_AGE)
+    clean_legacy_thumbnails()
+    cache = get_thumbnail_cache()
+    stale = cache.validate()
+    evicted = cache.evict()
+    store = get_image_store()
+    if store is not None:
+        objects, object_bytes = store.gc(db.get_image_hashes())
+        reporter.emit("objects_removed", objects=objects, bytes=object_bytes)
+    db.cursor.execute("PRAGMA optimize")
+    db.cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    reporter.done(temp_images=temp_images, stale_thumbnails=len(stale), evicted_thumbnails=evicted,
+                  **cache.stats())
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="artist_manager", description="画师资料管理器批处理命令")
+    parser.add_argument("--db", help="数据库路径（默认为应用目录下的artists.db）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("import", help="从xlsx导入")
+    p.add_argument("file")
+    p.set_defaults(handler=cmd_import)
+
+    p = commands.add_parser("export", help="导出为xlsx/csv/jsonl/parquet（按扩展名）")
+    p.add_argument("file")
+    p.add_argument("--search", help="只导出搜索结果")
+    p.add_argument("--sort", choices=("marked",) + DatabaseManager.SEARCH_COLUMNS)
+    p.add_argument("--descending", action="store_true")
+    p.set_defaults(handler=cmd_export)
+
+    p = commands.add_parser("scan", help="按命名规则检查缺失的图片，并列出没有记录引用的图片和没有图片的画师")
+    p.add_argument("--fix", action="store_true", help="把找到的图片写回数据库")
+    p.set_defaults(handler=cmd_scan)
+
+    p = commands.add_parser("owners", help="查询使用指定图片文件的画师")
+    p.add_argument("paths", nargs="+", metavar="path")
+    p.set_defaults(handler=cmd_owners)
+
+    p = commands.add_parser("thumbs", help="多进程并行生成缺失或过期的缩略图")
+    p.add_argument("--workers", type=int, help="进程数（默认为CPU核心数）")
+    p.add_argument("--force", action="store_true", help="重新生成已有的缩略图")
+    p.set_defaults(handler=cmd_thumbs)
+
+    p = commands.add_parser("dedup", help="把已有图片转入内容寻址存储（需设置ARTIST_MANAGER_IMAGE_STORE=content）")
+    p.set_defaults(handler=cmd_dedup)
+
+    p = commands.add_parser("metadata", help="索引图片中的生成参数（提示词、模型、种子）")
+    p.add_argument("--search", help="列出生成参数匹配的图片，例如模型名")
+    p.add_argument("--force", action="store_true", help="重新读取全部图片")
+    p.set_defaults(handler=cmd_metadata)
+
+    p = commands.add_parser("gc", help="清理临时文件和缩略图缓存")
+    p.set_defaults(handler=cmd_gc)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    reporter = ProgressReporter(args.command)
+    ensure_directories()
+    db = None
+    try:
+        # 标准输出只留给事件，库中打印的诊断信息转到标准错误
+        with contextlib.redirect_stdout(sys.stderr):
+            db = DatabaseManager(args.db)
+            args.handler(db, args, reporter)
+    except Exception as e:
+        reporter.emit("error", message=str(e))
+        return 1
+    finally:
+        if db is not None:
+            db.conn.close()
+    return 0
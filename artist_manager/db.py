@@ -0,0 +1,967 @@
+"""SQLite存储：结构迁移、全文搜索、变更通知与批量导入导出"""
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from .excel import IMPORT_COLUMNS, EXPORT_FIELDS, read_excel_chunks, clean_import_chunk, open_export_writer
+from .images import split_image_paths, join_image_paths, image_file_info, image_content_hash, get_image_index, \
+    recover_image_transactions, resolve_image_path, image_db_path, ImageTransaction
+from .metadata import METADATA_FIELDS, read_generation_metadata
+from .settings import DATABASE_NAME
+from .tracing import trace_methods
+
+
+class ArtistChange:
+    """数据库变更通知：kind 为 insert/update/delete，row_ids 为受影响的行ID"""
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+
+    __slots__ = ("kind", "row_ids")
+
+    def __init__(self, kind, row_ids):
+        self.kind = kind
+        self.row_ids = list(row_ids)
+
+    def __repr__(self):
+        return f"ArtistChange({self.kind!r}, {len(self.row_ids)} rows)"
+
+
+def legacy_image_slots(artist_id, value):
+    """旧版本的图片字段会丢掉空位置，按 {画师ID}-{序号} 的文件名推断位置，其余依次填入空位"""
+    paths = value.split(';') if value else []
+    if "" in paths:
+        return split_image_paths(value)
+
+    slots = [None] * 3
+    rest = []
+    for path in paths:
+        prefix, sep, number = os.path.splitext(os.path.basename(path))[0].rpartition("-")
+        if sep and prefix == artist_id and number in ("1", "2", "3") and slots[int(number) - 1] is None:
+            slots[int(number) - 1] = path
+        else:
+            rest.append(path)
+    for path in rest:
+        if None in slots:
+            slots[slots.index(None)] = path
+    return slots
+
+
+def migrate_create_artists(cursor):
+    """版本1：画师表"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS artists (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        row_id TEXT UNIQUE,  -- 唯一行ID
+        artist_id TEXT,
+        common_name TEXT,
+        introduction TEXT,
+        image_paths TEXT,
+        notes TEXT,
+        marked BOOLEAN DEFAULT 0  -- 新增标记列
+    )
+    """)
+
+
+def migrate_artist_images(cursor):
+    """版本2：图片拆分到artist_images表（每个位置一行），画师ID加索引，并从旧字段回填"""
+    cursor.execute("""
+    CREATE TABLE artist_images (
+        artist_id INTEGER NOT NULL REFERENCES artists(id) ON DELETE CASCADE,
+        slot INTEGER NOT NULL CHECK (slot BETWEEN 1 AND 3),
+        path TEXT NOT NULL,
+        size INTEGER,
+        mtime INTEGER,  -- 纳秒
+        hash TEXT,
+        PRIMARY KEY (artist_id, slot)
+    )
+    """)
+    cursor.execute("CREATE INDEX idx_artist_images_path ON artist_images(path)")
+    cursor.execute("CREATE INDEX idx_artists_artist_id ON artists(artist_id)")
+
+    cursor.execute("SELECT id, artist_id, image_paths FROM artists WHERE image_paths IS NOT NULL AND image_paths != ''")
+    updates = []
+    images = []
+    for db_id, artist_id, value in cursor.fetchall():
+        slots = legacy_image_slots(artist_id, value)
+        updates.append((join_image_paths(slots), db_id))
+        for slot, path in enumerate(slots, 1):
+            if path:
+                images.append((db_id, slot, path, *image_file_info(path)))
+    cursor.executemany("UPDATE artists SET image_paths=? WHERE id=?", updates)
+    cursor.executemany("INSERT INTO artist_images (artist_id, slot, path, size, mtime) VALUES (?, ?, ?, ?, ?)",
+                       images)
+
+
+def migrate_sort_indexes(cursor):
+    """版本3：可排序的列加索引供键集分页使用，NULL统一为空串以保证 (列, id) 比较有效"""
+    for column in ("artist_id", "common_name", "introduction", "notes"):
+        cursor.execute(f"UPDATE artists SET {column} = '' WHERE {column} IS NULL")
+    cursor.execute("UPDATE artists SET marked = 0 WHERE marked IS NULL")
+    for column in ("common_name", "introduction", "notes", "marked"):
+        cursor.execute(f"CREATE INDEX idx_artists_{column} ON artists({column})")
+
+
+def migrate_image_transactions(cursor):
+    """版本4：与画师记录在同一事务中写入的图片事务ID，启动时据此判断未完成的图片事务前滚还是回滚"""
+    cursor.execute("CREATE TABLE image_transactions (id TEXT PRIMARY KEY)")
+
+
+def migrate_image_metadata(cursor):
+    """版本5：图片中的生成参数（见 metadata.py），按文件大小和修改时间增量更新"""
+    cursor.execute("""
+    CREATE TABLE image_metadata (
+        id INTEGER PRIMARY KEY,  -- 全文索引的rowid
+        path TEXT NOT NULL UNIQUE,  -- 与artist_images.path相同
+        size INTEGER,
+        mtime INTEGER,  -- 纳秒
+        generator TEXT,  -- a1111/comfyui/novelai/fooocus，没有生成参数时为NULL
+        prompt TEXT,
+        negative_prompt TEXT,
+        model TEXT,  -- 模型和LoRA，以"; "分隔
+        seed TEXT,
+        settings TEXT
+    )
+    """)
+
+
+# 数据库结构迁移，第N项把 user_version 从N-1升级到N，只能在末尾追加
+SCHEMA_MIGRATIONS = (
+    migrate_create_artists,
+    migrate_artist_images,
+    migrate_sort_indexes,
+    migrate_image_transactions,
+    migrate_image_metadata,
+)
+
+
+class OperationCancelled(Exception):
+    """操作被用户取消，在事务中抛出时整个事务回滚"""
+
+
+@trace_methods("db", exclude=("transaction", "image_transaction", "on_commit", "add_listener", "remove_listener",
+                               "notify_listeners"))
+class DatabaseManager:
+    SEARCH_COLUMNS = ("artist_id", "common_name", "introduction", "notes")
+    # 以这些前缀开头的搜索匹配图片的生成参数（模型、提示词、种子），结果为使用了这些图片的画师
+    METADATA_SEARCH_PREFIXES = ("参数:", "参数：")
+    METADATA_SEARCH_COLUMNS = ("model", "prompt", "seed")
+    # 生成参数索引：读取文件头的线程数，每批提交的图片数
+    METADATA_INDEX_WORKERS = 4
+    METADATA_BATCH_SIZE = 500
+
+    # 连接参数：WAL让读写互不阻塞，NORMAL在WAL下只在检查点时fsync
+    CONNECTION_PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA foreign_keys = ON",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA mmap_size = 268435456",  # 256MB
+        "PRAGMA cache_size = -32768",  # 32MB
+    )
+    CACHED_STATEMENTS = 256
+
+    def __init__(self, db_path=None, maintenance=True):
+        """maintenance为False时只打开连接（用于后台线程），不做建表和迁移。
+        临时图片的清理不在这里做，界面在窗口显示之后于后台执行，命令行由gc命令执行"""
+        # 自动提交模式，事务由 transaction() 显式控制
+        self.conn = sqlite3.connect(db_path or DATABASE_NAME, timeout=10, isolation_level=None,
+                                    cached_statements=self.CACHED_STATEMENTS)
+        for pragma in self.CONNECTION_PRAGMAS:
+            self.conn.execute(pragma)
+        self.cursor = self.conn.cursor()
+        self._listeners = []
+        self._transaction_depth = 0
+        self._pending_changes = []
+        self._commit_hooks = []
+        if maintenance:
+            self.create_table()
+            self.recover_image_transactions()
+        self.search_tokenizer = self.detect_search_tokenizer()
+        self.metadata_search_tokenizer = self.detect_search_tokenizer("image_metadata_fts")
+
+    def add_listener(self, callback):
+        """注册变更监听，callback(ArtistChange) 在每次写入提交后调用"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def notify_listeners(self, kind, row_ids):
+        """发出变更通知，事务进行中时推迟到提交之后"""
+        if not row_ids:
+            return
+        change = ArtistChange(kind, row_ids)
+        if self._transaction_depth:
+            self._pending_changes.append(change)
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(change)
+            except Exception as e:
+                print(f"变更通知失败: {e}")
+
+    @contextmanager
+    def transaction(self):
+        """写事务，可以嵌套，只有最外层在结束时提交一次；出现异常时整体回滚。
+
+        使用BEGIN IMMEDIATE提前获取写锁，避免读事务升级为写事务时发生冲突"""
+        if self._transaction_depth:
+            self._transaction_depth += 1
+            try:
+                yield self.cursor
+            finally:
+                self._transaction_depth -= 1
+            return
+
+        self.cursor.execute("BEGIN IMMEDIATE")
+        self._transaction_depth = 1
+        try:
+            yield self.cursor
+            self.cursor.execute("COMMIT")
+        except BaseException:
+            self._pending_changes = []
+            self._commit_hooks = []
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+        finally:
+            self._transaction_depth = 0
+
+        # 提交后的操作（例如替换图片文件）先于变更通知，界面收到通知时文件已经就位
+        hooks, self._commit_hooks = self._commit_hooks, []
+        for hook in hooks:
+            hook()
+        changes, self._pending_changes = self._pending_changes, []
+        for change in changes:
+            self.notify_listeners(change.kind, change.row_ids)
+
+    def on_commit(self, hook):
+        """当前事务提交后调用hook，不在事务中时立即调用；事务回滚时丢弃"""
+        if self._transaction_depth:
+            self._commit_hooks.append(hook)
+        else:
+            hook()
+
+    def create_table(self):
+        self.migrate()
+        self.create_search_index()
+        self.create_metadata_search_index()
+
+    def migrate(self):
+        """根据 PRAGMA user_version 执行未完成的迁移，所有迁移在同一个事务中完成，失败则整体回滚"""
+        version = self.cursor.execute("PRAGMA user_version").fetchone()[0]
+        pending = SCHEMA_MIGRATIONS[version:]
+        if not pending:
+            return
+
+        with self.transaction():
+            for version, migration in enumerate(pending, version + 1):
+                migration(self.cursor)
+            self.cursor.execute(f"PRAGMA user_version = {version}")
+
+    def create_search_index(self):
+        """创建全文索引（FTS5），由触发器与artists表保持同步"""
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name='artists_fts'")
+        if self.cursor.fetchone():
+            return
+
+        # trigram分词支持中文等无空格文本的子串匹配，旧版SQLite退回unicode61
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                self.cursor.execute(f"""
+                CREATE VIRTUAL TABLE artists_fts USING fts5(
+                    artist_id, common_name, introduction, notes,
+                    content='artists', content_rowid='id', tokenize='{tokenizer}'
+                )
+                """)
+                break
+            except sqlite3.OperationalError:
+                continue
+        else:
+            print("当前SQLite不支持FTS5，搜索将使用普通匹配")
+            return
+
+        self.cursor.executescript("""
+        CREATE TRIGGER IF NOT EXISTS artists_fts_ai AFTER INSERT ON artists BEGIN
+            INSERT INTO artists_fts(rowid, artist_id, common_name, introduction, notes)
+            VALUES (new.id, new.artist_id, new.common_name, new.introduction, new.notes);
+        END;
+        CREATE TRIGGER IF NOT EXISTS artists_fts_ad AFTER DELETE ON artists BEGIN
+            INSERT INTO artists_fts(artists_fts, rowid, artist_id, common_name, introduction, notes)
+            VALUES ('delete', old.id, old.artist_id, old.common_name, old.introduction, old.notes);
+        END;
+        CREATE TRIGGER IF NOT EXISTS artists_fts_au
+        AFTER UPDATE OF artist_id, common_name, introduction, notes ON artists BEGIN
+            INSERT INTO artists_fts(artists_fts, rowid, artist_id, common_name, introduction, notes)
+            VALUES ('delete', old.id, old.artist_id, old.common_name, old.introduction, old.notes);
+            INSERT INTO artists_fts(rowid, artist_id, common_name, introduction, notes)
+            VALUES (new.id, new.artist_id, new.common_name, new.introduction, new.notes);
+        END;
+        INSERT INTO artists_fts(artists_fts) VALUES ('rebuild');
+        """)
+        self.conn.commit()
+
+    def create_metadata_search_index(self):
+        """创建生成参数的全文索引，分词器与画师全文索引相同；不支持FTS5时搜索使用普通匹配"""
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name='image_metadata_fts'")
+        if self.cursor.fetchone():
+            return
+        tokenizer = self.detect_search_tokenizer()
+        if tokenizer is None:
+            return
+
+        self.cursor.executescript(f"""
+        CREATE VIRTUAL TABLE image_metadata_fts USING fts5(
+            model, prompt, seed, content='image_metadata', content_rowid='id', tokenize='{tokenizer}'
+        );
+        CREATE TRIGGER IF NOT EXISTS image_metadata_fts_ai AFTER INSERT ON image_metadata BEGIN
+            INSERT INTO image_metadata_fts(rowid, model, prompt, seed) VALUES (new.id, new.model, new.prompt, new.seed);
+        END;
+        CREATE TRIGGER IF NOT EXISTS image_metadata_fts_ad AFTER DELETE ON image_metadata BEGIN
+            INSERT INTO image_metadata_fts(image_metadata_fts, rowid, model, prompt, seed)
+            VALUES ('delete', old.id, old.model, old.prompt, old.seed);
+        END;
+        CREATE TRIGGER IF NOT EXISTS image_metadata_fts_au AFTER UPDATE OF model, prompt, seed ON image_metadata BEGIN
+            INSERT INTO image_metadata_fts(image_metadata_fts, rowid, model, prompt, seed)
+            VALUES ('delete', old.id, old.model, old.prompt, old.seed);
+            INSERT INTO image_metadata_fts(rowid, model, prompt, seed) VALUES (new.id, new.model, new.prompt, new.seed);
+        END;
+        INSERT INTO image_metadata_fts(image_metadata_fts) VALUES ('rebuild');
+        """)
+        self.conn.commit()
+
+    def detect_search_tokenizer(self, table="artists_fts"):
+        """返回全文索引使用的分词器，没有全文索引时返回None"""
+        self.cursor.execute("SELECT sql FROM sqlite_master WHERE name=?", (table,))
+        row = self.cursor.fetchone()
+        if not row:
+            return None
+        return "trigram" if "trigram" in row[0] else "unicode61"
+
+    @staticmethod
+    def split_search_terms(terms, tokenizer):
+        """把搜索词分为全文索引的MATCH表达式项和需要LIKE匹配的词"""
+        fts_terms = []
+        like_terms = []
+        for term in terms:
+            if tokenizer == "trigram" and len(term) >= 3:
+                fts_terms.append('"%s"' % term.replace('"', '""'))
+            elif tokenizer == "unicode61" and term.isascii():
+                fts_terms.append('"%s"*' % term.replace('"', '""'))
+            else:
+                # trigram至少需要3个字符，短词退回LIKE匹配
+                like_terms.append(term)
+        return fts_terms, like_terms
+
+    def metadata_search_text(self, text):
+        """搜索以生成参数前缀开头时返回去掉前缀的搜索词，否则返回None"""
+        stripped = text.lstrip()
+        for prefix in self.METADATA_SEARCH_PREFIXES:
+            if stripped.startswith(prefix):
+                return stripped[len(prefix):]
+        return None
+
+    def build_metadata_match(self, text):
+        """生成匹配生成参数的子查询，返回 (sql, params)，查询结果为图片路径；空搜索返回None"""
+        terms = text.split()
+        if not terms:
+            return None
+
+        fts_terms, like_terms = self.split_search_terms(terms, self.metadata_search_tokenizer)
+        params = []
+        if fts_terms:
+            sql = ("SELECT m.path FROM image_metadata_fts JOIN image_metadata m ON m.id = image_metadata_fts.rowid "
+                   "WHERE image_metadata_fts MATCH ?")
+            params.append(" ".join(fts_terms))
+        else:
+            sql = "SELECT m.path FROM image_metadata m WHERE 1"
+        for term in like_terms:
+            pattern = self.like_pattern(term)
+            columns = self.METADATA_SEARCH_COLUMNS
+            sql += " AND (" + " OR ".join(f"m.{col} LIKE ? ESCAPE '\\'" for col in columns) + ")"
+            params.extend([pattern] * len(columns))
+        return sql, params
+
+    def build_search_query(self, text, columns="a.id", order_by=None):
+        """生成搜索SQL，返回 (sql, params)，查询结果为按相关度排序的数据库ID；空搜索返回None。
+        columns 指定查询的列（表别名为a），order_by 不为空时代替相关度排序。
+        以"参数:"开头时搜索图片的生成参数，结果为使用了匹配图片的画师，按数据库顺序排列"""
+        metadata_text = self.metadata_search_text(text)
+        if metadata_text is not None:
+            match = self.build_metadata_match(metadata_text)
+            if match is None:
+                return None
+            sql = (f"SELECT {columns} FROM artists a WHERE a.id IN "
+                   f"(SELECT i.artist_id FROM artist_images i WHERE i.path IN ({match[0]})) "
+                   f"ORDER BY {order_by or 'a.id'}")
+            return sql, match[1]
+
+        terms = text.split()
+        if not terms:
+            return None
+
+        fts_terms, like_terms = self.split_search_terms(terms, self.search_tokenizer)
+        params = []
+        if fts_terms:
+            sql = (f"SELECT {columns} FROM artists_fts JOIN artists a ON a.id = artists_fts.rowid "
+                   "WHERE artists_fts MATCH ?")
+            params.append(" ".join(fts_terms))
+        else:
+            sql = f"SELECT {columns} FROM artists a WHERE 1"
+
+        for term in like_terms:
+            pattern = self.like_pattern(term)
+            sql += " AND (" + " OR ".join(f"a.{col} LIKE ? ESCAPE '\\'" for col in self.SEARCH_COLUMNS) + ")"
+            params.extend([pattern] * len(self.SEARCH_COLUMNS))
+
+        if order_by:
+            sql += " ORDER BY " + order_by
+        elif fts_terms:
+            # 画师ID和常用名的命中权重更高
+            sql += " ORDER BY bm25(artists_fts, 10.0, 8.0, 1.0, 1.0), a.id"
+        else:
+            pattern = self.like_pattern(like_terms[0])
+            sql += (" ORDER BY CASE WHEN a.artist_id LIKE ? ESCAPE '\\' OR a.common_name LIKE ? ESCAPE '\\' "
+                    "THEN 0 ELSE 1 END, a.id")
+            params.extend([pattern, pattern])
+        return sql, params
+
+    @staticmethod
+    def like_pattern(term):
+        """生成子串匹配的LIKE模式，转义通配符"""
+        return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+    def search_artist_ids(self, text, sort_field=None, descending=False):
+        """全文搜索，返回数据库ID列表；未指定排序列时按相关度排序"""
+        query = self.build_search_query(text, order_by=self.order_clause(sort_field, descending, "a."))
+        if query is None:
+            return None
+        self.cursor.execute(*query)
+        return [row[0] for row in self.cursor.fetchall()]
+
+    @staticmethod
+    def order_clause(sort_field, descending=False, prefix=""):
+        """按 (排序列, id) 排序的ORDER BY内容，与表格的排序键一致；未排序时返回None"""
+        if not sort_field:
+            return None
+        direction = " DESC" if descending else ""
+        return f"{prefix}{sort_field}{direction}, {prefix}id{direction}"
+
+    def build_export_query(self, search_text=None, sort_field=None, descending=False):
+        """生成导出SQL，返回 (sql, params)。搜索条件作为SQL谓词，顺序与表格显示一致"""
+        columns = ", ".join(f"a.{col}" for col in EXPORT_FIELDS)
+        order_by = self.order_clause(sort_field, descending, "a.")
+
+        query = self.build_search_query(search_text or "", columns=columns, order_by=order_by)
+        if query is None:
+            query = (f"SELECT {columns} FROM artists a ORDER BY {order_by or 'a.id'}", [])
+        return query
+
+    def export_rows(self, search_text=None, sort_field=None, descending=False, chunk_size=2000):
+        """按块流式读取导出数据，每次产出 (行列表, 总行数)"""
+        sql, params = self.build_export_query(search_text, sort_field, descending)
+        cursor = self.conn.cursor()
+        try:
+            total = cursor.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows, total
+        finally:
+            cursor.close()
+
+    def export_to_file(self, file_path, search_text=None, sort_field=None, descending=False,
+                       progress_callback=None, is_cancelled=None):
+        """流式导出到文件，格式由扩展名决定。返回导出的行数，取消时删除未完成的文件并返回None"""
+        writer = open_export_writer(file_path)
+        done = 0
+        completed = False
+        try:
+            for rows, total in self.export_rows(search_text, sort_field, descending):
+                if is_cancelled and is_cancelled():
+                    break
+                writer.write_rows(rows)
+                done += len(rows)
+                if progress_callback:
+                    progress_callback(done, total)
+            else:
+                completed = True
+        finally:
+            writer.close()
+            if not completed and os.path.exists(file_path):
+                os.remove(file_path)
+        return done if completed else None
+
+    def sync_artist_images(self, items, image_tx=None):
+        """按 [(数据库ID, 三个位置的路径)] 重写artist_images，调用方负责提交事务。
+        image_tx为尚未提交的图片事务时，文件信息取自其暂存文件；否则文件大小和修改时间没变的图片沿用已记录的
+        内容哈希（本进程不一定知道哈希，清空后内容寻址存储的gc会把仍在使用的对象当作无人引用）"""
+        items = list(items)
+        images = []
+        for db_id, paths in items:
+            recorded = {}
+            if image_tx is None:
+                self.cursor.execute("SELECT path, size, mtime, hash FROM artist_images WHERE artist_id=?", (db_id,))
+                recorded = {row[0]: row[1:] for row in self.cursor.fetchall()}
+            for slot, path in enumerate(paths, 1):
+                if not path:
+                    continue
+                if image_tx is not None:
+                    images.append((db_id, slot, path, *image_tx.file_info(path)))
+                    continue
+                info = image_file_info(path)
+                digest = image_content_hash(path)
+                if digest is None and path in recorded and recorded[path][:2] == info:
+                    digest = recorded[path][2]
+                images.append((db_id, slot, path, *info, digest))
+        self.cursor.executemany("DELETE FROM artist_images WHERE artist_id=?", [(db_id,) for db_id, _ in items])
+        self.cursor.executemany("""
+        INSERT INTO artist_images (artist_id, slot, path, size, mtime, hash) VALUES (?, ?, ?, ?, ?, ?)
+        """, images)
+
+    @contextmanager
+    def image_transaction(self, image_tx):
+        """在写事务中登记图片事务：数据库提交后再替换图片文件，写入失败时回滚图片"""
+        if image_tx is None:
+            with self.transaction():
+                yield
+            return
+        committed = False
+
+        def finish():
+            nonlocal committed
+            committed = True
+            self.finish_image_transaction(image_tx)
+
+        try:
+            with self.transaction():
+                self.cursor.execute("INSERT INTO image_transactions (id) VALUES (?)", (image_tx.id,))
+                self.on_commit(finish)
+                yield
+        except BaseException:
+            # 提交之后出现的异常不能回滚图片，数据库记录已经指向它们
+            if not committed:
+                image_tx.rollback()
+            raise
+
+    def finish_image_transaction(self, image_tx):
+        """数据库已提交，替换图片文件。失败时保留日志和事务ID，下次启动时重试"""
+        try:
+            image_tx.commit()
+        except Exception as e:
+            print(f"替换图片文件失败，将在下次启动时重试: {e}")
+            return
+        self.cursor.execute("DELETE FROM image_transactions WHERE id=?", (image_tx.id,))
+
+    def recover_image_transactions(self):
+        """处理崩溃或退出的进程留下的图片事务，其他进程中仍在进行的事务不受影响"""
+        committed = {row[0] for row in self.cursor.execute("SELECT id FROM image_transactions")}
+        finished = recover_image_transactions(committed)
+        if finished:
+            self.cursor.executemany("DELETE FROM image_transactions WHERE id=?", [(tx_id,) for tx_id in finished])
+
+    @staticmethod
+    def stage_images(images, artist_id):
+        """按画师ID暂存三个位置的源图片，返回 (图片字段, ImageTransaction)。
+        复制、比较和哈希图片都在调用线程（数据库线程）中进行，不阻塞界面"""
+        image_tx = ImageTransaction()
+        try:
+            return join_image_paths(image_tx.stage(images, artist_id)), image_tx
+        except BaseException:
+            image_tx.rollback()
+            raise
+
+    def add_artist(self, data, image_tx=None, images=None):
+        """新增画师，image_tx为暂存了图片的ImageTransaction时与记录一起提交；
+        images为三个位置的源图片路径时先暂存，结果代替data中的图片字段"""
+        if images is not None:
+            image_paths, image_tx = self.stage_images(images, data[1])
+            data = (*data[:4], image_paths, *data[5:])
+        with self.image_transaction(image_tx):
+            self.cursor.execute("""
+            INSERT INTO artists (row_id, artist_id, common_name, introduction, image_paths, notes, marked)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, data)
+            db_id = self.cursor.lastrowid
+            self.sync_artist_images([(db_id, split_image_paths(data[4]))], image_tx)
+            self.notify_listeners(ArtistChange.INSERT, [data[0]])
+        return db_id
+
+    def update_artist(self, row_id, data, image_tx=None, images=None):
+        """修改画师，image_tx、images同add_artist"""
+        if images is not None:
+            image_paths, image_tx = self.stage_images(images, data[0])
+            data = (*data[:3], image_paths, *data[4:])
+        with self.image_transaction(image_tx):
+            self.cursor.execute("""
+            UPDATE artists
+            SET artist_id=?, common_name=?, introduction=?, image_paths=?, notes=?, marked=?
+            WHERE row_id=?
+            """, (*data, row_id))
+            row = self.cursor.execute("SELECT id FROM artists WHERE row_id=?", (row_id,)).fetchone()
+            if row:
+                self.sync_artist_images([(row[0], split_image_paths(data[3]))], image_tx)
+            self.notify_listeners(ArtistChange.UPDATE, [row_id])
+
+    def set_marked(self, row_id, marked):
+        """更新标记状态"""
+        with self.transaction():
+            self.cursor.execute("UPDATE artists SET marked=? WHERE row_id=?", (1 if marked else 0, row_id))
+            self.notify_listeners(ArtistChange.UPDATE, [row_id])
+
+    def delete_artist(self, row_id):
+        with self.transaction():
+            self.cursor.execute("DELETE FROM artists WHERE row_id=?", (row_id,))
+            self.notify_listeners(ArtistChange.DELETE, [row_id])
+
+    def iter_all_artists(self, batch_size=2000):
+        """按批读取全部记录的生成器，用于分批返回给界面"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("""
+            SELECT id, row_id, artist_id, common_name, introduction, image_paths, notes, marked
+            FROM artists
+            ORDER BY id
+            """)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def get_artists_page(self, after=None, limit=200, sort_field=None, descending=False):
+        """键集分页：返回排在after之后的limit条记录。
+
+        after为上一页最后一条的排序键：未排序时为 (id,)，否则为 (排序列的值, id)；None表示第一页。
+        排序列都有索引（索引隐含按id排序），每页的开销与总行数无关"""
+        op = "<" if descending else ">"
+        params = []
+        where = ""
+        if after is not None:
+            if sort_field:
+                where = f"WHERE ({sort_field}, id) {op} (?, ?)"
+                params.extend(after)
+            else:
+                where = f"WHERE id {op} ?"
+                params.append(after[0])
+        order_by = self.order_clause(sort_field, descending) or ("id DESC" if descending else "id")
+        self.cursor.execute(f"""
+        SELECT id, row_id, artist_id, common_name, introduction, image_paths, notes, marked
+        FROM artists
+        {where}
+        ORDER BY {order_by}
+        LIMIT ?
+        """, (*params, limit))
+        return self.cursor.fetchall()
+
+    def get_artists_by_ids(self, db_ids, chunk_size=500):
+        """按数据库ID批量获取记录（不保证顺序）"""
+        rows = []
+        db_ids = list(db_ids)
+        for start in range(0, len(db_ids), chunk_size):
+            chunk = db_ids[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            self.cursor.execute(f"""
+            SELECT id, row_id, artist_id, common_name, introduction, image_paths, notes, marked
+            FROM artists
+            WHERE id IN ({placeholders})
+            """, chunk)
+            rows.extend(self.cursor.fetchall())
+        return rows
+
+    def get_artist_with_neighbors(self, db_id):
+        """返回 (记录, 上一个ID, 下一个ID)，编辑对话框一次取齐"""
+        return self.get_artist_by_id(db_id), self.get_prev_artist_id(db_id), self.get_next_artist_id(db_id)
+
+    def get_all_artists(self):
+        self.cursor.execute("""
+        SELECT id, row_id, artist_id, common_name, introduction, image_paths, notes, marked
+        FROM artists
+        ORDER BY id
+        """)
+        return self.cursor.fetchall()
+
+    def get_artists_by_row_ids(self, row_ids, chunk_size=500):
+        """按行ID批量获取记录，按数据库ID排序"""
+        rows = []
+        row_ids = list(row_ids)
+        for start in range(0, len(row_ids), chunk_size):
+            chunk = row_ids[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            self.cursor.execute(f"""
+            SELECT id, row_id, artist_id, common_name, introduction, image_paths, notes, marked
+            FROM artists
+            WHERE row_id IN ({placeholders})
+            """, chunk)
+            rows.extend(self.cursor.fetchall())
+        rows.sort(key=lambda row: row[0])
+        return rows
+
+    def get_image_paths(self):
+        """数据库中引用的全部图片路径（去重）"""
+        self.cursor.execute("SELECT DISTINCT path FROM artist_images")
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def get_image_hashes(self):
+        """内容寻址存储中仍被引用的内容哈希"""
+        self.cursor.execute("SELECT DISTINCT hash FROM artist_images WHERE hash IS NOT NULL")
+        return {row[0] for row in self.cursor.fetchall()}
+
+    def set_image_hashes(self, hashes):
+        """按 {图片路径: 内容哈希} 更新artist_images的哈希和文件信息，不影响画师记录"""
+        with self.transaction():
+            self.cursor.executemany("UPDATE artist_images SET hash=?, size=?, mtime=? WHERE path=?",
+                                    [(digest, *image_file_info(path), path) for path, digest in hashes.items()])
+
+    def get_artists_by_image(self, path):
+        """查询使用某个图片文件的画师（走path索引）"""
+        self.cursor.execute("""
+        SELECT a.id, a.row_id, a.artist_id, a.common_name, a.introduction, a.image_paths, a.notes, a.marked
+        FROM artist_images i JOIN artists a ON a.id = i.artist_id
+        WHERE i.path = ?
+        ORDER BY a.id
+        """, (path,))
+        return self.cursor.fetchall()
+
+    def get_artists_without_images(self):
+        """查询没有任何图片的画师"""
+        self.cursor.execute("""
+        SELECT id, row_id, artist_id, common_name, introduction, image_paths, notes, marked
+        FROM artists a
+        WHERE NOT EXISTS (SELECT 1 FROM artist_images i WHERE i.artist_id = a.id)
+        ORDER BY id
+        """)
+        return self.cursor.fetchall()
+
+    def get_artist_by_id(self, db_id):
+        """根据数据库ID获取艺术家记录"""
+        self.cursor.execute("""
+        SELECT id, row_id, artist_id, common_name, introduction, image_paths, notes, marked
+        FROM artists
+        WHERE id = ?
+        """, (db_id,))
+        return self.cursor.fetchone()
+
+    def get_prev_artist_id(self, current_id):
+        """获取前一个记录的ID"""
+        self.cursor.execute("""
+        SELECT id FROM artists 
+        WHERE id < ? 
+        ORDER BY id DESC 
+        LIMIT 1
+        """, (current_id,))
+        result = self.cursor.fetchone()
+        return result[0] if result else None
+
+    def get_next_artist_id(self, current_id):
+        """获取下一个记录的ID"""
+        self.cursor.execute("""
+        SELECT id FROM artists 
+        WHERE id > ? 
+        ORDER BY id ASC 
+        LIMIT 1
+        """, (current_id,))
+        result = self.cursor.fetchone()
+        return result[0] if result else None
+
+    def find_image_repairs(self, image_index, progress_callback=None, is_cancelled=None):
+        """按命名规则检查全部记录的图片。
+        返回 (可修复 [(row_id, 位置, 找到的图片)], 仍缺失 [(row_id, 位置, 原路径)])，位置从1开始。
+        is_cancelled() 返回True时抛出OperationCancelled"""
+        found = []
+        missing = []
+        total = self.cursor.execute("SELECT COUNT(*) FROM artists").fetchone()[0] if progress_callback else 0
+        done = 0
+        for rows in self.iter_all_artists():
+            if is_cancelled and is_cancelled():
+                raise OperationCancelled()
+            done += len(rows)
+            if progress_callback:
+                progress_callback(done, total)
+            for row in rows:
+                row_id, artist_id = row[1], row[2]
+                for slot, path in enumerate(split_image_paths(row[5]), 1):
+                    if path and image_index.exists(path):
+                        continue
+                    candidate = image_index.find(artist_id, slot)
+                    if candidate:
+                        found.append((row_id, slot, candidate))
+                    elif path:
+                        missing.append((row_id, slot, path))
+        return found, missing
+
+    def repair_image_paths(self, repairs):
+        """把 [(row_id, 位置, 路径)] 写回图片字段和artist_images，在一个事务内完成，返回更新的记录数"""
+        by_row = {}
+        for row_id, slot, path in repairs:
+            by_row.setdefault(row_id, {})[slot] = path
+        if not by_row:
+            return 0
+
+        with self.transaction():
+            items = []
+            for row in self.get_artists_by_row_ids(by_row):
+                slots = split_image_paths(row[5])
+                for slot, path in by_row[row[1]].items():
+                    slots[slot - 1] = path
+                self.cursor.execute("UPDATE artists SET image_paths=? WHERE id=?", (join_image_paths(slots), row[0]))
+                items.append((row[0], slots))
+            self.sync_artist_images(items)
+            self.notify_listeners(ArtistChange.UPDATE, list(by_row))
+        return len(items)
+
+    def scan_images(self, fix=True, progress_callback=None, is_cancelled=None):
+        """检查全部记录的图片，fix为True时把按命名规则找到的图片在一个事务内写回数据库。
+
+        返回报告字典：found/missing 同find_image_repairs，orphaned 为图片目录中没有任何记录引用的文件名，
+        updated 为更新的记录数。取消时返回None，不写入任何数据"""
+        image_index = get_image_index()
+        try:
+            found, missing = self.find_image_repairs(image_index, progress_callback, is_cancelled)
+        except OperationCancelled:
+            return None
+        updated = self.repair_image_paths(found) if fix else 0
+        referenced = self.get_image_paths() + [path for _, _, path in found]
+        return {
+            "found": found,
+            "missing": missing,
+            "orphaned": image_index.unreferenced(referenced),
+            "updated": updated,
+        }
+
+    def index_image_metadata(self, force=False, progress_callback=None, is_cancelled=None):
+        """增量索引数据库引用的图片中的生成参数：只读取新增或大小、修改时间有变化的图片的文件头（force时全部重新读取），
+        并删除已不再引用或已缺失的图片的索引。文件在线程池中读取，每批结果单独提交，取消时已完成的批次保留。
+
+        返回 {"indexed": 读取的图片数, "with_metadata": 其中含生成参数的数量, "unchanged": 未变化数, "removed": 删除数}，
+        取消时返回None。
+
+        导入时不逐个stat图片，artist_images中大小和修改时间为空的记录顺便用这里的结果补齐"""
+        known = {path: (size, mtime) for path, size, mtime in
+                 self.cursor.execute("SELECT path, size, mtime FROM image_metadata")}
+        unfilled = {row[0] for row in self.cursor.execute("SELECT DISTINCT path FROM artist_images WHERE size IS NULL")}
+        pending = []
+        current = set()
+        filled = []
+        for path in self.get_image_paths():
+            info = image_file_info(path)
+            if info[0] is None:
+                continue
+            current.add(path)
+            if path in unfilled:
+                filled.append((*info, path))
+            if force or known.get(path) != info:
+                pending.append((path, *info))
+        removed = [path for path in known if path not in current]
+        if removed or filled:
+            with self.transaction():
+                self.cursor.executemany("DELETE FROM image_metadata WHERE path=?", [(path,) for path in removed])
+                self.cursor.executemany("UPDATE artist_images SET size=?, mtime=? WHERE path=? AND size IS NULL",
+                                        filled)
+
+        total = len(pending)
+        with_metadata = 0
+        if progress_callback:
+            progress_callback(0, total)
+        with ThreadPoolExecutor(max_workers=self.METADATA_INDEX_WORKERS, thread_name_prefix="metadata-index") as pool:
+            for start in range(0, total, self.METADATA_BATCH_SIZE):
+                if is_cancelled and is_cancelled():
+                    return None
+                batch = pending[start:start + self.METADATA_BATCH_SIZE]
+                rows = []
+                for (path, size, mtime), metadata in zip(batch, pool.map(
+                        lambda item: read_generation_metadata(resolve_image_path(item[0])), batch)):
+                    metadata = metadata or {}
+                    with_metadata += bool(metadata)
+                    rows.append((path, size, mtime, *(metadata.get(field) for field in METADATA_FIELDS)))
+                with self.transaction():
+                    self.cursor.executemany(f"""
+                    INSERT INTO image_metadata (path, size, mtime, {", ".join(METADATA_FIELDS)})
+                    VALUES (?, ?, ?, {", ".join("?" * len(METADATA_FIELDS))})
+                    ON CONFLICT(path) DO UPDATE SET size=excluded.size, mtime=excluded.mtime,
+                    {", ".join(f"{field}=excluded.{field}" for field in METADATA_FIELDS)}
+                    """, rows)
+                if progress_callback:
+                    progress_callback(start + len(batch), total)
+        return {"indexed": total, "with_metadata": with_metadata, "unchanged": len(current) - total,
+                "removed": len(removed)}
+
+    def get_image_metadata(self, paths):
+        """返回每张图片的生成参数字典（字段见METADATA_FIELDS，没有时为None）。
+        索引中的记录仍是最新时直接使用，否则读取文件头（不写入索引，例如编辑时粘贴的临时图片）"""
+        result = []
+        for path in paths:
+            if not path:
+                result.append(None)
+                continue
+            row = self.cursor.execute(f"""
+            SELECT size, mtime, {", ".join(METADATA_FIELDS)} FROM image_metadata WHERE path=?
+            """, (image_db_path(path),)).fetchone()
+            if row is not None and row[:2] == image_file_info(path):
+                result.append(dict(zip(METADATA_FIELDS, row[2:])) if row[2] else None)
+            else:
+                result.append(read_generation_metadata(resolve_image_path(path)))
+        return result
+
+    def find_images_by_metadata(self, text):
+        """按生成参数搜索图片，返回 [(画师ID, 常用名, 位置, 图片路径, 生成工具, 模型, 种子)]"""
+        match = self.build_metadata_match(text)
+        if match is None:
+            return []
+        self.cursor.execute(f"""
+        SELECT a.artist_id, a.common_name, i.slot, i.path, m.generator, m.model, m.seed
+        FROM artist_images i
+        JOIN artists a ON a.id = i.artist_id
+        JOIN image_metadata m ON m.path = i.path
+        WHERE i.path IN ({match[0]})
+        ORDER BY a.id, i.slot
+        """, match[1])
+        return self.cursor.fetchall()
+
+    def import_from_excel(self, file_path, progress_callback=None, is_cancelled=None):
+        """从Excel文件导入数据。
+
+        流式读取 -> 按列清洗 -> 基于一次目录列表匹配图片 -> 单个事务内executemany批量写入。
+        progress_callback(已处理行数, 总行数) 用于报告进度，is_cancelled() 返回True时回滚。
+        返回新插入的row_id列表，取消或没有数据时返回空列表；读取或写入出错时回滚并抛出异常。
+        """
+        inserted = []
+        try:
+            image_index = get_image_index()
+            done = 0
+            with self.transaction():
+                for chunk, total in read_excel_chunks(file_path, IMPORT_COLUMNS):
+                    if is_cancelled and is_cancelled():
+                        raise OperationCancelled()
+
+                    records = clean_import_chunk(chunk, image_index)
+                    self.cursor.executemany("""
+                    INSERT INTO artists (row_id, artist_id, common_name, introduction, image_paths, notes, marked)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, records)
+                    # 图片来自目录索引，不逐个stat；大小和修改时间由后台的生成参数索引补齐
+                    images = [(slot, path, record[0])
+                              for record in records if record[4]
+                              for slot, path in enumerate(split_image_paths(record[4]), 1) if path]
+                    self.cursor.executemany("""
+                    INSERT INTO artist_images (artist_id, slot, path)
+                    SELECT id, ?, ? FROM artists WHERE row_id = ?
+                    """, images)
+                    inserted.extend(record[0] for record in records)
+
+                    done += len(chunk)
+                    if progress_callback:
+                        progress_callback(done, max(total, done))
+
+                self.notify_listeners(ArtistChange.INSERT, inserted)
+        except OperationCancelled:
+            return []
+
+        return inserted
@@ -0,0 +1,167 @@
+"""Excel导入清洗与多格式导出（xlsx、CSV、JSON Lines、Parquet）"""
+import csv
+import json
+import os
+import uuid
+
+# pandas和openpyxl导入较慢（合计约0.5秒），只在第一次导入导出时加载
+
+
+# Excel导入导出使用的列
+IMPORT_COLUMNS = ['画师ID', '常用名', '简介', '备注', '标记']
+
+
+def read_excel_chunks(file_path, columns, chunk_size=5000):
+    """以只读模式流式读取xlsx第一个工作表，每次产出 (DataFrame, 预计总行数)。
+    整个工作簿不会同时载入内存"""
+    import openpyxl
+    import pandas as pd
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(name).strip() if name is not None else "" for name in header]
+        missing = [col for col in columns if col not in header]
+        if missing:
+            raise ValueError(f"缺少列: {', '.join(missing)}")
+        positions = [header.index(col) for col in columns]
+        total = max((sheet.max_row or 1) - 1, 0)
+
+        buffer = []
+        for row in rows:
+            buffer.append([row[i] if i < len(row) else None for i in positions])
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=columns), total
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns), total
+    finally:
+        workbook.close()
+
+
+def match_image_columns(artist_ids, image_index):
+    """按命名规则 {画师ID}-{序号}.{扩展名} 为整列画师ID匹配图片，返回三个位置的Series"""
+    keys = artist_ids.map(os.path.normcase)
+    return [keys.map(image_index.slot_map(i)).astype(object) for i in range(1, 4)]
+
+
+def clean_import_chunk(df, image_index):
+    """按列清洗一批导入数据，返回可直接executemany的记录列表"""
+    df = df.dropna(how="all")
+    if df.empty:
+        return []
+
+    text = {}
+    for col in ('画师ID', '常用名', '简介', '备注'):
+        text[col] = df[col].astype(object).where(df[col].notna(), "").astype(str)
+    marked = (df['标记'].notna() & df['标记'].astype(bool)).astype(int)
+
+    slots = match_image_columns(text['画师ID'], image_index)
+    image_paths = slots[0].fillna("") + ";" + slots[1].fillna("") + ";" + slots[2].fillna("")
+    image_paths = image_paths.str.rstrip(";")
+
+    row_ids = [str(uuid.uuid4()) for _ in range(len(df))]
+    return list(zip(row_ids, text['画师ID'], text['常用名'], text['简介'], image_paths,
+                    text['备注'], marked.tolist()))
+
+
+# 导出的数据库列，与 IMPORT_COLUMNS 一一对应，导出的文件可以直接再导入
+EXPORT_FIELDS = ("artist_id", "common_name", "introduction", "notes", "marked")
+
+
+def export_record(row):
+    """数据库行转换为导出值，标记列输出为布尔值"""
+    return row[0], row[1], row[2], row[3], bool(row[4])
+
+
+class XlsxExportWriter:
+    """openpyxl只写模式，行数据不会在内存中堆积"""
+
+    def __init__(self, path):
+        import openpyxl
+
+        self.path = path
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(IMPORT_COLUMNS)
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.sheet.append(export_record(row))
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class CsvExportWriter:
+    """CSV带BOM，Excel可以直接正确识别中文"""
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8-sig")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(IMPORT_COLUMNS)
+
+    def write_rows(self, rows):
+        self.writer.writerows(export_record(row) for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlExportWriter:
+    """每行一个JSON对象"""
+
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(dict(zip(IMPORT_COLUMNS, export_record(row))), ensure_ascii=False))
+            self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExportWriter:
+    """按块写入Parquet行组，需要安装pyarrow"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("导出Parquet需要安装pyarrow")
+        self.pa = pyarrow
+        self.schema = pyarrow.schema([(name, pyarrow.string()) for name in IMPORT_COLUMNS[:4]]
+                                     + [(IMPORT_COLUMNS[4], pyarrow.bool_())])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_rows(self, rows):
+        columns = list(zip(*(export_record(row) for row in rows)))
+        arrays = [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORT_WRITERS = {
+    ".xlsx": XlsxExportWriter,
+    ".csv": CsvExportWriter,
+    ".jsonl": JsonlExportWriter,
+    ".parquet": ParquetExportWriter,
+}
+
+
+def open_export_writer(path):
+    """根据扩展名创建导出写入器"""
+    ext = os.path.splitext(path)[1].lower()
+    writer_class = EXPORT_WRITERS.get(ext)
+    if writer_class is None:
+        raise ValueError(f"不支持的导出格式: {ext}")
+    return writer_class(path)
@@ -0,0 +1,193 @@
+"""按内容寻址的图片存储（可选，ARTIST_MANAGER_IMAGE_STORE=content 时启用）。
+
+图片内容只在 图片目录/.objects/<哈希前两位>/<sha256>.<扩展名> 保存一份，相同的图片被多个画师使用时不再重复占用空间；
+图片目录中仍保留 {画师ID}-{序号}.{扩展名} 文件（硬链接，不支持时依次退回到符号链接、复制），
+数据库和直接浏览文件夹的用户看到的路径不变，artist_images.hash 记录每个位置对应的内容哈希。
+"""
+import hashlib
+import os
+import shutil
+import threading
+
+from .settings import IMAGE_DIR, IMAGE_STORE
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentImageStore:
+    """对象文件按内容哈希命名，图片目录中的文件是指向对象的链接"""
+    OBJECT_DIR_NAME = ".objects"
+
+    def __init__(self, image_dir):
+        self.image_dir = image_dir
+        self.object_dir = os.path.join(image_dir, self.OBJECT_DIR_NAME)
+        self._lock = threading.Lock()
+        self._hashes = {}  # (设备, inode, 大小, 修改时间) -> 哈希，避免重复计算
+
+    def _owns(self, path):
+        folder = os.path.normcase(os.path.dirname(os.path.abspath(path)))
+        return folder == os.path.normcase(os.path.abspath(self.image_dir))
+
+    def object_path(self, digest, ext):
+        return os.path.join(self.object_dir, digest[:2], digest + ext.lower())
+
+    @staticmethod
+    def _file_key(path):
+        st = os.stat(path)
+        return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _remember(self, path, digest):
+        with self._lock:
+            self._hashes[self._file_key(path)] = digest
+
+    def linked_object(self, path):
+        """path是指向存储中对象的符号链接时返回对象的哈希，否则返回None"""
+        if not os.path.islink(path):
+            return None
+        target = os.path.realpath(path)
+        if os.path.normcase(os.path.dirname(os.path.dirname(target))) != \
+                os.path.normcase(os.path.realpath(self.object_dir)):
+            return None
+        return os.path.splitext(os.path.basename(target))[0]
+
+    def hash_of(self, path, compute=True):
+        """文件内容的sha256，compute为False时只查已知的结果和符号链接指向的对象（没有时返回None）"""
+        try:
+            key = self._file_key(path)
+        except OSError:
+            return None
+        with self._lock:
+            digest = self._hashes.get(key)
+        if digest is None:
+            digest = self.linked_object(path)
+        if digest is None and compute:
+            digest = file_sha256(path)
+            with self._lock:
+                self._hashes[key] = digest
+        return digest
+
+    def add(self, src_path):
+        """把文件内容放入存储，返回 (哈希, 对象路径)。相同内容已存在时不再写入"""
+        digest = self.hash_of(src_path)
+        obj = self.object_path(digest, os.path.splitext(src_path)[1])
+        if os.path.exists(obj):
+            self._remember(obj, digest)
+            return digest, obj
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        tmp = f"{obj}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # 图片目录中的文件（例如粘贴的临时图片）直接硬链接，不复制数据；
+        # 外部文件必须复制，否则用户修改原文件会改变存储中的内容
+        linked = False
+        if self._owns(src_path):
+            try:
+                os.link(src_path, tmp)
+                linked = True
+            except OSError:
+                pass
+        if not linked:
+            shutil.copy2(src_path, tmp)
+        os.replace(tmp, obj)
+        self._remember(obj, digest)
+        return digest, obj
+
+    def link(self, obj, dest_path):
+        """让dest_path指向对象：硬链接，失败时用符号链接，再失败时复制。dest_path已经是该对象时不做任何事"""
+        try:
+            if os.path.samefile(obj, dest_path):
+                return False
+        except OSError:
+            pass
+        tmp = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(obj, tmp)
+        except OSError:
+            try:
+                os.symlink(os.path.relpath(obj, os.path.dirname(dest_path)), tmp)
+            except OSError:
+                shutil.copy2(obj, tmp)
+        # 原子替换，不会出现文件缺失的中间状态
+        os.replace(tmp, dest_path)
+        return True
+
+    def store(self, src_path, dest_path):
+        """把src_path的内容以dest_path的名字放入图片目录，返回 (哈希, dest_path是否有变化)"""
+        digest, obj = self.add(src_path)
+        changed = self.link(obj, dest_path)
+        self._remember(dest_path, digest)
+        return digest, changed
+
+    def _scan(self):
+        if not os.path.isdir(self.object_dir):
+            return
+        for prefix in os.scandir(self.object_dir):
+            if prefix.is_dir():
+                yield from os.scandir(prefix.path)
+
+    def iter_objects(self):
+        """遍历全部对象，产生 (哈希, 对象路径, stat结果)"""
+        for entry in self._scan():
+            if not entry.name.endswith(".tmp"):
+                yield os.path.splitext(entry.name)[0], entry.path, entry.stat()
+
+    def _symlink_targets(self):
+        """图片目录中符号链接指向的文件（规范化的真实路径）"""
+        targets = set()
+        try:
+            entries = list(os.scandir(self.image_dir))
+        except OSError:
+            return targets
+        for entry in entries:
+            if entry.is_symlink():
+                targets.add(os.path.normcase(os.path.realpath(entry.path)))
+        return targets
+
+    def gc(self, referenced_hashes):
+        """删除数据库未引用、且图片目录中也没有硬链接或符号链接指向的对象，以及中断时残留的临时文件。
+        返回 (删除数量, 释放字节数)"""
+        removed = freed = 0
+        linked = self._symlink_targets()
+        for entry in list(self._scan()):
+            try:
+                st = entry.stat()
+                is_object = not entry.name.endswith(".tmp")
+                if is_object and (os.path.splitext(entry.name)[0] in referenced_hashes or st.st_nlink > 1
+                                  or os.path.normcase(os.path.realpath(entry.path)) in linked):
+                    continue
+                os.remove(entry.path)
+            except OSError:
+                continue
+            if is_object:
+                removed += 1
+                freed += st.st_size
+        return removed, freed
+
+    def stats(self):
+        objects = total = 0
+        for _, _, st in self.iter_objects():
+            objects += 1
+            total += st.st_size
+        return {"objects": objects, "object_bytes": total}
+
+
+_image_store = None
+_image_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """启用内容寻址存储时返回全局共享的ContentImageStore，否则返回None"""
+    global _image_store
+    if IMAGE_STORE != "content":
+        return None
+    if _image_store is None:
+        with _image_store_lock:
+            if _image_store is None:
+                _image_store = ContentImageStore(IMAGE_DIR)
+    return _image_store
@@ -0,0 +1,480 @@
+"""图片路径、命名规则与图片目录索引。
+
+图片保存在图片目录中，按 {画师ID}-{序号}.{扩展名} 命名，数据库中保存相对图片目录的路径"""
+import filecmp
+import glob
+import json
+import os
+import shutil
+import threading
+import uuid
+
+from .image_store import get_image_store
+from .locking import lock_file
+from .settings import IMAGE_DIR, PASTE_FORMAT, PASTE_QUALITY
+from .thumbs import get_thumbnail_cache
+from .tracing import traced
+
+
+def resolve_image_path(path):
+    """将数据库中保存的图片路径转换为绝对路径（相对路径基于图片目录）"""
+    if not path:
+        return None
+    if not os.path.isabs(path):
+        return os.path.join(IMAGE_DIR, path)
+    return path
+
+
+def image_db_path(path):
+    """图片目录中的文件转换为数据库中保存的相对路径（文件名），其他路径原样返回"""
+    if not path:
+        return path
+    folder, name = os.path.split(resolve_image_path(path))
+    if os.path.normcase(os.path.normpath(folder)) == os.path.normcase(os.path.normpath(IMAGE_DIR)):
+        return name
+    return path
+
+
+def split_image_paths(value):
+    """数据库中的图片路径字段转换为三个位置的列表，空位置为None"""
+    paths = value.split(';') if value else []
+    return [path or None for path in (paths + [None] * 3)[:3]]
+
+
+def join_image_paths(paths):
+    """三个位置的图片路径转换为数据库字段，空位置保留为空串，保证位置不错乱"""
+    return ";".join(path or "" for path in list(paths)[:3]).rstrip(";")
+
+
+def image_file_info(path):
+    """返回图片文件的 (大小, 修改时间ns)，文件不存在时返回 (None, None)"""
+    try:
+        st = os.stat(resolve_image_path(path))
+        return st.st_size, st.st_mtime_ns
+    except (OSError, TypeError):
+        return None, None
+
+
+def image_content_hash(path):
+    """启用内容寻址存储时返回已知的图片内容哈希（本进程计算过的，或符号链接指向的对象），不读取文件内容，
+    未知或未启用时返回None"""
+    store = get_image_store()
+    if store is None or not path:
+        return None
+    return store.hash_of(resolve_image_path(path), compute=False)
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')  # 按匹配优先级排列
+# 粘贴图片的保存格式 -> (Pillow格式名, 扩展名, 默认质量参数)
+PASTE_FORMATS = {
+    "png": ("PNG", ".png", 6),
+    "webp": ("WEBP", ".webp", 80),
+    "jpeg": ("JPEG", ".jpg", 95),
+}
+
+
+class ImageDirectoryIndex:
+    """图片目录的内存索引：一次scandir列出目录，按 (画师ID, 序号) 查找 {画师ID}-{序号}.{扩展名}。
+
+    目录的mtime变化时（增删文件）下次访问自动重建，检查只需一次stat"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._names = set()
+        self._slots = {}
+        self._images = []  # 目录中全部图片的文件名
+
+    @traced("ImageDirectoryIndex.scan", "fs")
+    def _scan(self):
+        names = set()
+        slots = {}
+        images = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                name = entry.name
+                key = os.path.normcase(name)
+                names.add(key)
+                stem, ext = os.path.splitext(key)
+                if ext not in IMAGE_EXTENSIONS:
+                    continue
+                images.append(name)
+                artist_id, sep, slot = stem.rpartition("-")
+                if not sep or slot not in ("1", "2", "3"):
+                    continue
+                slot_key = (artist_id, int(slot))
+                current = slots.get(slot_key)
+                if current is None or \
+                        IMAGE_EXTENSIONS.index(ext) < IMAGE_EXTENSIONS.index(os.path.splitext(current)[1].lower()):
+                    slots[slot_key] = name
+        return names, slots, images
+
+    def refresh(self, force=False):
+        """目录有变化（或force）时重新列出目录"""
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            if not force and mtime is not None and mtime == self._mtime:
+                return
+            try:
+                self._names, self._slots, self._images = self._scan()
+            except OSError as e:
+                print(f"扫描图片目录失败: {e}")
+                self._names, self._slots, self._images = set(), {}, []
+            self._mtime = mtime
+
+    def find(self, artist_id, slot):
+        """返回 {画师ID}-{序号} 对应的图片文件名（相对图片目录），不存在返回None"""
+        if not artist_id:
+            return None
+        return self._slots.get((os.path.normcase(artist_id), slot))
+
+    def find_all(self, artist_id):
+        """返回三个位置的图片文件名列表，缺失的位置为None"""
+        return [self.find(artist_id, i) for i in range(1, 4)]
+
+    def slot_map(self, slot):
+        """某个位置的 {规范化画师ID: 文件名} 字典，供批量匹配使用"""
+        return {artist_id: name for (artist_id, i), name in self._slots.items() if i == slot}
+
+    def exists(self, path):
+        """判断图片是否存在，图片目录内的文件直接查索引"""
+        abs_path = resolve_image_path(path)
+        if not abs_path:
+            return False
+        folder, name = os.path.split(abs_path)
+        if os.path.normcase(os.path.normpath(folder)) == os.path.normcase(os.path.normpath(self.directory)):
+            return os.path.normcase(name) in self._names
+        return os.path.exists(abs_path)
+
+    def unreferenced(self, paths):
+        """图片目录中不在paths里的图片文件名（不含编辑时粘贴的临时图片）"""
+        directory = os.path.normcase(os.path.normpath(self.directory))
+        used = set()
+        for path in paths:
+            folder, name = os.path.split(resolve_image_path(path) or "")
+            if os.path.normcase(os.path.normpath(folder)) == directory:
+                used.add(os.path.normcase(name))
+        return sorted(name for name in self._images
+                      if os.path.normcase(name) not in used and not is_temp_image(name))
+
+
+_image_index = None
+
+
+def get_image_index():
+    """全局共享的图片目录索引，每次获取时按需刷新"""
+    global _image_index
+    if _image_index is None:
+        _image_index = ImageDirectoryIndex(IMAGE_DIR)
+    _image_index.refresh()
+    return _image_index
+
+
+@traced(cat="images")
+def save_pasted_image(image, fmt=PASTE_FORMAT, quality=PASTE_QUALITY):
+    """把粘贴的图片（Pillow Image）编码为图片目录中的临时图片，返回路径。编码较慢，应在后台线程调用"""
+    from PIL import features
+
+    if fmt not in PASTE_FORMATS or (fmt == "webp" and not features.check("webp")):
+        fmt = "png"
+    pil_format, ext, default_quality = PASTE_FORMATS[fmt]
+    if quality is None:
+        quality = default_quality
+    # 截图和出图几乎都不透明，去掉无用的alpha通道能小四分之一
+    if image.mode == "RGBA" and image.getextrema()[3][0] == 255:
+        image = image.convert("RGB")
+
+    os.makedirs(IMAGE_DIR, exist_ok=True)
+    path = os.path.join(IMAGE_DIR, f"temp_{os.urandom(4).hex()}{ext}")
+    part = path + ".part"
+    if fmt == "jpeg":
+        image.convert("RGB").save(part, pil_format, quality=quality, subsampling=0)
+    elif fmt == "webp":
+        image.save(part, pil_format, lossless=True, quality=quality, method=4)
+    else:
+        image.save(part, pil_format, compress_level=quality)
+    # 写完再改名，不会出现半个文件
+    os.replace(part, path)
+    return path
+
+
+def find_existing_images(artist_id):
+    """查找图片文件夹中符合命名规则的图片，返回三个位置的相对路径（缺失为None）"""
+    if not artist_id:
+        return []
+    return get_image_index().find_all(artist_id)
+
+
+def is_temp_image(path):
+    """编辑过程中粘贴产生的临时图片"""
+    return bool(path) and os.path.basename(path).startswith("temp_")
+
+
+JOURNAL_DIR_NAME = ".journal"
+
+
+class JournalLock:
+    """图片事务日志的独占锁（.journal/<事务ID>.lock），从暂存开始持有到提交或回滚结束。
+    锁由操作系统在进程退出（包括崩溃）时释放，恢复时拿不到锁说明事务所在的进程仍在运行，不能处理。
+    锁跟随打开的文件：同一进程内另一个连接的恢复也拿不到锁"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """不等待地获取锁，已被持有时返回False"""
+        if self._file is not None:
+            return True
+        f = open(self.path, "a+b")
+        if not lock_file(f, blocking=False):
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        """释放锁并删除锁文件。可重复执行"""
+        if self._file is None:
+            return
+        if os.name != "nt":
+            # 持有锁时删除，其他进程之后拿到的是已删除的文件，会发现日志已不存在
+            self._remove()
+        self._file.close()
+        self._file = None
+        if os.name == "nt":
+            # Windows不能删除打开中的文件；删除失败（其他进程正好打开）时由下次恢复清理
+            self._remove()
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class ImageTransaction:
+    """保存画师时的图片文件事务，与数据库写入一起提交。
+
+    stage() 先把计划写入日志（图片目录/.journal），再把新图片放到目标旁边的暂存文件：粘贴的临时图片直接改名，
+    不复制；目标已经是相同内容时什么都不做。数据库在同一事务中记录事务ID（image_transactions表），
+    提交之后 commit() 用os.replace原子替换目标文件并删除日志。中途崩溃时由 recover_image_transactions
+    在启动时按数据库中是否有该事务ID前滚或回滚，不会留下指向缺失文件的记录或无主的副本。
+    事务进行期间持有日志的JournalLock，其他进程的恢复不会处理它"""
+
+    def __init__(self, image_dir=None, tx_id=None):
+        self.image_dir = image_dir or IMAGE_DIR
+        self.id = tx_id or uuid.uuid4().hex
+        self.journal_path = os.path.join(self.image_dir, JOURNAL_DIR_NAME, self.id + ".json")
+        self.lock = JournalLock(os.path.join(self.image_dir, JOURNAL_DIR_NAME, self.id + ".lock"))
+        self.ops = []  # [{"src", "staged", "dest", "move", "object"}]
+        self.remove = []  # 提交后删除的临时图片
+
+    @classmethod
+    def from_journal(cls, journal_path):
+        with open(journal_path, encoding="utf-8") as f:
+            data = json.load(f)
+        tx = cls(os.path.dirname(os.path.dirname(journal_path)), data["id"])
+        tx.ops = data["ops"]
+        tx.remove = data["remove"]
+        return tx
+
+    def _write_journal(self):
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"id": self.id, "ops": self.ops, "remove": self.remove}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+
+    def _remove_journal(self):
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _same_content(src, dest):
+        try:
+            if os.path.samefile(src, dest):
+                return True
+            return os.path.getsize(src) == os.path.getsize(dest) and filecmp.cmp(src, dest, shallow=False)
+        except OSError:
+            return False
+
+    @traced("ImageTransaction.stage", "images")
+    def stage(self, paths, artist_id):
+        """按画师ID暂存图片，返回三个位置写入数据库的相对路径（失败时保留原文件名）"""
+        if not artist_id:
+            return paths
+
+        store = get_image_store()
+        new_paths = []
+        os.makedirs(self.image_dir, exist_ok=True)
+        for i, path in enumerate(paths):
+            if not path or not os.path.exists(path):
+                new_paths.append(None)
+                continue
+
+            new_filename = f"{artist_id}-{i + 1}{os.path.splitext(path)[1].lower()}"
+            dest = os.path.join(self.image_dir, new_filename)
+            op = {"src": path, "staged": f"{dest}.{self.id}.staged", "dest": dest, "move": False, "object": None}
+            try:
+                if store is not None:
+                    # 内容寻址存储：内容只保存一份，暂存文件是指向它的链接
+                    _, op["object"] = store.add(path)
+                    unchanged = os.path.exists(dest) and os.path.samefile(op["object"], dest)
+                else:
+                    unchanged = self._same_content(path, dest)
+                    # 图片目录中的临时图片直接改名（同一文件系统上的原子操作），不复制
+                    op["move"] = is_temp_image(path) and \
+                        os.path.normcase(os.path.dirname(os.path.abspath(path))) == \
+                        os.path.normcase(os.path.abspath(self.image_dir))
+            except OSError as e:
+                print(f"暂存图片失败: {e}")
+                new_paths.append(os.path.basename(path))
+                continue
+            if not unchanged:
+                self.ops.append(op)
+            if is_temp_image(path):
+                self.remove.append(path)
+            new_paths.append(new_filename)
+
+        if not self.ops and not self.remove:
+            return new_paths
+        # 先加锁、写日志再动文件，任何时刻崩溃都能从日志恢复
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        if not self.lock.acquire():
+            raise OSError(f"图片事务日志已被占用: {self.id}")
+        self._write_journal()
+        failed = []
+        for op in self.ops:
+            try:
+                if op["object"]:
+                    store.link(op["object"], op["staged"])
+                elif op["move"]:
+                    try:
+                        os.replace(op["src"], op["staged"])
+                    except OSError:
+                        op["move"] = False
+                        shutil.copy2(op["src"], op["staged"])
+                else:
+                    shutil.copy2(op["src"], op["staged"])
+            except OSError as e:
+                print(f"暂存图片失败: {e}")
+                failed.append(op)
+        for op in failed:
+            self.ops.remove(op)
+            new_paths[new_paths.index(os.path.basename(op["dest"]))] = os.path.basename(op["src"])
+            try:
+                os.remove(op["staged"])
+            except OSError:
+                pass
+        self._write_journal()
+        return new_paths
+
+    def file_info(self, path):
+        """数据库记录用的 (大小, 修改时间ns, 内容哈希)。目标尚未替换时取暂存文件的信息，替换后保持不变"""
+        abs_path = os.path.normcase(os.path.abspath(resolve_image_path(path)))
+        for op in self.ops:
+            if os.path.normcase(os.path.abspath(op["dest"])) == abs_path and os.path.exists(op["staged"]):
+                return (*image_file_info(op["staged"]), image_content_hash(op["staged"]))
+        return (*image_file_info(path), image_content_hash(path))
+
+    @traced("ImageTransaction.commit", "images")
+    def commit(self):
+        """数据库提交之后调用：暂存文件原子替换目标，删除已用过的临时图片。可重复执行"""
+        cache = get_thumbnail_cache()
+        for op in self.ops:
+            if os.path.exists(op["staged"]):
+                os.replace(op["staged"], op["dest"])
+            # 覆盖的旧图片的缩略图随之失效
+            cache.invalidate(op["dest"])
+        for path in self.remove:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            cache.invalidate(path)
+        self._remove_journal()
+        self.lock.release()
+
+    def rollback(self):
+        """数据库写入失败时调用：改名的临时图片移回原处，其余暂存文件删除。可重复执行"""
+        for op in self.ops:
+            if not os.path.exists(op["staged"]):
+                continue
+            if op["move"] and not os.path.exists(op["src"]):
+                os.replace(op["staged"], op["src"])
+            else:
+                os.remove(op["staged"])
+        self._remove_journal()
+        self.lock.release()
+
+
+def recover_image_transactions(committed_ids, image_dir=None):
+    """处理已退出的进程留下的图片事务：数据库已提交的前滚，其余回滚；仍在运行的事务（锁被持有）不处理。
+    返回已处理完、可以从数据库删除的已提交事务ID，包括日志已不存在（已正常完成）的"""
+    journal_dir = os.path.join(image_dir or IMAGE_DIR, JOURNAL_DIR_NAME)
+    finished = {tx_id for tx_id in committed_ids
+                if not os.path.exists(os.path.join(journal_dir, tx_id + ".json"))}
+    for path in glob.glob(os.path.join(journal_dir, "*.json")) + glob.glob(os.path.join(journal_dir, "*.tmp")):
+        tx_id = os.path.basename(path).split(".", 1)[0]
+        lock = JournalLock(os.path.join(journal_dir, tx_id + ".lock"))
+        if not lock.acquire():
+            continue
+        try:
+            if path.endswith(".tmp"):
+                # 写到一半的日志，之前完整写入的日志（如果有）仍然有效
+                os.remove(path)
+                continue
+            tx = ImageTransaction.from_journal(path)
+            tx.lock = lock
+            if tx.id in committed_ids:
+                tx.commit()
+                finished.add(tx.id)
+            else:
+                tx.rollback()
+        except FileNotFoundError:
+            pass  # 获取锁之前事务已经完成
+        except (OSError, ValueError, KeyError) as e:
+            print(f"恢复图片事务失败 {path}: {e}")
+        finally:
+            lock.release()
+    # 日志删除后、锁文件删除前退出留下的锁文件
+    for path in glob.glob(os.path.join(journal_dir, "*.lock")):
+        tx_id = os.path.basename(path)[:-len(".lock")]
+        lock = JournalLock(path)
+        if not os.path.exists(os.path.join(journal_dir, tx_id + ".json")) and lock.acquire():
+            lock.release()
+    return finished
+
+
+@traced(cat="images")
+def rename_images(paths, artist_id):
+    """把图片按画师ID重命名并复制到图片目录，立即提交，返回三个位置的相对路径（失败时保留原文件名）。
+    需要和数据库写入一起提交时使用ImageTransaction"""
+    tx = ImageTransaction()
+    new_paths = tx.stage(paths, artist_id)
+    tx.commit()
+    return new_paths
+
+
+def clean_temp_images(older_than=None):
+    """清理未使用的临时图片，返回删除的数量。
+    older_than为时间戳时只删除在此之前修改的文件，后台清理不会误删刚粘贴的图片"""
+    removed = 0
+    for file in glob.glob(os.path.join(IMAGE_DIR, "temp_*")):
+        try:
+            if older_than is not None and os.path.getmtime(file) >= older_than:
+                continue
+            os.remove(file)
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,39 @@
+"""进程间的独占文件锁（POSIX用flock，Windows用msvcrt.locking）。
+
+锁跟随打开的文件：同一进程内另外打开的文件对象也拿不到锁；进程退出（包括崩溃）时由操作系统释放"""
+import os
+import time
+
+
+def lock_file(f, blocking=True):
+    """获取文件f的独占锁，blocking为False且锁已被持有时返回False"""
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.01)
+    import fcntl
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        if blocking:
+            raise
+        return False
+    return True
+
+
+def unlock_file(f):
+    """释放lock_file获取的锁，关闭文件也会释放"""
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,270 @@
+"""AIGC图片的生成参数（提示词、模型、种子等）。
+
+只读取PNG文件头部的文本块（tEXt/zTXt/iTXt），遇到第一个图像数据块（IDAT）即停止，不解码像素：
+Stable Diffusion WebUI（A1111/Forge）把参数写在 parameters 文本块，Fooocus 写成JSON；
+ComfyUI 写在 prompt（API格式的节点图）和 workflow 文本块；NovelAI 写在 Comment 文本块（JSON）。
+其他格式的图片（JPEG/WebP的EXIF）不解析。
+"""
+import json
+import os
+import re
+import struct
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+TEXT_CHUNK_TYPES = (b"tEXt", b"zTXt", b"iTXt")
+# 单个文本块（解压后）的上限，超出时跳过；ComfyUI的workflow通常在1MB以内
+MAX_TEXT_CHUNK = 16 * 1024 * 1024
+# 解析结果中的字段，与数据库image_metadata表的列一致
+METADATA_FIELDS = ("generator", "prompt", "negative_prompt", "model", "seed", "settings")
+
+# A1111参数行的 "键: 值" 项，值可以是带引号的字符串（与WebUI的解析规则相同）
+A1111_PARAM = re.compile(r'\s*([\w ]+):\s*("(?:\\.|[^\\"])+"|[^,]*)(?:,|$)')
+LORA_TAG = re.compile(r"<(?:lora|lyco):([^:>]+)")
+# ComfyUI节点中表示模型文件的输入
+COMFY_MODEL_INPUTS = ("ckpt_name", "unet_name", "lora_name", "model_name")
+COMFY_TEXT_INPUTS = ("text", "text_g", "text_l", "prompt", "string", "value")
+COMFY_SETTING_INPUTS = ("steps", "cfg", "sampler_name", "scheduler", "denoise")
+MODEL_EXTENSIONS = (".safetensors", ".ckpt", ".pt", ".pth", ".gguf", ".sft")
+
+
+def _inflate(data):
+    """解压zlib数据，数据不完整或超出MAX_TEXT_CHUNK时返回None"""
+    decompressor = zlib.decompressobj()
+    result = decompressor.decompress(data, MAX_TEXT_CHUNK)
+    if decompressor.unconsumed_tail or not decompressor.eof:
+        return None
+    return result
+
+
+def _decode(data, encoding):
+    if encoding == "latin-1":
+        # 规范要求tEXt/zTXt为Latin-1，但不少工具直接写入UTF-8
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            pass
+    return data.decode(encoding, errors="replace")
+
+
+def decode_text_chunk(chunk_type, data):
+    """解码一个文本块，返回 (关键字, 文本)，格式错误时返回None"""
+    keyword, sep, rest = data.partition(b"\0")
+    if not sep or not keyword:
+        return None
+    try:
+        key = keyword.decode("latin-1")
+        if chunk_type == b"tEXt":
+            return key, _decode(rest, "latin-1")
+        if chunk_type == b"zTXt":
+            text = _inflate(rest[1:])
+            return (key, _decode(text, "latin-1")) if text is not None else None
+        # iTXt: 压缩标志, 压缩方法, 语言\0, 翻译后的关键字\0, 文本
+        compressed = rest[:1] == b"\1"
+        _, _, rest = rest[2:].partition(b"\0")
+        _, _, text = rest.partition(b"\0")
+        if compressed:
+            text = _inflate(text)
+        return (key, _decode(text, "utf-8")) if text is not None else None
+    except zlib.error:
+        return None
+
+
+def read_png_text(path):
+    """读取PNG图像数据之前的全部文本块，返回 {关键字: 文本}。不是PNG或读取失败时返回空字典"""
+    texts = {}
+    try:
+        with open(path, "rb") as f:
+            if f.read(8) != PNG_SIGNATURE:
+                return texts
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    break
+                length, chunk_type = struct.unpack(">I4s", header)
+                if chunk_type in (b"IDAT", b"IEND"):
+                    break
+                if chunk_type in TEXT_CHUNK_TYPES and length <= MAX_TEXT_CHUNK:
+                    data = f.read(length)
+                    if len(data) < length:
+                        break
+                    item = decode_text_chunk(chunk_type, data)
+                    if item is not None:
+                        texts.setdefault(*item)
+                    f.seek(4, os.SEEK_CUR)  # CRC
+                else:
+                    f.seek(length + 4, os.SEEK_CUR)
+    except OSError:
+        pass
+    return texts
+
+
+def _unique(names):
+    result = []
+    for name in names:
+        name = str(name).strip() if name is not None else ""
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+def _param_value(value):
+    value = value.strip()
+    if value.startswith('"'):
+        try:
+            return str(json.loads(value))
+        except ValueError:
+            pass
+    return value
+
+
+def parse_a1111_parameters(text):
+    """解析WebUI的parameters文本：提示词、"Negative prompt:"开头的反向提示词，最后一行为参数"""
+    lines = text.strip().split("\n")
+    settings = ""
+    if lines and len(A1111_PARAM.findall(lines[-1])) >= 3:
+        settings = lines.pop().strip()
+    prompt, negative = [], []
+    current = prompt
+    for line in lines:
+        if line.startswith("Negative prompt:"):
+            current = negative
+            line = line[len("Negative prompt:"):].strip()
+        current.append(line)
+    params = {key.strip(): _param_value(value) for key, value in A1111_PARAM.findall(settings)}
+    prompt = "\n".join(prompt).strip()
+    return {
+        "generator": "a1111",
+        "prompt": prompt,
+        "negative_prompt": "\n".join(negative).strip(),
+        "model": _unique([params.get("Model")] + LORA_TAG.findall(prompt)),
+        "seed": params.get("Seed"),
+        "settings": settings,
+    }
+
+
+def _comfy_inputs(node):
+    """节点的inputs，格式不对时当作没有输入"""
+    inputs = node.get("inputs") if isinstance(node, dict) else None
+    return inputs if isinstance(inputs, dict) else {}
+
+
+def _comfy_text(graph, link, depth=0):
+    """沿节点连接找到提示词文本：CLIPTextEncode等节点的文本输入，文本本身也可能来自其他节点"""
+    if not isinstance(link, list) or not link or depth > 16:
+        return ""
+    node = graph.get(str(link[0]))
+    if not isinstance(node, dict):
+        return ""
+    inputs = _comfy_inputs(node)
+    for key in COMFY_TEXT_INPUTS:
+        value = inputs.get(key)
+        if isinstance(value, str):
+            return value
+        if isinstance(value, list):
+            return _comfy_text(graph, value, depth + 1)
+    # 合并条件等节点：依次收集各个输入的文本
+    texts = [_comfy_text(graph, value, depth + 1) for key, value in sorted(inputs.items())
+             if isinstance(value, list) and key.startswith("conditioning")]
+    return "\n".join(text for text in texts if text)
+
+
+def parse_comfyui_prompt(graph):
+    """解析ComfyUI的API格式节点图 {节点ID: {class_type, inputs}}"""
+    models = []
+    sampler = None
+    # 节点ID是数字字符串，按数值顺序遍历（底模通常在LoRA之前）
+    for _, node in sorted(graph.items(), key=lambda item: (len(item[0]), item[0])):
+        if not isinstance(node, dict):
+            continue
+        inputs = _comfy_inputs(node)
+        models.extend(inputs.get(key) for key in COMFY_MODEL_INPUTS if isinstance(inputs.get(key), str))
+        if sampler is None and "positive" in inputs and ("seed" in inputs or "noise_seed" in inputs):
+            sampler = inputs
+
+    result = {"generator": "comfyui", "model": _unique(models), "prompt": "", "negative_prompt": "",
+              "seed": None, "settings": ""}
+    if sampler is not None:
+        seed = sampler.get("seed", sampler.get("noise_seed"))
+        result["seed"] = None if isinstance(seed, list) else seed
+        result["prompt"] = _comfy_text(graph, sampler.get("positive"))
+        result["negative_prompt"] = _comfy_text(graph, sampler.get("negative"))
+        result["settings"] = ", ".join(f"{key}: {sampler[key]}" for key in COMFY_SETTING_INPUTS
+                                       if key in sampler and not isinstance(sampler[key], list))
+    else:
+        texts = [_comfy_inputs(node).get("text") for node in graph.values()
+                 if isinstance(node, dict) and str(node.get("class_type", "")).startswith("CLIPTextEncode")]
+        result["prompt"] = "\n".join(text for text in texts if isinstance(text, str))
+    return result
+
+
+def parse_comfyui_workflow(workflow):
+    """只有界面格式的workflow时，从节点的控件值中找出模型文件名"""
+    models = []
+    nodes = workflow.get("nodes")
+    for node in nodes if isinstance(nodes, list) else []:
+        values = node.get("widgets_values") if isinstance(node, dict) else None
+        if isinstance(values, list):
+            models.extend(value for value in values
+                          if isinstance(value, str) and value.lower().endswith(MODEL_EXTENSIONS))
+    return {"generator": "comfyui", "model": _unique(models)}
+
+
+def parse_json_parameters(data, generator):
+    """Fooocus、NovelAI等以JSON保存的参数"""
+    settings = {key: data[key] for key in ("steps", "scale", "cfg_scale", "guidance_scale", "sampler", "scheduler",
+                                            "performance", "resolution") if key in data}
+    return {
+        "generator": generator,
+        "prompt": data.get("prompt") or "",
+        "negative_prompt": data.get("negative_prompt") or data.get("uc") or "",
+        "model": _unique([data.get("base_model"), data.get("model"), data.get("refiner_model")]),
+        "seed": data.get("seed"),
+        "settings": ", ".join(f"{key}: {value}" for key, value in settings.items()),
+    }
+
+
+def _load_json(text):
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def parse_generation_metadata(texts):
+    """从PNG文本块中识别生成参数，返回字段为METADATA_FIELDS的字典（model为 "; " 分隔的模型和LoRA），
+    没有可识别的参数时返回None"""
+    result = None
+    parameters = texts.get("parameters")
+    if parameters:
+        data = _load_json(parameters) if parameters.lstrip().startswith("{") else None
+        result = parse_json_parameters(data, "fooocus") if data is not None else parse_a1111_parameters(parameters)
+    elif _load_json(texts.get("prompt")) is not None:
+        result = parse_comfyui_prompt(_load_json(texts["prompt"]))
+    elif _load_json(texts.get("workflow")) is not None:
+        result = parse_comfyui_workflow(_load_json(texts["workflow"]))
+    elif texts.get("Software", "").startswith("NovelAI") and _load_json(texts.get("Comment")) is not None:
+        result = parse_json_parameters(_load_json(texts["Comment"]), "novelai")
+        result["model"] = _unique([texts.get("Source")])
+    if result is None:
+        return None
+
+    metadata = {field: result.get(field) for field in METADATA_FIELDS}
+    metadata["model"] = "; ".join(metadata["model"] or [])
+    metadata["seed"] = str(metadata["seed"]) if metadata["seed"] not in (None, "") else None
+    for field in ("prompt", "negative_prompt", "settings"):
+        metadata[field] = metadata[field] if isinstance(metadata[field], str) else str(metadata[field] or "")
+    return metadata
+
+
+def read_generation_metadata(path):
+    """读取图片的生成参数，没有或无法解析时返回None。按文件签名判断是否为PNG，其他格式只读取8个字节"""
+    if not path:
+        return None
+    try:
+        return parse_generation_metadata(read_png_text(path))
+    except Exception as e:
+        # 各种工具写入的参数格式不一，单个文件解析失败不影响批量索引
+        print(f"解析生成参数失败 {path}: {e}")
+        return None
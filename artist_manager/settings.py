@@ -0,0 +1,50 @@
+"""路径与运行参数。导入本模块不会创建任何目录，需要时调用 ensure_directories()"""
+import os
+import sys
+
+
+def get_app_base_dir():
+    """获取应用程序所在的基础目录，可通过环境变量 ARTIST_MANAGER_HOME 指定（例如无界面的服务器）"""
+    home = os.environ.get("ARTIST_MANAGER_HOME")
+    if home:
+        return os.path.abspath(home)
+    if getattr(sys, 'frozen', False):
+        # 打包后的环境
+        return os.path.dirname(os.path.abspath(sys.executable))
+    else:
+        # 开发环境：main.py 与本包位于同一目录
+        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# 获取基础目录
+BASE_DIR = get_app_base_dir()
+
+# 数据库、图片目录、缩略图目录 - 相对于可执行文件位置
+DATABASE_NAME = os.path.join(BASE_DIR, "artists.db")
+IMAGE_DIR = os.path.join(BASE_DIR, "artist_images")
+THUMB_DIR = os.path.join(BASE_DIR, "artist_thumbs")
+
+# 缩略图工作线程数量，可通过环境变量调整
+THUMB_WORKERS = int(os.environ.get("ARTIST_MANAGER_THUMB_WORKERS", 0)) or max(2, min(4, (os.cpu_count() or 2) // 2))
+# 缩略图缓存的磁盘预算（MB）
+THUMB_CACHE_BUDGET_MB = int(os.environ.get("ARTIST_MANAGER_THUMB_CACHE_MB", 512))
+# 内存中已缩放缩略图的缓存上限（MB）
+PIXMAP_CACHE_MB = int(os.environ.get("ARTIST_MANAGER_PIXMAP_CACHE_MB", 64))
+# 缩略图存储方式：files 每张一个文件；pack 全部写入单个文件并通过mmap读取
+THUMB_STORE = os.environ.get("ARTIST_MANAGER_THUMB_STORE", "files")
+# 图片存储方式：files 按 {画师ID}-{序号} 保存副本；content 按内容哈希只保存一份，画师文件名为指向它的链接
+IMAGE_STORE = os.environ.get("ARTIST_MANAGER_IMAGE_STORE", "files")
+# 粘贴图片的保存格式：png、webp（无损）或 jpeg；质量参数对png是压缩级别0-9，对webp是压缩力度0-100，
+# 对jpeg是质量1-100，不设置时使用各格式的默认值
+PASTE_FORMAT = os.environ.get("ARTIST_MANAGER_PASTE_FORMAT", "png").lower()
+PASTE_QUALITY = int(os.environ["ARTIST_MANAGER_PASTE_QUALITY"]) if os.environ.get("ARTIST_MANAGER_PASTE_QUALITY") \
+    else None
+# 耗时追踪输出文件，为空时不追踪（见 tracing.py）
+TRACE_FILE = os.environ.get("ARTIST_MANAGER_TRACE") or None
+
+
+def ensure_directories():
+    """确保必要的目录存在，返回 (数据库路径, 图片目录, 缩略图目录)"""
+    os.makedirs(IMAGE_DIR, exist_ok=True)
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    return DATABASE_NAME, IMAGE_DIR, THUMB_DIR
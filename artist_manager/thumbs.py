@@ -0,0 +1,868 @@
+"""缩略图：持久化缓存、基于Pillow的生成器和多线程调度器，不依赖Qt"""
+import atexit
+import glob
+import hashlib
+import heapq
+import io
+import itertools
+import mmap
+import multiprocessing
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from .locking import lock_file, unlock_file
+from .settings import THUMB_DIR, THUMB_WORKERS, THUMB_CACHE_BUDGET_MB, THUMB_STORE
+from .tracing import traced
+
+# 缩略图金字塔的各级边长：80用于列表和编辑界面，160用于高DPI屏幕，300用于更大的预览
+THUMB_LEVELS = (80, 160, 300)
+
+
+class FileThumbnailStore:
+    """每张缩略图一个文件的存储方式（默认）"""
+
+    def __init__(self, directory, reserved=()):
+        self.directory = directory
+        self.reserved = tuple(reserved)  # 目录中不属于缩略图的文件名前缀
+        os.makedirs(directory, exist_ok=True)
+
+    def read(self, name):
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def delete(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def names(self):
+        names = set()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.startswith(self.reserved):
+                    names.add(entry.name)
+        return names
+
+    def close(self):
+        pass
+
+
+class PackThumbnailStore:
+    """把所有缩略图追加写入一个文件，通过mmap读取。
+
+    每条记录为 头部 + 名称 + 数据，删除时追加一条墓碑记录；启动时顺序扫描一次建立偏移索引，
+    之后读取只是内存索引查找加mmap切片，不需要系统调用。失效数据超过一半时在后台压缩。
+    界面和命令行可能同时写入同一个pack：追加和压缩都持有 thumbs.pack.lock 的进程间独占锁，
+    写入前先读入其他进程追加的记录，发现文件已被其他进程压缩替换时重新打开。
+    """
+    MAGIC = b"ATPK"
+    HEADER = struct.Struct("<4sBBI")  # 魔数, 标志(1为删除), 名称长度, 数据长度
+    FLAG_DELETED = 1
+    COMPACT_MIN_DEAD_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._index = {}  # 名称 -> (数据偏移, 数据长度)
+        self._dead_bytes = 0
+        self._compacting = False
+        self._map = None
+        self._file = None
+        self._size = 0
+        self._lock_file = open(path + ".lock", "a+b")
+        self._lock_depth = 0
+        self._open()
+
+    @contextmanager
+    def _exclusive(self):
+        """持有进程间的写锁（同一线程内可重入），调用方须已持有self._lock"""
+        if self._lock_depth == 0:
+            lock_file(self._lock_file)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0:
+                unlock_file(self._lock_file)
+
+    def _open(self):
+        with self._lock, self._exclusive():
+            open(self.path, "ab").close()
+            self._file = open(self.path, "r+b")
+            self._index.clear()
+            self._dead_bytes = 0
+            end = self._scan(0)
+            if os.fstat(self._file.fileno()).st_size != end:
+                # 持有写锁时尾部仍不完整，说明上次写入中断，截掉不完整的记录
+                self._file.truncate(end)
+            self._size = end
+            self._remap()
+
+    def _scan(self, start):
+        """从start开始顺序扫描记录更新索引，返回最后一条完整记录的结束位置"""
+        size = os.fstat(self._file.fileno()).st_size
+        if size <= start:
+            return start
+        data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            offset = start
+            header_size = self.HEADER.size
+            while offset + header_size <= size:
+                magic, flags, name_len, data_len = self.HEADER.unpack_from(data, offset)
+                end = offset + header_size + name_len + data_len
+                if magic != self.MAGIC or end > size:
+                    break
+                name = data[offset + header_size:offset + header_size + name_len].decode("utf-8")
+                old = self._index.pop(name, None)
+                if old is not None:
+                    self._dead_bytes += old[1]
+                if flags & self.FLAG_DELETED:
+                    self._dead_bytes += end - offset
+                else:
+                    self._index[name] = (offset + header_size + name_len, data_len)
+                offset = end
+            return offset
+        finally:
+            data.close()
+
+    def _refresh(self):
+        """读入其他进程追加的记录，文件已被压缩替换时重新打开，返回是否有变化。调用方须已持有self._lock"""
+        if self._file is None:
+            return False
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        own = os.fstat(self._file.fileno())
+        if (st.st_dev, st.st_ino) != (own.st_dev, own.st_ino):
+            self._close_file()
+            self._open()
+            return True
+        if own.st_size > self._size:
+            end = self._scan(self._size)
+            if end != self._size:
+                self._size = end
+                self._remap()
+                return True
+        return False
+
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._size > 0:
+            self._map = mmap.mmap(self._file.fileno(), self._size, access=mmap.ACCESS_READ)
+
+    def _append(self, name, data, flags=0):
+        """在写锁内追加一条记录，返回数据偏移。调用方须已持有self._lock"""
+        name_bytes = name.encode("utf-8")
+        with self._exclusive():
+            self._refresh()
+            # 一次写入完整记录，偏移以文件实际结尾为准
+            self._file.seek(self._size)
+            self._file.write(self.HEADER.pack(self.MAGIC, flags, len(name_bytes), len(data)) + name_bytes + data)
+            self._file.flush()
+        data_offset = self._size + self.HEADER.size + len(name_bytes)
+        self._size = data_offset + len(data)
+        return data_offset
+
+    def read(self, name):
+        with self._lock:
+            entry = self._index.get(name)
+            if entry is None and self._refresh():
+                # 可能是其他进程刚写入的
+                entry = self._index.get(name)
+            if entry is None:
+                return None
+            offset, length = entry
+            if self._map is None or offset + length > len(self._map):
+                self._remap()
+            return self._map[offset:offset + length]
+
+    def write(self, name, data):
+        with self._lock:
+            old = self._index.get(name)
+            if old is not None:
+                self._dead_bytes += old[1]
+            self._index[name] = (self._append(name, data), len(data))
+
+    def delete(self, name):
+        with self._lock:
+            old = self._index.pop(name, None)
+            if old is None:
+                return
+            self._dead_bytes += old[1]
+            self._append(name, b"", self.FLAG_DELETED)
+        self.compact_async()
+
+    def names(self):
+        with self._lock:
+            return set(self._index)
+
+    def live_bytes(self):
+        with self._lock:
+            return sum(length for _, length in self._index.values())
+
+    def compact_async(self):
+        """失效数据过多时在后台线程压缩"""
+        with self._lock:
+            if self._compacting or self._dead_bytes < self.COMPACT_MIN_DEAD_BYTES \
+                    or self._dead_bytes < self.live_bytes():
+                return
+            self._compacting = True
+        threading.Thread(target=self.compact, name="thumbnail-pack-compact", daemon=True).start()
+
+    def compact(self):
+        """只保留有效记录重写整个文件，完成后原子替换"""
+        tmp_path = f"{self.path}.{os.getpid()}.compact"
+        try:
+            with self._lock:
+                snapshot = dict(self._index)
+            with open(tmp_path, "wb") as out:
+                for name in snapshot:
+                    data = self.read(name)
+                    if data is None:
+                        continue
+                    name_bytes = name.encode("utf-8")
+                    out.write(self.HEADER.pack(self.MAGIC, 0, len(name_bytes), len(data)))
+                    out.write(name_bytes)
+                    out.write(data)
+                out.flush()
+                os.fsync(out.fileno())
+
+            with self._lock, self._exclusive():
+                # 压缩期间本进程或其他进程新写入、删除的记录在新文件中补齐
+                if self._refresh() and self._dead_bytes < self.COMPACT_MIN_DEAD_BYTES:
+                    # 其他进程已经压缩过
+                    os.remove(tmp_path)
+                    return
+                with open(tmp_path, "ab") as out:
+                    for name, entry in self._index.items():
+                        if snapshot.get(name) != entry:
+                            data = self.read(name)
+                            name_bytes = name.encode("utf-8")
+                            out.write(self.HEADER.pack(self.MAGIC, 0, len(name_bytes), len(data)))
+                            out.write(name_bytes)
+                            out.write(data)
+                    for name in snapshot:
+                        if name not in self._index:
+                            name_bytes = name.encode("utf-8")
+                            out.write(self.HEADER.pack(self.MAGIC, self.FLAG_DELETED, len(name_bytes), 0))
+                            out.write(name_bytes)
+                self._close_file()
+                os.replace(tmp_path, self.path)
+                self._open()
+        except OSError as e:
+            print(f"缩略图压缩失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            with self._lock:
+                if self._file is None:
+                    self._open()
+        finally:
+            self._compacting = False
+
+    def _close_file(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+
+class ThumbnailCache:
+    """持久化的缩略图缓存。
+
+    缩略图以 原图路径+大小+修改时间+金字塔各级尺寸 的哈希命名，原图被替换后自动失效；
+    每张原图保存一组不同尺寸的缩略图（{哈希}@{边长}.{扩展名}），显示时直接读取与绘制尺寸相同的一级，不再缩放。
+    索引保存在缩略图目录的index.db中并在启动时载入内存，查找缩略图不需要访问文件系统。
+    缩略图数据保存在可替换的存储中（独立文件或单个pack文件），超出磁盘预算时按最近使用时间淘汰。
+    """
+    INDEX_NAME = "index.db"
+    PACK_NAME = "thumbs.pack"
+
+    def __init__(self, thumb_dir, budget_bytes, levels=THUMB_LEVELS, store=None):
+        self.thumb_dir = thumb_dir
+        self.budget_bytes = budget_bytes
+        self.levels = tuple(sorted(levels))
+        self._lock = threading.RLock()
+        self._entries = {}  # 原图路径 -> [原图大小, 原图修改时间, 缩略图名称, 各级缩略图总字节数, 最近使用时间]
+        self._touched = set()
+        self.total_bytes = 0
+
+        os.makedirs(thumb_dir, exist_ok=True)
+        if store is None:
+            store = FileThumbnailStore(thumb_dir, reserved=(self.INDEX_NAME, self.PACK_NAME))
+        self.store = store
+
+        self.conn = sqlite3.connect(os.path.join(thumb_dir, self.INDEX_NAME), check_same_thread=False)
+        # 索引只是缓存，丢失后可以重建，不需要每次写入都同步到磁盘
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS thumbs (
+            src_path TEXT PRIMARY KEY,
+            src_size INTEGER,
+            src_mtime INTEGER,
+            file TEXT,
+            bytes INTEGER,
+            last_used REAL
+        )
+        """)
+        self.conn.commit()
+        self.reload()
+
+    def reload(self):
+        """重新载入index.db到内存索引：加入其他进程（界面或命令行）写入的缩略图，移除被其他进程删除的，
+        本进程尚未写回的最近使用时间保留"""
+        with self._lock:
+            entries = {}
+            total_bytes = 0
+            for src_path, src_size, src_mtime, file, size_bytes, last_used in self.conn.execute(
+                    "SELECT src_path, src_size, src_mtime, file, bytes, last_used FROM thumbs"):
+                old = self._entries.get(src_path)
+                if old is not None and old[2] == file:
+                    last_used = max(last_used or 0, old[4] or 0)
+                entries[src_path] = [src_size, src_mtime, file, size_bytes, last_used]
+                total_bytes += size_bytes or 0
+            self._entries = entries
+            self._touched &= set(entries)
+            self.total_bytes = total_bytes
+
+    @staticmethod
+    def _normalize(src_path):
+        return os.path.normcase(os.path.abspath(src_path))
+
+    def _thumb_name(self, src_path, st):
+        levels = ",".join(str(level) for level in self.levels)
+        identity = f"{src_path}|{st.st_size}|{st.st_mtime_ns}|{levels}"
+        digest = hashlib.sha1(identity.encode("utf-8")).hexdigest()[:24]
+        ext = os.path.splitext(src_path)[1].lower()
+        return digest + (".jpg" if ext in (".jpg", ".jpeg") else ".png")
+
+    @staticmethod
+    def level_name(name, level):
+        """某一级缩略图在存储中的名称"""
+        stem, ext = os.path.splitext(name)
+        return f"{stem}@{level}{ext}"
+
+    def level_names(self, name):
+        return [self.level_name(name, level) for level in self.levels]
+
+    def level_for(self, size):
+        """绘制边长为size（物理像素）时应读取的一级：不小于size的最小一级，都小于size时取最大一级"""
+        for level in self.levels:
+            if level >= size:
+                return level
+        return self.levels[-1]
+
+    def _delete_levels(self, name):
+        for level_name in self.level_names(name):
+            self.store.delete(level_name)
+
+    def lookup(self, src_path):
+        """返回已缓存缩略图的名称，没有时返回None。只查内存索引，不访问文件系统"""
+        if not src_path:
+            return None
+        key = self._normalize(src_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry[4] = time.time()
+            self._touched.add(key)
+            return entry[2]
+
+    def name_for(self, src_path):
+        """返回原图当前版本对应的缩略图名称，原图不存在时返回None"""
+        key = self._normalize(src_path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            return None
+        return self._thumb_name(key, st)
+
+    def is_current(self, src_path, name):
+        """索引中该原图的缩略图是否就是name（即原图未变化），不更新最近使用时间"""
+        key = self._normalize(src_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[2] == name
+
+    def read(self, name, level=None):
+        """读取某一级缩略图的数据，level为None时读取最大的一级"""
+        return self.store.read(self.level_name(name, level or self.levels[-1]))
+
+    def store_thumbnail(self, src_path, name, levels):
+        """保存新生成的一组缩略图（{边长: 数据}，须包含全部级别）；生成期间原图又被修改时丢弃"""
+        key = self._normalize(src_path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            return False
+        if name != self._thumb_name(key, st) or any(level not in levels for level in self.levels):
+            return False
+
+        size_bytes = sum(len(levels[level]) for level in self.levels)
+        with self._lock:
+            for level in self.levels:
+                self.store.write(self.level_name(name, level), levels[level])
+            old = self._entries.get(key)
+            if old is not None:
+                self.total_bytes -= old[3] or 0
+                if old[2] != name:
+                    self._delete_levels(old[2])
+            now = time.time()
+            self._entries[key] = [st.st_size, st.st_mtime_ns, name, size_bytes, now]
+            self._touched.discard(key)
+            self.total_bytes += size_bytes
+            self.conn.execute("""
+            INSERT OR REPLACE INTO thumbs (src_path, src_size, src_mtime, file, bytes, last_used)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, st.st_size, st.st_mtime_ns, name, size_bytes, now))
+            self.conn.commit()
+            if self.total_bytes > self.budget_bytes:
+                self.evict()
+        return True
+
+    def invalidate(self, src_path):
+        """丢弃某张原图的缩略图（例如原图被覆盖）"""
+        if not src_path:
+            return
+        key = self._normalize(src_path)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            self.total_bytes -= entry[3] or 0
+            self._touched.discard(key)
+            self._delete_levels(entry[2])
+            self.conn.execute("DELETE FROM thumbs WHERE src_path=?", (key,))
+            self.conn.commit()
+
+    def clear(self):
+        """删除全部缩略图"""
+        with self._lock:
+            for entry in self._entries.values():
+                self._delete_levels(entry[2])
+            self._entries.clear()
+            self._touched.clear()
+            self.total_bytes = 0
+            self.conn.execute("DELETE FROM thumbs")
+            self.conn.commit()
+
+    def evict(self, target_bytes=None):
+        """按最近使用时间淘汰缩略图，直到总大小不超过目标（默认为预算的90%）"""
+        if target_bytes is None:
+            target_bytes = int(self.budget_bytes * 0.9)
+        with self._lock:
+            if self.total_bytes <= target_bytes:
+                return 0
+            evicted = []
+            for key, entry in sorted(self._entries.items(), key=lambda item: item[1][4] or 0):
+                if self.total_bytes <= target_bytes:
+                    break
+                self.total_bytes -= entry[3] or 0
+                self._delete_levels(entry[2])
+                evicted.append(key)
+            for key in evicted:
+                del self._entries[key]
+                self._touched.discard(key)
+            self.conn.executemany("DELETE FROM thumbs WHERE src_path=?", [(k,) for k in evicted])
+            self.conn.commit()
+            return len(evicted)
+
+    def flush(self):
+        """把内存中的最近使用时间写回索引"""
+        with self._lock:
+            if not self._touched:
+                return
+            self.conn.executemany("UPDATE thumbs SET last_used=? WHERE src_path=?",
+                                  [(self._entries[k][4], k) for k in self._touched if k in self._entries])
+            self.conn.commit()
+            self._touched.clear()
+
+    @traced("ThumbnailCache.validate", "thumbs")
+    def validate(self):
+        """校验索引：原图已修改或删除、或任一级缩略图数据已丢失的条目失效，并删除索引之外的缩略图。
+        按目录列出文件，而不是逐个stat。返回失效的原图路径列表。
+
+        其他进程可能同时在生成缩略图（先写数据再写索引），所以先重新载入index.db再列出数据，
+        删除索引之外的数据前再载入一次，不会删掉其他进程刚写入的缩略图"""
+        self.reload()
+        try:
+            stored = self.store.names()
+        except OSError:
+            stored = set()
+        with self._lock:
+            by_dir = {}
+            for key, entry in self._entries.items():
+                by_dir.setdefault(os.path.dirname(key), []).append((key, entry))
+
+        stale = []
+        for directory, items in by_dir.items():
+            stats = {}
+            try:
+                with os.scandir(directory) as it:
+                    for dir_entry in it:
+                        stats[os.path.normcase(dir_entry.path)] = dir_entry
+            except OSError:
+                pass
+            for key, entry in items:
+                dir_entry = stats.get(key)
+                try:
+                    st = dir_entry.stat() if dir_entry is not None else None
+                except OSError:
+                    st = None
+                if st is None or st.st_size != entry[0] or st.st_mtime_ns != entry[1] \
+                        or not stored.issuperset(self.level_names(entry[2])):
+                    stale.append(key)
+
+        for key in stale:
+            self.invalidate(key)
+
+        # 清理索引之外的缩略图（例如旧版本遗留的单一尺寸缩略图）
+        self.reload()
+        with self._lock:
+            known = {level_name for entry in self._entries.values() for level_name in self.level_names(entry[2])}
+        for name in stored - known:
+            self.store.delete(name)
+        return stale
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.total_bytes, "budget": self.budget_bytes}
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self.store.close()
+            self.conn.close()
+
+
+_thumbnail_cache = None
+_thumbnail_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache():
+    """获取全局缩略图缓存。第一次调用可能来自后台线程（启动后的缓存校验），创建过程加锁"""
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        with _thumbnail_cache_lock:
+            if _thumbnail_cache is None:
+                store = None
+                if THUMB_STORE == "pack":
+                    store = PackThumbnailStore(os.path.join(THUMB_DIR, ThumbnailCache.PACK_NAME))
+                cache = ThumbnailCache(THUMB_DIR, THUMB_CACHE_BUDGET_MB * 1024 * 1024, store=store)
+                atexit.register(cache.flush)
+                _thumbnail_cache = cache
+    return _thumbnail_cache
+
+
+class ThumbnailGenerator:
+    """生成单张原图的缩略图，由缩略图调度器的工作线程调用。Pillow解码和缩放时释放GIL，多个线程可以并行"""
+
+    def __init__(self, src_path):
+        self.src_path = src_path
+
+    @staticmethod
+    def _encode(image, fmt):
+        buffer = io.BytesIO()
+        if fmt == "JPG":
+            image.convert("RGB").save(buffer, "JPEG", quality=90)
+        else:
+            if image.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+                image = image.convert("RGBA")
+            image.save(buffer, "PNG")
+        return buffer.getvalue()
+
+    @staticmethod
+    def _shrink(image, size):
+        """保持比例缩小到size以内。指定reducing_gap后，JPEG先用draft()在DCT阶段按1/2~1/8降低分辨率解码，
+        其余格式解码后先用reduce()按整数倍快速缩小到目标的2倍左右，最后才用LANCZOS缩放到最终尺寸"""
+        from PIL import Image
+
+        image.thumbnail(size, Image.LANCZOS, reducing_gap=2.0)
+        return image
+
+    @traced("ThumbnailGenerator.render_levels", "thumbs")
+    def render_levels(self, levels=THUMB_LEVELS, fmt="PNG"):
+        """一次解码生成整个金字塔，返回 {边长: 编码后的数据}，失败时返回None。
+        原图只按最大一级降低分辨率解码一次，较小的各级依次从上一级缩小"""
+        from PIL import Image
+
+        try:
+            with Image.open(self.src_path) as image:
+                levels = sorted(levels, reverse=True)
+                current = self._shrink(image, (levels[0], levels[0]))
+                result = {}
+                for level in levels:
+                    if max(current.size) > level:
+                        current = current.copy()
+                        current.thumbnail((level, level), Image.LANCZOS)
+                    result[level] = self._encode(current, fmt)
+                return result
+        except Exception as e:
+            print(f"缩略图生成失败: {e}")
+        return None
+
+
+def render_thumbnail(src_path, levels, fmt):
+    """在子进程中生成缩略图金字塔，进程池要求任务是模块级函数"""
+    return ThumbnailGenerator(src_path).render_levels(levels, fmt)
+
+
+def refresh_thumbnails(src_paths, workers=None, force=False, progress_callback=None, is_cancelled=None,
+                       on_result=None):
+    """为给定原图重新生成缺失或过期（原图比缩略图新）的缩略图，有效的缩略图保持不动。
+
+    解码和缩放在进程池中进行，可以用满所有CPU核心；只保持少量任务在途，取消后最多等待正在生成的几张。
+    on_result(原图路径, 是否成功) 在每张缩略图完成时调用。返回 (生成数, 失败数, 是否取消)
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    cache = get_thumbnail_cache()
+    jobs = {}
+    for src in src_paths:
+        name = cache.name_for(src) if src else None
+        if name and (force or not cache.is_current(src, name)):
+            jobs[src] = name
+    total = len(jobs)
+    generated = failed = 0
+    cancelled = False
+    if progress_callback:
+        progress_callback(0, total)
+    if not jobs:
+        return generated, failed, cancelled
+
+    workers = workers or os.cpu_count() or 2
+    pending = iter(jobs.items())
+    running = {}
+    # 调用方通常是多线程的（界面、调度器），fork可能复制到被其他线程持有的锁，统一使用spawn
+    pool = ProcessPoolExecutor(max_workers=min(workers, total), mp_context=multiprocessing.get_context("spawn"))
+    try:
+        while True:
+            while len(running) < workers * 2:
+                item = next(pending, None)
+                if item is None:
+                    break
+                src, name = item
+                fmt = "JPG" if name.endswith(".jpg") else "PNG"
+                running[pool.submit(render_thumbnail, src, cache.levels, fmt)] = item
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                src, name = running.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    print(f"缩略图生成失败: {e}")
+                    data = None
+                success = data is not None and cache.store_thumbnail(src, name, data)
+                if success:
+                    generated += 1
+                else:
+                    failed += 1
+                if on_result:
+                    on_result(src, success)
+            if progress_callback:
+                progress_callback(generated + failed, total)
+            if is_cancelled and is_cancelled():
+                cancelled = True
+                break
+    finally:
+        # 取消时不等待排队中的任务，只让已开始的子进程自行结束
+        pool.shutdown(wait=not cancelled, cancel_futures=True)
+        cache.flush()
+    return generated, failed, cancelled
+
+
+class ThumbnailJob:
+    """调度器中的一个缩略图任务，同一原图、同一缩略图的多个请求共享一个任务"""
+    __slots__ = ("src_path", "thumb_name", "priority", "callbacks", "state")
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    CANCELLED = "cancelled"
+
+    def __init__(self, src_path, thumb_name, priority):
+        self.src_path = src_path
+        self.thumb_name = thumb_name
+        self.priority = priority
+        self.callbacks = {}  # 请求编号 -> callback(src_path, success)
+        self.state = self.QUEUED
+
+
+class ThumbnailScheduler:
+    """全局共享的缩略图调度器：固定数量的工作线程，按优先级出队，
+    相同原图的请求合并为一个任务，所有请求方都取消后未开始的任务直接丢弃"""
+    PRIORITY_VISIBLE = 0
+    PRIORITY_NORMAL = 10
+    PRIORITY_PREFETCH = 20
+
+    THROUGHPUT_WINDOW = 10.0  # 统计吞吐量的时间窗口（秒）
+
+    def __init__(self, workers=None):
+        self._condition = threading.Condition()
+        self._heap = []  # (优先级, 序号, 任务)，优先级变化后旧条目出队时跳过
+        self._jobs = {}  # (原图路径, 缩略图名) -> 未完成的任务
+        self._tickets = {}  # 请求编号 -> 任务
+        self._seq = itertools.count()
+        self._finished_times = deque()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+        self.worker_count = workers or THUMB_WORKERS
+        self._workers = []
+        for i in range(self.worker_count):
+            worker = threading.Thread(target=self._work, name=f"thumbnail-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def request(self, src_path, thumb_name, callback, priority=PRIORITY_NORMAL):
+        """请求生成缩略图（thumb_name来自ThumbnailCache.name_for），返回可用于取消的请求编号。
+        callback在工作线程中调用"""
+        with self._condition:
+            ticket = next(self._seq)
+            job = self._jobs.get((src_path, thumb_name))
+            if job is None:
+                job = ThumbnailJob(src_path, thumb_name, priority)
+                self._jobs[src_path, thumb_name] = job
+                heapq.heappush(self._heap, (priority, ticket, job))
+                self._condition.notify()
+            else:
+                self.coalesced += 1
+                if job.state == ThumbnailJob.QUEUED and priority < job.priority:
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, ticket, job))
+            job.callbacks[ticket] = callback
+            self._tickets[ticket] = job
+            return ticket
+
+    def cancel(self, ticket):
+        """取消请求；任务没有其他请求方且尚未开始时从队列中移除"""
+        if ticket is None:
+            return
+        with self._condition:
+            job = self._tickets.pop(ticket, None)
+            if job is None:
+                return
+            job.callbacks.pop(ticket, None)
+            if not job.callbacks and job.state == ThumbnailJob.QUEUED:
+                job.state = ThumbnailJob.CANCELLED
+                self._jobs.pop((job.src_path, job.thumb_name), None)
+                self.cancelled += 1
+
+    def stats(self):
+        """返回队列深度、吞吐量等统计信息，用于调整线程数"""
+        with self._condition:
+            now = time.monotonic()
+            while self._finished_times and now - self._finished_times[0] > self.THROUGHPUT_WINDOW:
+                self._finished_times.popleft()
+            return {
+                "workers": self.worker_count,
+                "queue_depth": len(self._jobs) - self.running,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "coalesced": self.coalesced,
+                "cancelled": self.cancelled,
+                "throughput": len(self._finished_times) / self.THROUGHPUT_WINDOW,
+            }
+
+    def _next_job(self):
+        with self._condition:
+            while True:
+                while self._heap:
+                    priority, _, job = heapq.heappop(self._heap)
+                    if job.state == ThumbnailJob.QUEUED and priority == job.priority:
+                        job.state = ThumbnailJob.RUNNING
+                        self.running += 1
+                        return job
+                self._condition.wait()
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            success = False
+            try:
+                fmt = "JPG" if job.thumb_name.endswith(".jpg") else "PNG"
+                data = ThumbnailGenerator(job.src_path).render_levels(get_thumbnail_cache().levels, fmt)
+                success = data is not None and \
+                    get_thumbnail_cache().store_thumbnail(job.src_path, job.thumb_name, data)
+            except Exception as e:
+                # 任何异常都按失败处理，工作线程继续运行，请求方照常收到回调
+                print(f"生成缩略图失败 {job.src_path}: {e}")
+            finally:
+                self._finish(job, success)
+
+    def _finish(self, job, success):
+        with self._condition:
+            self.running -= 1
+            self._jobs.pop((job.src_path, job.thumb_name), None)
+            for ticket in job.callbacks:
+                self._tickets.pop(ticket, None)
+            callbacks = list(job.callbacks.values())
+            job.callbacks.clear()
+            if success:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._finished_times.append(time.monotonic())
+
+        for callback in callbacks:
+            try:
+                callback(job.src_path, success)
+            except RuntimeError:
+                # 请求方控件已被销毁
+                pass
+            except Exception as e:
+                print(f"缩略图回调出错: {e}")
+
+
+_thumbnail_scheduler = None
+
+
+def get_thumbnail_scheduler():
+    """获取全局缩略图调度器"""
+    global _thumbnail_scheduler
+    if _thumbnail_scheduler is None:
+        _thumbnail_scheduler = ThumbnailScheduler()
+    return _thumbnail_scheduler
+
+
+def clean_legacy_thumbnails():
+    """缩略图由ThumbnailCache持久保存，这里只清理旧版本按文件名生成的缩略图"""
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    for file in glob.glob(os.path.join(THUMB_DIR, "*_thumb.*")):
+        try:
+            os.remove(file)
+        except OSError:
+            pass
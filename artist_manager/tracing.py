@@ -0,0 +1,185 @@
+"""可选的耗时追踪。
+
+设置环境变量 ARTIST_MANAGER_TRACE=trace.json（或 settings.TRACE_FILE）后启用：退出时写出Chrome trace-event JSON
+（可在 chrome://tracing 或 Perfetto 中打开），并输出每种操作的耗时分布。
+未启用时 traced/trace_methods 直接返回原函数，span 返回共享的空上下文，几乎没有额外开销。
+"""
+import atexit
+import bisect
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+from .settings import TRACE_FILE
+
+# 耗时分布的分桶上限（毫秒）
+HISTOGRAM_BUCKETS_MS = (1, 4, 16, 64, 256, 1024)
+# 最多保留的事件数，超出时丢弃最早的
+MAX_EVENTS = 1000000
+# 每种操作用于估计分位数的耗时样本数（蓄水池抽样），次数、总计、最大值和分桶计数不受影响
+MAX_SAMPLES = 4096
+
+
+class LatencyStats:
+    """一种操作的耗时统计：精确的次数、总计、最大值和分桶计数，加上固定大小的随机样本，内存占用有上限"""
+    __slots__ = ("count", "total", "max", "histogram", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.samples = []
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.histogram[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, seconds * 1000)] += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            # 每个耗时被保留的概率相同
+            i = random.randrange(self.count)
+            if i < MAX_SAMPLES:
+                self.samples[i] = seconds
+
+
+class Tracer:
+    """收集完整事件（ph=X），时间单位为微秒"""
+
+    def __init__(self, path):
+        self.path = path
+        self.started = time.perf_counter()
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.durations = {}  # 名称 -> LatencyStats
+        self._lock = threading.Lock()
+        self._threads = {}
+
+    def record(self, name, cat, start, end, args=None):
+        thread = threading.current_thread()
+        event = {
+            "name": name, "cat": cat, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+            "ts": (start - self.started) * 1e6, "dur": (end - start) * 1e6,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+            stats = self.durations.get(name)
+            if stats is None:
+                stats = self.durations[name] = LatencyStats()
+            stats.add(end - start)
+            self._threads.setdefault(thread.ident, thread.name)
+
+    @contextlib.contextmanager
+    def span(self, name, cat, args=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, cat, start, time.perf_counter(), args)
+
+    def summary(self):
+        """每种操作的次数、总耗时、分位数（按样本估计）和分桶计数（毫秒）"""
+        with self._lock:
+            durations = {name: (stats.count, stats.total, stats.max, list(stats.histogram), sorted(stats.samples))
+                         for name, stats in self.durations.items()}
+        result = {}
+        for name, (count, total, maximum, histogram, samples) in durations.items():
+            ms = [v * 1000 for v in samples]
+            result[name] = {
+                "count": count,
+                "total_ms": total * 1000,
+                "p50_ms": ms[len(ms) // 2],
+                "p95_ms": ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+                "max_ms": maximum * 1000,
+                "histogram": histogram,
+            }
+        return result
+
+    def format_summary(self, summary):
+        bucket_names = [f"<{b}ms" for b in HISTOGRAM_BUCKETS_MS] + [f">={HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        lines = [f"{'操作':<44}{'次数':>8}{'总计ms':>11}{'p50':>9}{'p95':>9}{'最大':>9}  " + " ".join(
+            f"{name:>8}" for name in bucket_names)]
+        for name, item in sorted(summary.items(), key=lambda kv: -kv[1]["total_ms"]):
+            lines.append(f"{name:<44}{item['count']:>8}{item['total_ms']:>11.1f}{item['p50_ms']:>9.2f}"
+                         f"{item['p95_ms']:>9.2f}{item['max_ms']:>9.2f}  "
+                         + " ".join(f"{n:>8}" for n in item["histogram"]))
+        return "\n".join(lines)
+
+    def write(self):
+        summary = self.summary()
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        events.extend({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                      for tid, name in threads.items())
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                           "otherData": {"latency_summary": summary}}, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"写入追踪文件失败: {e}", file=sys.stderr)
+        if summary:
+            print(self.format_summary(summary), file=sys.stderr)
+
+
+# 进程池的子进程会继承环境变量，只在主进程中追踪，避免子进程退出时覆盖追踪文件
+_tracer = Tracer(TRACE_FILE) if TRACE_FILE and multiprocessing.parent_process() is None else None
+if _tracer is not None:
+    atexit.register(_tracer.write)
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enabled():
+    return _tracer is not None
+
+
+def span(name, cat="app", **args):
+    """追踪一段代码：with span("名称"): ...，未启用时返回空上下文"""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, cat, args or None)
+
+
+def traced(name=None, cat="app"):
+    """函数装饰器，未启用时原样返回函数"""
+    def decorator(func):
+        if _tracer is None:
+            return func
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _tracer.record(span_name, cat, start, time.perf_counter())
+        return wrapper
+    return decorator
+
+
+def trace_methods(cat, exclude=()):
+    """类装饰器：追踪全部公开的普通方法（跳过生成器、静态方法和exclude中的方法）"""
+    def decorator(cls):
+        if _tracer is None:
+            return cls
+        import inspect
+
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or attr in exclude or not inspect.isfunction(value) \
+                    or inspect.isgeneratorfunction(value):
+                continue
+            setattr(cls, attr, traced(f"{cls.__name__}.{attr}", cat)(value))
+        return cls
+    return decorator
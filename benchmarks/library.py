@@ -0,0 +1,108 @@
+"""生成合成画师库，供基准测试使用
+
+用法: python benchmarks/library.py DIR [--artists 20000] [--images 300] [--seed 1]
+
+DIR 的结构与应用目录相同（可直接作为 ARTIST_MANAGER_HOME）：
+  artist_images/  M张AIGC常见尺寸的PNG，按 {画师ID}-{序号}.png 命名，每个画师最多3张
+  library.xlsx    N个画师，简介和备注为长中文文本，可直接导入
+  manifest.json   生成参数，参数相同时再次运行直接复用
+"""
+import argparse
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+# 常见的SDXL/Illustrious出图尺寸及高清放大后的尺寸
+AIGC_SIZES = ((832, 1216), (1216, 832), (1024, 1024), (896, 1152), (1536, 2304), (2048, 2048))
+# 常用汉字区间
+CJK_RANGE = (0x4E00, 0x9FA5)
+MANIFEST_NAME = "manifest.json"
+
+
+def cjk_text(rng, min_len, max_len):
+    """随机长度的中文文本，夹杂标点和换行"""
+    length = rng.randint(min_len, max_len)
+    chars = [chr(rng.randint(*CJK_RANGE)) for _ in range(length)]
+    for _ in range(rng.randint(0, length // 40)):
+        chars.insert(rng.randrange(len(chars)), rng.choice("，。、；\n"))
+    return "".join(chars)
+
+
+def generate_image(path, size, seed):
+    """生成一张带噪点的渐变图，压缩率接近真实出图（纯噪声过大，纯色过小）"""
+    from PIL import Image
+
+    width, height = size
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise((width // 2, height // 2), 16 + seed % 16).resize(size)
+    detail = Image.effect_noise((width // 8, height // 8), 80).resize(size, Image.BICUBIC)
+    Image.merge("RGB", (gradient, noise, detail)).save(path, "PNG", compress_level=1)
+    return os.path.getsize(path)
+
+
+def artist_id_of(index):
+    return f"artist{index:06d}"
+
+
+def generate_library(directory, artists=20000, images=300, seed=1, workers=None):
+    """生成（或复用）合成画师库，返回manifest"""
+    params = {"artists": artists, "images": images, "seed": seed}
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("params") == params:
+            return manifest
+
+    import openpyxl
+
+    rng = random.Random(seed)
+    image_dir = os.path.join(directory, "artist_images")
+    os.makedirs(image_dir, exist_ok=True)
+
+    # 图片依次分配给前面的画师，每人最多3张
+    paths, sizes, seeds = [], [], []
+    for i in range(min(images, artists * 3)):
+        paths.append(os.path.join(image_dir, f"{artist_id_of(i // 3)}-{i % 3 + 1}.png"))
+        sizes.append(rng.choice(AIGC_SIZES))
+        seeds.append(rng.randrange(1 << 30))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        image_bytes = sum(pool.map(generate_image, paths, sizes, seeds, chunksize=4))
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['画师ID', '常用名', '简介', '备注', '标记'])
+    text_chars = 0
+    for i in range(artists):
+        intro = cjk_text(rng, 100, 1500)
+        notes = cjk_text(rng, 0, 300)
+        text_chars += len(intro) + len(notes)
+        sheet.append([artist_id_of(i), cjk_text(rng, 2, 8), intro, notes, rng.random() < 0.1])
+    workbook.save(os.path.join(directory, "library.xlsx"))
+
+    manifest = {
+        "params": params,
+        "xlsx": "library.xlsx",
+        "image_count": len(paths),
+        "image_bytes": image_bytes,
+        "text_chars": text_chars,
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--artists", type=int, default=20000)
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    manifest = generate_library(args.directory, args.artists, args.images, args.seed)
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""SQLite连接调优前后对比
+
+用法: python benchmarks/sqlite_tuning.py [--rows 100000] [--edits 1000] [--lookups 5000]
+
+在临时目录生成同一份数据库的两个副本：
+  before - 旧的连接方式（默认rollback日志、synchronous=FULL、默认缓存），每次写入单独提交
+  after  - DatabaseManager当前的连接参数（WAL、synchronous=NORMAL、mmap、大缓存）
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artist_manager.db import DatabaseManager  # noqa: E402
+
+
+class LegacyDatabaseManager(DatabaseManager):
+    """调优之前的连接参数（sqlite3默认值）"""
+    CONNECTION_PRAGMAS = (
+        "PRAGMA journal_mode = DELETE",
+        "PRAGMA synchronous = FULL",
+        "PRAGMA foreign_keys = ON",
+    )
+    CACHED_STATEMENTS = 128
+
+
+def create_library(path, rows):
+    """生成rows条画师记录，约三分之一带图片"""
+    db = DatabaseManager(path, maintenance=False)
+    db.create_table()
+    with db.transaction():
+        for start in range(0, rows, 5000):
+            batch = []
+            for i in range(start, min(start + 5000, rows)):
+                artist_id = f"artist{i:06d}"
+                paths = f"{artist_id}-1.png;;{artist_id}-3.jpg" if i % 3 == 0 else ""
+                batch.append((str(uuid.uuid4()), artist_id, f"常用名{i}", "简介" * 20, paths, "备注", i % 7 == 0))
+            db.cursor.executemany("""
+            INSERT INTO artists (row_id, artist_id, common_name, introduction, image_paths, notes, marked)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, batch)
+    db.cursor.execute("PRAGMA journal_mode = DELETE")
+    db.conn.close()
+
+
+def timed(func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(db_class, path, edits, lookups, batch, seed=1):
+    rng = random.Random(seed)
+    db = db_class(path, maintenance=False)
+    rows = db.get_all_artists()
+    row_ids = [row[1] for row in rows]
+    db_ids = [row[0] for row in rows]
+    targets = rng.sample(row_ids, edits)
+
+    def single_edits():
+        for n, row_id in enumerate(targets):
+            db.update_artist(row_id, (f"edit{n}", f"名{n}", "简介", "", "备注", n % 2))
+
+    def bulk_marks():
+        # 旧代码每次set_marked单独提交；现在多步操作可以放进一个事务只提交一次
+        if not batch:
+            for n, row_id in enumerate(targets):
+                db.set_marked(row_id, n % 2 == 0)
+            return
+        with db.transaction():
+            for n, row_id in enumerate(targets):
+                db.set_marked(row_id, n % 2 == 0)
+
+    def point_lookups():
+        for db_id in rng.sample(db_ids, lookups):
+            db.get_artist_by_id(db_id)
+
+    results = {
+        "full_scan_s": timed(db.get_all_artists, repeat=3),
+        "point_lookups_s": timed(point_lookups),
+        "single_edits_s": timed(single_edits),
+        "bulk_marks_s": timed(bulk_marks),
+        "search_s": timed(lambda: db.search_artist_ids("常用名12"), repeat=5),
+    }
+    db.conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--edits", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="artist_bench_")
+    try:
+        seed_path = os.path.join(workdir, "seed.db")
+        print(f"生成 {args.rows} 条记录...")
+        create_library(seed_path, args.rows)
+
+        results = {}
+        for name, db_class, batch in (("before", LegacyDatabaseManager, False), ("after", DatabaseManager, True)):
+            path = os.path.join(workdir, f"{name}.db")
+            shutil.copyfile(seed_path, path)
+            results[name] = run(db_class, path, args.edits, args.lookups, batch)
+
+        print(f"{'项目':<18}{'before':>12}{'after':>12}{'加速':>10}")
+        for key in results["before"]:
+            before, after = results["before"][key], results["after"][key]
+            print(f"{key:<18}{before:>12.4f}{after:>12.4f}{before / after:>9.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""性能基准测试套件
+
+用法:
+  python benchmarks/suite.py [--artists 20000] [--images 300] [--library DIR] [--output FILE]
+  python benchmarks/suite.py --quick
+  python benchmarks/suite.py --compare OLD.json NEW.json
+
+在合成画师库上（见 library.py）依次测量：
+  import_from_excel       DatabaseManager.import_from_excel 导入整个xlsx
+  thumbnail_generator     ThumbnailGenerator 单线程与多线程的生成速度
+  load_data               MainWindow 首屏与滚动加载全部数据
+  apply_filters           输入搜索词到结果显示（不含输入防抖）
+  export_data             界面导出 xlsx/csv/jsonl
+  scan_missing_images     后台扫描全部记录的缺失图片并写回数据库
+  refresh_images          删除缩略图后刷新（全部重新生成），以及全部已是最新时的刷新
+界面在Qt的offscreen平台下运行。结果连同提交号、环境信息保存为JSON，可用 --compare 对比两次结果。
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from library import generate_library  # noqa: E402
+
+SEARCH_TERMS = ("artist0001", "的", "artist 1")
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    from PIL import __version__ as pillow_version
+    from PyQt5.QtCore import QT_VERSION_STR
+
+    return {
+        "commit": git_revision(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+        "qt": QT_VERSION_STR,
+        "pillow": pillow_version,
+    }
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def bench_import(manifest, library_dir):
+    from artist_manager.db import DatabaseManager
+    from artist_manager.settings import DATABASE_NAME
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DATABASE_NAME + suffix):
+            os.remove(DATABASE_NAME + suffix)
+    db = DatabaseManager()
+    try:
+        seconds, row_ids = timed(lambda: db.import_from_excel(os.path.join(library_dir, manifest["xlsx"])))
+    finally:
+        db.conn.close()
+    return {"seconds": seconds, "rows": len(row_ids), "rows_per_s": len(row_ids) / seconds}
+
+
+def bench_thumbnails(limit=None):
+    from artist_manager.images import get_image_index, resolve_image_path
+    from artist_manager.settings import THUMB_WORKERS
+    from artist_manager.thumbs import ThumbnailGenerator
+
+    index = get_image_index()
+    paths = sorted(resolve_image_path(name) for slot in (1, 2, 3) for name in index.slot_map(slot).values())
+    paths = paths[:limit] if limit else paths
+    if not paths:
+        return {}
+    source_mb = sum(os.path.getsize(p) for p in paths) / 1024 / 1024
+
+    def render(path):
+        return ThumbnailGenerator(path).render_levels(fmt="PNG") is not None
+
+    sequential, ok = timed(lambda: sum(map(render, paths)))
+    with ThreadPoolExecutor(max_workers=THUMB_WORKERS) as pool:
+        parallel, _ = timed(lambda: sum(pool.map(render, paths)))
+    return {
+        "seconds": sequential,
+        "images": len(paths),
+        "failed": len(paths) - ok,
+        "source_mb": source_mb,
+        "images_per_s": len(paths) / sequential,
+        "workers": THUMB_WORKERS,
+        "parallel_seconds": parallel,
+        "parallel_images_per_s": len(paths) / parallel,
+    }
+
+
+class GuiBench:
+    """在offscreen平台上驱动MainWindow，所有弹窗替换为直接返回"""
+
+    def __init__(self, workdir, timeout=300):
+        from PyQt5.QtWidgets import QApplication, QMessageBox, QFileDialog
+
+        self.workdir = workdir
+        self.timeout = timeout
+        self.app = QApplication.instance() or QApplication([sys.argv[0]])
+        QMessageBox.information = staticmethod(lambda *args, **kwargs: QMessageBox.Ok)
+        QMessageBox.critical = staticmethod(lambda *args, **kwargs: QMessageBox.Ok)
+        QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.Yes)
+        self._save_path = None
+        QFileDialog.getSaveFileName = staticmethod(lambda *args, **kwargs: (self._save_path, ""))
+
+        import main
+        self.main = main
+        self.window = None
+
+    def wait(self, predicate):
+        """处理事件直到条件满足"""
+        from PyQt5.QtCore import QEventLoop
+
+        deadline = time.perf_counter() + self.timeout
+        while not predicate():
+            if time.perf_counter() > deadline:
+                raise TimeoutError("基准测试等待超时")
+            self.app.processEvents(QEventLoop.AllEvents, 10)
+            time.sleep(0.001)
+
+    def wait_idle_thumbnails(self):
+        scheduler = self.main.get_thumbnail_scheduler()
+        # 先让视图完成一次绘制并提交缩略图请求
+        self.app.processEvents()
+        self.wait(lambda: not (scheduler.stats()["queue_depth"] or scheduler.stats()["running"]))
+
+    def load_data(self):
+        model_ready = lambda: self.window.model.rowCount() > 0 and not self.window.model.fetching  # noqa: E731
+
+        start = time.perf_counter()
+        self.window = self.main.MainWindow()
+        self.window.show()
+        self.wait(model_ready)
+        first_page = time.perf_counter() - start
+
+        model = self.window.model
+        start = time.perf_counter()
+        while model.canFetchMore():
+            model.fetchMore()
+            self.wait(lambda: not model.fetching)
+        full = time.perf_counter() - start
+        rows = model.rowCount()
+
+        start = time.perf_counter()
+        self.window.load_data()
+        self.wait(model_ready)
+        reload_first_page = time.perf_counter() - start
+        return {
+            "seconds": first_page,
+            "first_page_s": first_page,
+            "full_load_s": full,
+            "warm_reload_s": reload_first_page,
+            "rows": rows,
+        }
+
+    def apply_filters(self):
+        window = self.window
+        results = {}
+        received = []
+        window.search_worker.results_ready.connect(lambda seq, ids: received.append(seq))
+        for term in SEARCH_TERMS:
+            start = time.perf_counter()
+            window.search_edit.setText(term)
+            # 跳过输入防抖，直接搜索
+            window.search_timer.stop()
+            window.run_search()
+            seq = window._search_seq
+            self.wait(lambda: seq in received and not window.model.fetching)
+            results[term] = {"seconds": time.perf_counter() - start, "rows": window.model.rowCount()}
+
+        start = time.perf_counter()
+        window.search_edit.setText("")
+        self.wait(lambda: not window.model.search_active and not window.model.fetching)
+        clear = time.perf_counter() - start
+        return {
+            "seconds": sum(r["seconds"] for r in results.values()) / len(results),
+            "terms": results,
+            "clear_s": clear,
+        }
+
+    def export_data(self):
+        results = {}
+        for ext in (".xlsx", ".csv", ".jsonl"):
+            self._save_path = os.path.join(self.workdir, "export" + ext)
+            start = time.perf_counter()
+            self.window.export_data()
+            self.wait(lambda: self.window.export_worker is None)
+            results[ext] = {"seconds": time.perf_counter() - start, "bytes": os.path.getsize(self._save_path)}
+            os.remove(self._save_path)
+        return {"seconds": sum(r["seconds"] for r in results.values()), "formats": results}
+
+    def scan_missing_images(self):
+        model = self.window.model
+        while model.canFetchMore():
+            model.fetchMore()
+            self.wait(lambda: not model.fetching)
+        start = time.perf_counter()
+        self.window.scan_missing_images()
+        self.wait(lambda: self.window.scan_future is None)
+        return {"seconds": time.perf_counter() - start, "rows": model.rowCount()}
+
+    def refresh_images(self):
+        cache = self.main.get_thumbnail_cache()
+        self.wait_idle_thumbnails()
+        cache.clear()
+        start = time.perf_counter()
+        self.window.refresh_images()
+        self.wait(lambda: self.window.refresh_worker is None)
+        cold = time.perf_counter() - start
+        regenerated = cache.stats()["entries"]
+
+        start = time.perf_counter()
+        self.window.refresh_images()
+        self.wait(lambda: self.window.refresh_worker is None)
+        warm = time.perf_counter() - start
+        return {"seconds": cold, "regenerated": regenerated, "up_to_date_s": warm}
+
+    def close(self):
+        if self.window is not None:
+            self.window.close()
+            self.window.deleteLater()
+            self.app.processEvents()
+
+
+def run_suite(args):
+    library_dir = args.library or tempfile.mkdtemp(prefix="artist_bench_lib_")
+    os.makedirs(library_dir, exist_ok=True)
+    # 必须在导入 artist_manager 之前设置
+    os.environ["ARTIST_MANAGER_HOME"] = library_dir
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    print(f"生成合成画师库: {library_dir}")
+    manifest = generate_library(library_dir, args.artists, args.images, args.seed)
+    shutil.rmtree(os.path.join(library_dir, "artist_thumbs"), ignore_errors=True)
+
+    from artist_manager.settings import ensure_directories
+    ensure_directories()
+
+    results = OrderedDict()
+
+    def record(name, func):
+        print(f"  {name}...", flush=True)
+        results[name] = func()
+        print(f"    {results[name].get('seconds', 0):.3f}s")
+
+    workdir = tempfile.mkdtemp(prefix="artist_bench_out_")
+    try:
+        record("import_from_excel", lambda: bench_import(manifest, library_dir))
+        record("thumbnail_generator", lambda: bench_thumbnails(args.thumbnail_limit))
+        gui = GuiBench(workdir)
+        try:
+            record("load_data", gui.load_data)
+            record("apply_filters", gui.apply_filters)
+            record("export_data", gui.export_data)
+            record("scan_missing_images", gui.scan_missing_images)
+            record("refresh_images", gui.refresh_images)
+        finally:
+            gui.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        if not args.library:
+            shutil.rmtree(library_dir, ignore_errors=True)
+
+    return {"environment": environment(), "library": manifest, "results": results}
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{'项目':<24}{old['environment']['commit'] or 'old':>14}{new['environment']['commit'] or 'new':>14}{'变化':>10}")
+    for name, result in new["results"].items():
+        before = old["results"].get(name, {}).get("seconds")
+        after = result.get("seconds")
+        if before is None or after is None:
+            continue
+        print(f"{name:<24}{before:>14.4f}{after:>14.4f}{(after - before) / before:>+10.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--artists", type=int, default=20000)
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--quick", action="store_true", help="小规模快速运行（2000个画师、30张图片）")
+    parser.add_argument("--library", help="合成画师库目录，参数相同时复用，不指定时使用临时目录并在结束后删除")
+    parser.add_argument("--thumbnail-limit", type=int, help="缩略图测试最多使用的图片数量")
+    parser.add_argument("--output", help="结果JSON路径（默认 benchmarks/results/<时间>-<提交号>.json）")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="对比两次结果")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.quick:
+        args.artists, args.images = 2000, 30
+
+    report = run_suite(args)
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{report['environment']['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}")
+
+
+if __name__ == "__main__":
+    main()
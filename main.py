@@ -1,20 +1,39 @@
+import time
+
+# 启动计时的起点，在导入其他模块之前记录
+_STARTUP_STARTED = time.perf_counter()
+
 import sys
 import os
 import sqlite3
-import shutil
-import glob
+import json
 import uuid
-import pandas as pd
+import threading
+import multiprocessing
+import types
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QTableWidget, QTableWidgetItem, QWidget, QVBoxLayout,
+    QApplication, QMainWindow, QTableView, QWidget, QVBoxLayout,
     QHBoxLayout, QPushButton, QLabel, QFileDialog, QMessageBox, QAbstractItemView,
     QHeaderView, QSizePolicy, QLineEdit, QMenu, QAction, QDialog, QGridLayout,
-    QScrollArea, QTextEdit, QCheckBox, QProgressDialog
+    QScrollArea, QTextEdit, QCheckBox, QProgressDialog, QStyledItemDelegate, QStyle,
+    QStyleOptionButton
 )
-from PyQt5.QtCore import Qt, QSize, QMimeData, QPoint, QEvent, QTimer, QUrl, QThread, pyqtSignal, QRect
-from PyQt5.QtGui import QPixmap, QImage, QIcon, QDrag, QKeyEvent, QClipboard, QMouseEvent, QPainter, QColor, \
+from PyQt5.QtCore import Qt, QSize, QMimeData, QPoint, QEvent, QTimer, QUrl, QThread, pyqtSignal, QRect, \
+    QObject, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QPixmap, QImage, QIcon, QDrag, QKeyEvent, QClipboard, QMouseEvent, QColor, \
     QDesktopServices, QTextCursor, QRegion
 
+from artist_manager.db import DatabaseManager, ArtistChange
+from artist_manager.excel import EXPORT_WRITERS
+from artist_manager.images import resolve_image_path, split_image_paths, is_temp_image, clean_temp_images, \
+    save_pasted_image, IMAGE_EXTENSIONS
+from artist_manager.settings import IMAGE_DIR, PIXMAP_CACHE_MB, ensure_directories
+from artist_manager.tracing import traced, span
+from artist_manager.thumbs import ThumbnailScheduler, get_thumbnail_cache, get_thumbnail_scheduler, \
+    refresh_thumbnails, clean_legacy_thumbnails
+
 
 def resource_path(relative_path):
     """获取资源的绝对路径。在打包后，资源位于临时目录中；在开发环境中，则位于当前目录。"""
@@ -25,189 +44,573 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
-def get_app_base_dir():
-    """获取应用程序所在的基础目录"""
-    if getattr(sys, 'frozen', False):
-        # 打包后的环境
-        return os.path.dirname(os.path.abspath(sys.executable))
-    else:
-        # 开发环境
-        return os.path.dirname(os.path.abspath(__file__))
+class StartupTimer:
+    """记录启动各阶段距导入main的耗时，首屏数据绘制后输出一次报告。
+    环境变量 ARTIST_MANAGER_STARTUP_REPORT 为文件路径时同时写入JSON，便于比较不同版本"""
+
+    def __init__(self, started):
+        self.started = started
+        self.marks = OrderedDict()
+        self.reported = False
+
+    def mark(self, name):
+        """记录某阶段完成的时间，同一阶段只记录第一次"""
+        self.marks.setdefault(name, time.perf_counter() - self.started)
+
+    def report(self):
+        """输出报告，只输出一次，返回报告文本"""
+        if self.reported:
+            return None
+        self.reported = True
+        text = "启动耗时: " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.marks.items())
+        print(text)
+        path = os.environ.get("ARTIST_MANAGER_STARTUP_REPORT")
+        if path:
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump({name: round(seconds, 4) for name, seconds in self.marks.items()}, f)
+            except OSError as e:
+                print(f"写入启动报告失败: {e}")
+        return text
+
+
+startup_timer = StartupTimer(_STARTUP_STARTED)
+startup_timer.mark("imports")
+
+
+class PixmapCache:
+    """进程内共享的已缩放缩略图缓存，按占用字节数限制大小，LRU淘汰。
+    QPixmap只能在GUI线程使用，因此本缓存也只在GUI线程访问"""
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._pixmaps = OrderedDict()  # 键 -> (QPixmap, 字节数)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def get(self, key):
+        item = self._pixmaps.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._pixmaps.move_to_end(key)
+        return item[0]
+
+    def put(self, key, pixmap):
+        size = self.pixmap_bytes(pixmap)
+        old = self._pixmaps.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old[1]
+        self._pixmaps[key] = (pixmap, size)
+        self.total_bytes += size
+        while self.total_bytes > self.budget_bytes and len(self._pixmaps) > 1:
+            _, (_, evicted_size) = self._pixmaps.popitem(last=False)
+            self.total_bytes -= evicted_size
+        return pixmap
+
+    def clear(self):
+        self._pixmaps.clear()
+        self.total_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._pixmaps),
+            "bytes": self.total_bytes,
+            "budget": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_pixmap_cache = None
+
+
+def get_pixmap_cache():
+    """获取全局缩略图内存缓存"""
+    global _pixmap_cache
+    if _pixmap_cache is None:
+        _pixmap_cache = PixmapCache(PIXMAP_CACHE_MB * 1024 * 1024)
+    return _pixmap_cache
+
+
+def device_pixel_ratio():
+    """屏幕的设备像素比，高DPI屏幕上缩略图按物理像素加载"""
+    app = QApplication.instance()
+    return app.devicePixelRatio() if app is not None else 1.0
+
+
+def fit_pixmap(pixmap, size, ratio):
+    """缩小到绘制尺寸（物理像素）以内并设置设备像素比，已经合适时不缩放"""
+    pixels = round(size * ratio)
+    if max(pixmap.width(), pixmap.height()) > pixels:
+        pixmap = pixmap.scaled(pixels, pixels, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    pixmap.setDevicePixelRatio(ratio)
+    return pixmap
+
+
+def load_thumbnail_pixmap(src_path, size=80):
+    """从缩略图金字塔加载与绘制尺寸相同的一级，优先使用内存缓存。没有缩略图时返回None"""
+    cache = get_thumbnail_cache()
+    name = cache.lookup(src_path)
+    if not name:
+        return None
+    key = f"{name}@{size}"
+    pixmaps = get_pixmap_cache()
+    pixmap = pixmaps.get(key)
+    if pixmap is None:
+        ratio = device_pixel_ratio()
+        data = cache.read(name, cache.level_for(round(size * ratio)))
+        pixmap = QPixmap()
+        if not data or not pixmap.loadFromData(data):
+            # 缩略图数据已丢失
+            cache.invalidate(src_path)
+            return None
+        # 各级缩略图与常用的绘制尺寸一致，通常不需要再缩放
+        pixmap = pixmaps.put(key, fit_pixmap(pixmap, size, ratio))
+    return pixmap
+
+
+def load_source_pixmap(src_path, size=80):
+    """没有缩略图时直接解码原图并缩放，结果同样放入内存缓存。失败时返回None"""
+    name = get_thumbnail_cache().name_for(src_path)
+    if not name:
+        return None
+    key = f"{name}@{size}"
+    pixmaps = get_pixmap_cache()
+    pixmap = pixmaps.get(key)
+    if pixmap is None:
+        pixmap = QPixmap(src_path)
+        if pixmap.isNull():
+            return None
+        pixmap = pixmaps.put(key, fit_pixmap(pixmap, size, device_pixel_ratio()))
+    return pixmap
+
+
+def qimage_to_pil(image):
+    """QImage转换为Pillow Image（复制像素数据），可以在后台线程调用"""
+    from PIL import Image
+
+    image = image.convertToFormat(QImage.Format_RGBA8888)
+    data = image.constBits().asstring(image.sizeInBytes())
+    return Image.frombuffer("RGBA", (image.width(), image.height()), data, "raw", "RGBA", image.bytesPerLine(), 1)
+
+
+_paste_executor = None
+
+
+def get_paste_executor():
+    """粘贴图片编码使用的后台线程"""
+    global _paste_executor
+    if _paste_executor is None:
+        _paste_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="paste-encode")
+    return _paste_executor
+
+
+def remove_pasted_image(future):
+    """放弃的粘贴编码完成后删除生成的临时图片"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        os.remove(future.result())
+    except OSError:
+        pass
+
+
+class ThumbnailProvider(QObject):
+    """表格委托使用的缩略图提供者，只为正在绘制的图片加载缩略图"""
+    thumbnail_ready = pyqtSignal(str)  # 原图绝对路径
+    _job_finished = pyqtSignal(str, bool)  # 调度器工作线程 -> GUI线程
+    _cache_validated = pyqtSignal(object)  # 失效的原图路径列表
+
+    LOADING = "loading"
+    READY = "ready"
+    MISSING = "missing"
+    FAILED = "failed"
+
+    def __init__(self, size=80, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self._tickets = {}  # 原图路径 -> 调度器请求编号
+        self._missing = set()
+        self._failed = set()
+        self._fallback = set()  # 缩略图生成失败、直接显示原图的图片
+        self._scheduler = get_thumbnail_scheduler()
+        self._job_finished.connect(self._on_thumbnail_generated)
+        self._cache_validated.connect(self._on_cache_validated)
+
+    def validate_cache_async(self):
+        """在后台校验持久化缩略图，原图已变化的缩略图会重新生成"""
+        threading.Thread(target=lambda: self._cache_validated.emit(get_thumbnail_cache().validate()),
+                         name="thumbnail-cache-validate", daemon=True).start()
+
+    def _on_cache_validated(self, stale):
+        for src in stale:
+            self.invalidate(src)
+        if stale:
+            self.thumbnail_ready.emit("")
+
+    def lookup(self, path, priority=ThumbnailScheduler.PRIORITY_VISIBLE):
+        """返回 (状态, 缩略图)，需要时在后台生成缩略图"""
+        src = resolve_image_path(path)
+        if not src:
+            return self.MISSING, None
+
+        if src in self._missing:
+            return self.MISSING, None
+        if src in self._failed:
+            return self.FAILED, None
+        if src in self._tickets:
+            return self.LOADING, None
+
+        if src in self._fallback:
+            pixmap = load_source_pixmap(src, self.size)
+        else:
+            pixmap = load_thumbnail_pixmap(src, self.size)
+        if pixmap is not None:
+            return self.READY, pixmap
 
+        thumb_name = get_thumbnail_cache().name_for(src)
+        if not thumb_name:
+            self._missing.add(src)
+            return self.MISSING, None
 
-# 获取基础目录
-BASE_DIR = get_app_base_dir()
+        self._tickets[src] = self._scheduler.request(src, thumb_name, self._job_finished.emit, priority)
+        return self.LOADING, None
 
+    def prefetch(self, paths):
+        """为即将显示的图片提前排队生成缩略图（低优先级，不解码）"""
+        for path in paths:
+            src = resolve_image_path(path)
+            if not src or src in self._tickets or src in self._missing or src in self._fallback:
+                continue
+            cache = get_thumbnail_cache()
+            thumb_name = None if cache.lookup(src) else cache.name_for(src)
+            if thumb_name:
+                self._tickets[src] = self._scheduler.request(
+                    src, thumb_name, self._job_finished.emit, ThumbnailScheduler.PRIORITY_PREFETCH)
+
+    def retain(self, paths):
+        """取消不在给定集合中的排队请求（例如已滚出可见区域的行）"""
+        keep = {resolve_image_path(p) for p in paths if p}
+        for src in [s for s in self._tickets if s not in keep]:
+            self._scheduler.cancel(self._tickets.pop(src))
+
+    def invalidate(self, path=None):
+        """丢弃缓存的缩略图，path为空时清空全部"""
+        if path is None:
+            get_pixmap_cache().clear()
+            self._missing.clear()
+            self._failed.clear()
+            self._fallback.clear()
+            return
+        # 内存缓存以缩略图标识为键，原图变化后键也会变化，只需清除状态标记
+        src = resolve_image_path(path)
+        self._missing.discard(src)
+        self._failed.discard(src)
+        self._fallback.discard(src)
+
+    def _on_thumbnail_generated(self, src_path, success):
+        if self._tickets.pop(src_path, None) is None:
+            return  # 请求已取消
+
+        pixmap = load_thumbnail_pixmap(src_path, self.size) if success else None
+        if pixmap is None:
+            # 生成失败时尝试直接加载原图
+            if load_source_pixmap(src_path, self.size) is not None:
+                self._fallback.add(src_path)
+            else:
+                self._failed.add(src_path)
+        self.thumbnail_ready.emit(src_path)
 
-# 创建必要的目录
-def ensure_directories():
-    """确保必要的目录存在"""
-    # 图片目录 - 相对于可执行文件位置
-    image_dir = os.path.join(BASE_DIR, "artist_images")
-    if not os.path.exists(image_dir):
-        os.makedirs(image_dir)
 
-    # 缩略图目录
-    thumb_dir = os.path.join(BASE_DIR, "artist_thumbs")
-    if not os.path.exists(thumb_dir):
-        os.makedirs(thumb_dir)
+class SearchWorker(QThread):
+    """后台搜索线程，使用独立的数据库连接，只执行最新的一次搜索请求"""
+    results_ready = pyqtSignal(int, object)  # 请求序号, 按显示顺序的数据库ID列表
 
-    # 数据库路径 - 相对于可执行文件位置
-    db_path = os.path.join(BASE_DIR, "artists.db")
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._condition = threading.Condition()
+        self._pending = None
+        self._stopped = False
+
+    def search(self, seq, text, sort_field=None, descending=False):
+        """提交搜索请求，尚未执行的旧请求会被覆盖。未指定排序列时按相关度排序"""
+        with self._condition:
+            self._pending = (seq, text, sort_field, descending)
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self.wait()
 
-    return db_path, image_dir, thumb_dir
+    def run(self):
+        try:
+            db = DatabaseManager(maintenance=False)
+        except sqlite3.Error as e:
+            # 错误由数据库线程提示，这里每次搜索都返回空结果，不让界面等待
+            print(f"搜索线程打开数据库失败: {e}")
+            db = None
+        try:
+            while True:
+                with self._condition:
+                    while self._pending is None and not self._stopped:
+                        self._condition.wait()
+                    if self._stopped:
+                        return
+                    seq, text, sort_field, descending = self._pending
+                    self._pending = None
+
+                try:
+                    ids = db.search_artist_ids(text, sort_field, descending) if db is not None else []
+                except sqlite3.Error as e:
+                    print(f"搜索失败: {e}")
+                    ids = []
+                self.results_ready.emit(seq, ids)
+        finally:
+            if db is not None:
+                db.conn.close()
+
+
+class DatabaseFuture(QObject):
+    """DatabaseExecutor.submit 的返回值。信号在提交任务的（GUI）线程中接收"""
+    batch = pyqtSignal(object)  # 生成器结果的一批数据
+    finished = pyqtSignal(object)  # 最终结果，分批返回时为None
+    failed = pyqtSignal(str)  # 错误信息
+    progress = pyqtSignal(int, int)  # 已处理数量, 总数
+    _done = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cancelled = threading.Event()
+        # 所有结果信号送达之后再释放
+        self._done.connect(self.deleteLater)
+
+    def cancel(self):
+        """请求取消，尚未开始的任务直接跳过（结果为None），分批结果停止返回"""
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
 
+    def then(self, on_finished, on_failed=None):
+        self.finished.connect(on_finished)
+        if on_failed:
+            self.failed.connect(on_failed)
+        return self
 
-# 初始化目录和路径
-DATABASE_NAME, IMAGE_DIR, THUMB_DIR = ensure_directories()
 
+class DatabaseExecutor(QThread):
+    """独占数据库连接的后台线程，任务按提交顺序依次执行，GUI线程不直接访问数据库。
 
-class ThumbnailGenerator(QThread):
-    """缩略图生成线程"""
-    finished = pyqtSignal(str, bool)  # 原图路径, 是否成功
+    submit(func, *args) 在后台线程执行 func(db, *args)，返回 DatabaseFuture；
+    func 返回生成器时每一项作为一批结果通过 batch 信号返回。
+    数据变更在后台线程查询出最新行数据后通过 changed 信号发出"""
+    changed = pyqtSignal(object, object)  # ArtistChange, 受影响行的最新数据（删除时为空列表）
+    ready = pyqtSignal()  # 数据库已打开并完成迁移
+    open_failed = pyqtSignal(str)  # 数据库无法打开或迁移失败，之后提交的任务都以该错误失败
+    _submitted = pyqtSignal(object)
 
-    def __init__(self, src_path, dest_path, size=(300, 300), parent=None):
+    def __init__(self, db_path=None, parent=None):
         super().__init__(parent)
-        self.src_path = src_path
-        self.dest_path = dest_path
-        self.size = size
+        self.db_path = db_path
+        self._condition = threading.Condition()
+        self._jobs = deque()
+        self._stopped = False
+        # 任务经事件队列入队：调用方在submit返回后连接信号，不会错过结果；排队事件保持提交顺序
+        self._submitted.connect(self._enqueue, Qt.QueuedConnection)
+
+    def submit(self, func, *args, with_progress=False, **kwargs):
+        """在GUI线程提交任务。with_progress为True时额外传入 progress_callback 和 is_cancelled 参数"""
+        future = DatabaseFuture(self)
+        if with_progress:
+            kwargs["progress_callback"] = future.progress.emit
+            kwargs["is_cancelled"] = future.is_cancelled
+        self._submitted.emit((future, func, args, kwargs))
+        return future
+
+    def _enqueue(self, job):
+        with self._condition:
+            self._jobs.append(job)
+            self._condition.notify()
+
+    def stop(self):
+        """执行完已提交的任务后退出"""
+        # 先把还在事件队列里的提交送入任务队列
+        QApplication.sendPostedEvents(self, QEvent.MetaCall)
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self.wait()
 
     def run(self):
+        # 清理临时文件、迁移数据库结构也在后台线程完成
+        db = None
+        error = None
         try:
-            image = QImage(self.src_path)
-            if not image.isNull():
-                # 计算保持比例的缩放尺寸
-                scaled = image.scaled(self.size[0], self.size[1],
-                                      Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                scaled.save(self.dest_path)
-                self.finished.emit(self.src_path, True)
+            db = DatabaseManager(self.db_path)
+        except Exception as e:
+            # 数据库被锁定、文件损坏或迁移失败：线程继续运行，让每个任务都收到错误，不会一直等待
+            print(f"打开数据库失败: {e}")
+            error = f"无法打开数据库: {e}"
+            self.open_failed.emit(error)
+        else:
+            db.add_listener(lambda change: self._emit_change(db, change))
+            self.ready.emit()
+        try:
+            while True:
+                with self._condition:
+                    while not self._jobs and not self._stopped:
+                        self._condition.wait()
+                    if not self._jobs:
+                        return
+                    future, func, args, kwargs = self._jobs.popleft()
+                if db is None:
+                    future.failed.emit(error)
+                    future._done.emit()
+                else:
+                    self._execute(db, future, func, args, kwargs)
+        finally:
+            if db is not None:
+                db.conn.close()
+
+    def _execute(self, db, future, func, args, kwargs):
+        try:
+            if future.is_cancelled():
+                # 尚未开始就被取消的任务不执行，结果为None
+                future.finished.emit(None)
                 return
+            result = func(db, *args, **kwargs)
+            if isinstance(result, types.GeneratorType):
+                for chunk in result:
+                    if future.is_cancelled():
+                        result.close()
+                        break
+                    future.batch.emit(chunk)
+                result = None
+            future.finished.emit(result)
         except Exception as e:
-            print(f"缩略图生成失败: {e}")
-        self.finished.emit(self.src_path, False)
+            print(f"数据库操作失败: {e}")
+            future.failed.emit(str(e))
+        finally:
+            future._done.emit()
 
+    def _emit_change(self, db, change):
+        rows = [] if change.kind == ArtistChange.DELETE else db.get_artists_by_row_ids(change.row_ids)
+        self.changed.emit(change, rows)
 
-class PlainTextEdit(QTextEdit):
-    """纯文本编辑框，粘贴时去除格式"""
 
-    def insertFromMimeData(self, source):
-        if source.hasText():
-            # 获取纯文本
-            text = source.text()
-            # 插入纯文本
-            self.textCursor().insertText(text)
-        else:
-            super().insertFromMimeData(source)
+class ExportWorker(QThread):
+    """后台导出线程，直接从数据库流式写出，可通过requestInterruption取消"""
+    progress = pyqtSignal(int, int)  # 已导出行数, 总行数
+    finished_export = pyqtSignal(object, str)  # 导出行数（取消时为None）, 错误信息
+
+    def __init__(self, file_path, search_text=None, sort_field=None, descending=False, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.search_text = search_text
+        self.sort_field = sort_field
+        self.descending = descending
+
+    def run(self):
+        db = None
+        try:
+            db = DatabaseManager(maintenance=False)
+            count = db.export_to_file(
+                self.file_path, self.search_text, self.sort_field, self.descending,
+                progress_callback=self.progress.emit,
+                is_cancelled=self.isInterruptionRequested
+            )
+            self.finished_export.emit(count, "")
+        except Exception as e:
+            self.finished_export.emit(None, str(e))
+        finally:
+            if db is not None:
+                db.conn.close()
 
 
-class ImageDisplayWidget(QLabel):
-    """只用于展示图片的控件，支持缩略图"""
+class ThumbnailRefreshWorker(QThread):
+    """后台刷新缩略图：只重新生成缺失或过期的，多进程并行，可通过requestInterruption取消"""
+    progress = pyqtSignal(int, int)  # 已处理张数, 需要生成的总张数
+    generated = pyqtSignal(str)  # 已生成新缩略图的原图路径
+    finished_refresh = pyqtSignal(object, str)  # (生成数, 失败数, 是否取消), 错误信息
 
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setAlignment(Qt.AlignCenter)
-        self.setStyleSheet("border: 1px solid #ddd; background-color: #f8f8f8;")
-        self.setFixedSize(80, 80)
-        self.image_path = None
-        self.thread = None
-
-    def setImage(self, path):
-        # 使用相对路径或修正的绝对路径
-        if path and not os.path.isabs(path):
-            # 如果是相对路径，转换为相对于应用目录的绝对路径
-            abs_path = os.path.join(IMAGE_DIR, path)
-            if os.path.exists(abs_path):
-                self.image_path = abs_path
-            else:
-                self.image_path = None
-        else:
-            # 如果是绝对路径，直接使用
-            self.image_path = path if (path and os.path.exists(path)) else None
-
-        if self.image_path:
-            # 获取缩略图路径
-            thumb_path = self.get_thumbnail_path(self.image_path)
-
-            if os.path.exists(thumb_path):
-                # 直接加载现有缩略图
-                pixmap = QPixmap(thumb_path).scaled(80, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.setPixmap(pixmap)
-                self.setCursor(Qt.PointingHandCursor)
-            else:
-                # 显示加载占位符
-                self.set_placeholder("加载中...")
+    def run(self):
+        try:
+            db = DatabaseManager(maintenance=False)
+            try:
+                paths = [resolve_image_path(path) for path in db.get_image_paths()]
+            finally:
+                db.conn.close()
+        except Exception as e:
+            self.finished_refresh.emit(None, str(e))
+            return
 
-                # 启动线程生成缩略图
-                self.thread = ThumbnailGenerator(self.image_path, thumb_path)
-                self.thread.finished.connect(self.on_thumbnail_generated)
-                self.thread.start()
-        else:
-            self.clear()
-            self.setCursor(Qt.ArrowCursor)
-
-    def set_placeholder(self, text):
-        """显示加载占位符"""
-        pixmap = QPixmap(80, 80)
-        pixmap.fill(QColor(240, 240, 240))
-        painter = QPainter(pixmap)
-        painter.setPen(QColor(150, 150, 150))
-        painter.drawText(QRect(0, 0, 80, 80), Qt.AlignCenter, text)
-        painter.end()
-        self.setPixmap(pixmap)
-
-    def on_thumbnail_generated(self, src_path, success):
-        """缩略图生成完成回调"""
-        if src_path == self.image_path:  # 确保当前显示的仍是同一图片
+        def on_result(src, success):
             if success:
-                thumb_path = self.get_thumbnail_path(src_path)
-                pixmap = QPixmap(thumb_path).scaled(80, 80,
-                                                    Qt.KeepAspectRatio,
-                                                    Qt.SmoothTransformation)
-                self.setPixmap(pixmap)
-                self.setCursor(Qt.PointingHandCursor)
-            else:
-                # 生成失败时尝试直接加载原图（小尺寸）
-                try:
-                    pixmap = QPixmap(src_path).scaled(80, 80,
-                                                      Qt.KeepAspectRatio,
-                                                      Qt.SmoothTransformation)
-                    self.setPixmap(pixmap)
-                    self.setCursor(Qt.PointingHandCursor)
-                except:
-                    self.set_placeholder("加载失败")
+                self.generated.emit(src)
 
-    def get_thumbnail_path(self, original_path):
-        """生成缩略图路径"""
-        if not original_path:
-            return ""
+        try:
+            result = refresh_thumbnails(paths, progress_callback=self.progress.emit,
+                                        is_cancelled=self.isInterruptionRequested, on_result=on_result)
+            self.finished_refresh.emit(result, "")
+        except Exception as e:
+            self.finished_refresh.emit(None, str(e))
 
-        # 获取文件名和扩展名
-        filename = os.path.basename(original_path)
-        name, ext = os.path.splitext(filename)
 
-        # 缩略图保存在单独的缩略图目录
-        return os.path.join(THUMB_DIR, f"{name}_thumb{ext}")
+class MetadataIndexWorker(QThread):
+    """后台增量索引图片中的生成参数（只读取PNG文本块），使用独立的数据库连接，可通过requestInterruption取消"""
+    finished_index = pyqtSignal(object, str)  # 索引报告（取消时为None）, 错误信息
 
-    def mouseDoubleClickEvent(self, event):
-        """双击查看大图"""
-        if self.image_path and os.path.exists(self.image_path):
-            QDesktopServices.openUrl(QUrl.fromLocalFile(self.image_path))
-        super().mouseDoubleClickEvent(event)
+    def run(self):
+        db = None
+        try:
+            db = DatabaseManager(maintenance=False)
+            report = db.index_image_metadata(is_cancelled=self.isInterruptionRequested)
+            self.finished_index.emit(report, "")
+        except Exception as e:
+            self.finished_index.emit(None, str(e))
+        finally:
+            if db is not None:
+                db.conn.close()
 
-    def update_image(self):
-        """强制刷新当前图片"""
-        if self.image_path:
-            # 删除旧缩略图
-            thumb_path = self.get_thumbnail_path(self.image_path)
-            if os.path.exists(thumb_path):
-                os.remove(thumb_path)
 
-            # 重新生成并显示
-            self.setImage(self.image_path)
+def format_generation_metadata(slot, metadata):
+    """编辑界面显示的一张图片的生成参数"""
+    lines = [f"图片 {slot}（{metadata['generator']}）"]
+    for label, field in (("模型", "model"), ("种子", "seed"), ("提示词", "prompt"), ("反向提示词", "negative_prompt"),
+                         ("参数", "settings")):
+        if metadata.get(field):
+            lines.append(f"{label}: {metadata[field]}")
+    return "\n".join(lines)
+
+
+class PlainTextEdit(QTextEdit):
+    """纯文本编辑框，粘贴时去除格式"""
+
+    def insertFromMimeData(self, source):
+        if source.hasText():
+            # 获取纯文本
+            text = source.text()
+            # 插入纯文本
+            self.textCursor().insertText(text)
+        else:
+            super().insertFromMimeData(source)
 
 
 class ImageUploadWidget(QWidget):
     """用于编辑界面的图片上传控件"""
+    paste_encoded = pyqtSignal(int, object)  # 位置, Future（编码线程 -> GUI线程）
+    images_changed = pyqtSignal()  # 图片有变化，显示已更新
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -215,6 +618,8 @@ class ImageUploadWidget(QWidget):
         self.setMinimumSize(180, 120)
         self.images = []
         self.selected_index = -1
+        self._pending = {}  # 位置 -> (正在编码的粘贴图片Future, 预览图)
+        self.paste_encoded.connect(self.on_paste_encoded)
         self.setFocusPolicy(Qt.StrongFocus)
         self.initUI()
 
@@ -290,7 +695,7 @@ class ImageUploadWidget(QWidget):
             if index >= 0:
                 self.select_image(index)
                 file = urls[0].toLocalFile()
-                if file.lower().endswith(('.png', '.jpg', '.jpeg')):
+                if file.lower().endswith(IMAGE_EXTENSIONS):
                     self.addImage(file)
 
         event.acceptProposedAction()
@@ -316,52 +721,102 @@ class ImageUploadWidget(QWidget):
             # 从剪贴板获取图片
             image = clipboard.image()
             if not image.isNull():
-                # 确保图片目录存在
-                os.makedirs(IMAGE_DIR, exist_ok=True)
-
-                # 保存图片到本地
-                filename = f"temp_{os.urandom(4).hex()}.png"
-                save_path = os.path.join(IMAGE_DIR, filename)
-                image.save(save_path)
-                self.addImage(save_path)
+                self.encodePastedImage(image)
         elif mime_data.hasUrls():
             # 处理从文件管理器复制的图片文件
             for url in mime_data.urls():
                 if url.isLocalFile():
                     file = url.toLocalFile()
-                    if file.lower().endswith(('.png', '.jpg', '.jpeg')):
+                    if file.lower().endswith(IMAGE_EXTENSIONS):
                         self.addImage(file)
                         break
 
-    def addImage(self, file_path):
-        if self.selected_index < 0:
+    def encodePastedImage(self, image):
+        """先显示预览，在后台线程按设置的格式编码保存，完成后替换到当前位置"""
+        index = self.selected_index
+        self.discard_pending(index)
+        # 先快速缩小再平滑缩放，4K图片也只需几毫秒
+        preview = fit_pixmap(QPixmap.fromImage(image.scaled(320, 320, Qt.KeepAspectRatio, Qt.FastTransformation)),
+                             80, device_pixel_ratio())
+        future = get_paste_executor().submit(lambda: save_pasted_image(qimage_to_pil(image)))
+        self._pending[index] = (future, preview)
+        future.add_done_callback(lambda f, i=index: self._emit_paste_encoded(i, f))
+        self.updateDisplay()
+
+    def _emit_paste_encoded(self, index, future):
+        try:
+            self.paste_encoded.emit(index, future)
+        except RuntimeError:
+            # 控件已销毁
+            remove_pasted_image(future)
+
+    def on_paste_encoded(self, index, future):
+        pending = self._pending.get(index)
+        if pending is not None and pending[0] is future:
+            self._apply_pasted(index)
+
+    def _apply_pasted(self, index):
+        future, preview = self._pending.pop(index)
+        try:
+            path = future.result()
+        except Exception as e:
+            print(f"保存粘贴的图片失败: {e}")
+            self.updateDisplay()
+            return
+        # 预览图直接作为新文件的显示缓存，不必在界面线程再解码一次原图
+        name = get_thumbnail_cache().name_for(path)
+        if name:
+            get_pixmap_cache().put(f"{name}@80", preview)
+        self.addImage(path, index)
+
+    def discard_pending(self, index=None):
+        """放弃尚未完成的粘贴（index为None时放弃全部），编码完成后删除生成的文件"""
+        for i in ([index] if index is not None else list(self._pending)):
+            pending = self._pending.pop(i, None)
+            if pending is not None:
+                pending[0].cancel()
+                pending[0].add_done_callback(remove_pasted_image)
+
+    def wait_pending(self):
+        """等待所有粘贴的图片编码完成并放入对应位置"""
+        for index in list(self._pending):
+            self._apply_pasted(index)
+
+    def addImage(self, file_path, index=None):
+        if index is None:
+            index = self.selected_index
+        if index < 0:
             return
+        self.discard_pending(index)
 
         # 如果该位置已有图片，先移除
-        if self.selected_index < len(self.images):
+        if index < len(self.images):
             # 如果已有图片是临时文件，删除它
-            if self.images[self.selected_index] and os.path.basename(self.images[self.selected_index]).startswith(
-                    "temp_"):
+            if is_temp_image(self.images[index]):
                 try:
                     # 只删除临时文件
-                    if os.path.exists(self.images[self.selected_index]):
-                        os.remove(self.images[self.selected_index])
+                    if os.path.exists(self.images[index]):
+                        os.remove(self.images[index])
                 except:
                     pass
-            self.images[self.selected_index] = file_path
+            self.images[index] = file_path
         else:
             # 确保有足够的空间
-            while len(self.images) < 3 and len(self.images) <= self.selected_index:
+            while len(self.images) < 3 and len(self.images) <= index:
                 self.images.append(None)
-            self.images[self.selected_index] = file_path
+            self.images[index] = file_path
 
         self.updateDisplay()
 
     def delete_selected_image(self):
         """删除当前选中的图片"""
+        if self.selected_index in self._pending:
+            self.discard_pending(self.selected_index)
+            self.updateDisplay()
+            return
         if self.selected_index < len(self.images) and self.images[self.selected_index]:
             # 如果是临时文件，删除文件
-            if os.path.basename(self.images[self.selected_index]).startswith("temp_"):
+            if is_temp_image(self.images[self.selected_index]):
                 try:
                     os.remove(self.images[self.selected_index])
                 except:
@@ -373,17 +828,19 @@ class ImageUploadWidget(QWidget):
 
     def updateDisplay(self):
         for i in range(3):
-            if i < len(self.images) and self.images[i]:
+            if i in self._pending:
+                # 粘贴的图片还在编码，先显示预览
+                self.image_labels[i].setPixmap(self._pending[i][1])
+                self.image_labels[i].setCursor(Qt.ArrowCursor)
+            elif i < len(self.images) and self.images[i]:
                 try:
                     # 检查文件是否存在
                     if os.path.exists(self.images[i]):
                         # 显示缩略图
-                        thumb_path = self.get_thumbnail_path(self.images[i])
-                        if os.path.exists(thumb_path):
-                            pixmap = QPixmap(thumb_path).scaled(80, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                        else:
+                        pixmap = load_thumbnail_pixmap(self.images[i])
+                        if pixmap is None:
                             # 生成临时缩略图用于显示
-                            pixmap = QPixmap(self.images[i]).scaled(80, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                            pixmap = load_source_pixmap(self.images[i]) or QPixmap()
                         self.image_labels[i].setPixmap(pixmap)
                         # 设置鼠标指针为手型，表示可点击
                         self.image_labels[i].setCursor(Qt.PointingHandCursor)
@@ -402,18 +859,7 @@ class ImageUploadWidget(QWidget):
                 self.image_labels[i].setCursor(Qt.ArrowCursor)
 
         self.update_selection_style()
-
-    def get_thumbnail_path(self, original_path):
-        """获取缩略图路径"""
-        if not original_path:
-            return ""
-
-        # 获取文件名和扩展名
-        filename = os.path.basename(original_path)
-        name, ext = os.path.splitext(filename)
-
-        # 缩略图保存在单独的缩略图目录
-        return os.path.join(THUMB_DIR, f"{name}_thumb{ext}")
+        self.images_changed.emit()
 
     def showFullImage(self, index):
         if index < len(self.images) and self.images[index]:
@@ -443,6 +889,7 @@ class ImageUploadWidget(QWidget):
 
     def setImages(self, paths):
         """设置图片路径，只保留有效的路径"""
+        self.discard_pending()
         self.images = []
         for path in paths:
             if path:
@@ -461,211 +908,10 @@ class ImageUploadWidget(QWidget):
                 self.images.append(None)
         self.updateDisplay()
 
-    def renameImages(self, artist_id):
-        """重命名图片为画师ID格式，并确保文件在正确的位置"""
-        if not artist_id:
-            return self.images
-
-        new_paths = []
-        os.makedirs(IMAGE_DIR, exist_ok=True)
-
-        for i, path in enumerate(self.images):
-            if not path or not os.path.exists(path):
-                new_paths.append(None)
-                continue
-
-            # 获取文件扩展名
-            ext = os.path.splitext(path)[1].lower()
-            # 新文件名
-            new_filename = f"{artist_id}-{i + 1}{ext}"
-            new_path = os.path.join(IMAGE_DIR, new_filename)
-
-            try:
-                # 如果文件已经在正确位置，不需要移动
-                if os.path.normpath(path) == os.path.normpath(new_path):
-                    new_paths.append(new_filename)
-                    continue
-
-                # 复制文件到新位置
-                shutil.copy2(path, new_path)
-                new_paths.append(new_filename)
-
-                # 如果源文件是临时文件，删除它
-                if os.path.basename(path).startswith("temp_"):
-                    try:
-                        os.remove(path)
-                    except:
-                        pass
-
-                # 删除旧的缩略图
-                thumb_path = self.get_thumbnail_path(path)
-                if os.path.exists(thumb_path):
-                    os.remove(thumb_path)
-            except Exception as e:
-                print(f"重命名图片失败: {e}")
-                # 出错时保留原路径
-                new_paths.append(os.path.basename(path))
-
-        return new_paths
-
-
-class DatabaseManager:
-    def __init__(self):
-        # 清理临时图片
-        self.clean_temp_images()
-
-        self.conn = sqlite3.connect(DATABASE_NAME)
-        self.cursor = self.conn.cursor()
-        self.create_table()
-
-    def clean_temp_images(self):
-        """清理未使用的临时图片"""
-        os.makedirs(IMAGE_DIR, exist_ok=True)
-        temp_files = glob.glob(os.path.join(IMAGE_DIR, "temp_*"))
-        for file in temp_files:
-            try:
-                os.remove(file)
-            except:
-                pass
-
-        # 清理缩略图目录
-        os.makedirs(THUMB_DIR, exist_ok=True)
-        thumb_files = glob.glob(os.path.join(THUMB_DIR, "*_thumb.*"))
-        for file in thumb_files:
-            try:
-                os.remove(file)
-            except:
-                pass
-
-    def create_table(self):
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS artists (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            row_id TEXT UNIQUE,  -- 唯一行ID
-            artist_id TEXT,
-            common_name TEXT,
-            introduction TEXT,
-            image_paths TEXT,
-            notes TEXT,
-            marked BOOLEAN DEFAULT 0  -- 新增标记列
-        )
-        """)
-        self.conn.commit()
-
-    def add_artist(self, data):
-        self.cursor.execute("""
-        INSERT INTO artists (row_id, artist_id, common_name, introduction, image_paths, notes, marked)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, data)
-        self.conn.commit()
-        return self.cursor.lastrowid
-
-    def update_artist(self, row_id, data):
-        self.cursor.execute("""
-        UPDATE artists
-        SET artist_id=?, common_name=?, introduction=?, image_paths=?, notes=?, marked=?
-        WHERE row_id=?
-        """, (*data, row_id))
-        self.conn.commit()
-
-    def delete_artist(self, row_id):
-        self.cursor.execute("DELETE FROM artists WHERE row_id=?", (row_id,))
-        self.conn.commit()
-
-    def get_all_artists(self):
-        self.cursor.execute("""
-        SELECT id, row_id, artist_id, common_name, introduction, image_paths, notes, marked
-        FROM artists
-        ORDER BY id
-        """)
-        return self.cursor.fetchall()
-
-    def get_artist_by_id(self, db_id):
-        """根据数据库ID获取艺术家记录"""
-        self.cursor.execute("""
-        SELECT id, row_id, artist_id, common_name, introduction, image_paths, notes, marked
-        FROM artists
-        WHERE id = ?
-        """, (db_id,))
-        return self.cursor.fetchone()
-
-    def get_prev_artist_id(self, current_id):
-        """获取前一个记录的ID"""
-        self.cursor.execute("""
-        SELECT id FROM artists 
-        WHERE id < ? 
-        ORDER BY id DESC 
-        LIMIT 1
-        """, (current_id,))
-        result = self.cursor.fetchone()
-        return result[0] if result else None
-
-    def get_next_artist_id(self, current_id):
-        """获取下一个记录的ID"""
-        self.cursor.execute("""
-        SELECT id FROM artists 
-        WHERE id > ? 
-        ORDER BY id ASC 
-        LIMIT 1
-        """, (current_id,))
-        result = self.cursor.fetchone()
-        return result[0] if result else None
-
-    def import_from_excel(self, file_path):
-        """从Excel文件导入数据"""
-        try:
-            df = pd.read_excel(file_path)
-            if df.empty:
-                return False
-
-            # 确保列名正确
-            required_columns = ['画师ID', '常用名', '简介', '备注', '标记']
-            if not all(col in df.columns for col in required_columns):
-                return False
-
-            for _, row in df.iterrows():
-                artist_id = str(row['画师ID']) if pd.notna(row['画师ID']) else ""
-                common_name = str(row['常用名']) if pd.notna(row['常用名']) else ""
-                introduction = str(row['简介']) if pd.notna(row['简介']) else ""
-                notes = str(row['备注']) if pd.notna(row['备注']) else ""
-                marked = bool(row['标记']) if pd.notna(row['标记']) else False
-
-                # 查找图片
-                image_paths = []
-                for i in range(1, 4):
-                    possible_paths = [
-                        os.path.join(IMAGE_DIR, f"{artist_id}-{i}.png"),
-                        os.path.join(IMAGE_DIR, f"{artist_id}-{i}.jpg"),
-                        os.path.join(IMAGE_DIR, f"{artist_id}-{i}.jpeg")
-                    ]
-
-                    found = False
-                    for path in possible_paths:
-                        if os.path.exists(path):
-                            # 存储相对路径
-                            rel_path = os.path.relpath(path, IMAGE_DIR)
-                            image_paths.append(rel_path)
-                            found = True
-                            break
-
-                    if not found:
-                        image_paths.append(None)
-
-                # 生成唯一行ID
-                row_id = str(uuid.uuid4())
-
-                # 添加到数据库
-                self.cursor.execute("""
-                INSERT INTO artists (row_id, artist_id, common_name, introduction, image_paths, notes, marked)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    row_id, artist_id, common_name, introduction, ";".join(p for p in image_paths if p), notes, marked))
-
-            self.conn.commit()
-            return True
-        except Exception as e:
-            print(f"导入失败: {e}")
-            return False
+    def imagesForSave(self):
+        """保存时的三个位置的源图片路径，由数据库线程按画师ID暂存并随数据库写入一起提交"""
+        self.wait_pending()
+        return (list(self.images) + [None] * 3)[:3]
 
 
 class EditArtistDialog(QDialog):
@@ -675,11 +921,16 @@ class EditArtistDialog(QDialog):
         super().__init__(parent)
         self.main_window = main_window
         self.db_id = db_id
+        self.row_id = None
+        self.prev_id = None
+        self.next_id = None
+        self._metadata_paths = None
         self.setWindowTitle("编辑画师")
         self.setMinimumSize(700, 600)
         self.initUI()
         self.load_data()
 
+    @traced("EditArtistDialog.initUI", "ui")
     def initUI(self):
         layout = QVBoxLayout(self)
 
@@ -707,8 +958,19 @@ class EditArtistDialog(QDialog):
         img_layout = QVBoxLayout()
         img_layout.addWidget(QLabel("作品展示:"))
         self.img_edit = ImageUploadWidget()
+        self.img_edit.images_changed.connect(self.load_metadata)
         img_layout.addWidget(self.img_edit)
 
+        # 图片中的生成参数（只读），没有时隐藏
+        self.metadata_label = QLabel("生成参数:")
+        self.metadata_view = QTextEdit()
+        self.metadata_view.setReadOnly(True)
+        self.metadata_view.setMinimumHeight(80)
+        self.metadata_label.hide()
+        self.metadata_view.hide()
+        img_layout.addWidget(self.metadata_label)
+        img_layout.addWidget(self.metadata_view)
+
         # 备注输入 - 改为多行文本框
         notes_layout = QVBoxLayout()
         notes_layout.addWidget(QLabel("备注:"))
@@ -754,11 +1016,26 @@ class EditArtistDialog(QDialog):
         layout.addLayout(mark_layout)
         layout.addLayout(btn_layout)
 
+    def set_busy(self, busy, message=""):
+        """加载或保存期间禁用输入，防止重复提交"""
+        for widget in (self.id_edit, self.name_edit, self.intro_edit, self.notes_edit, self.mark_checkbox,
+                       self.img_edit, self.save_btn):
+            widget.setEnabled(not busy)
+        self.prev_btn.setEnabled(not busy and self.prev_id is not None)
+        self.next_btn.setEnabled(not busy and self.next_id is not None)
+        self.setWindowTitle(f"编辑画师（{message}）" if busy else "编辑画师")
+
     def load_data(self):
-        artist = self.main_window.db.get_artist_by_id(self.db_id)
+        """在数据库线程读取记录和前后记录ID，读取期间显示加载状态"""
+        self.set_busy(True, "加载中...")
+        self.main_window.db.submit(DatabaseManager.get_artist_with_neighbors, self.db_id).then(
+            self.on_data_loaded, lambda error: QMessageBox.critical(self, "错误", f"读取数据失败: {error}"))
+
+    def on_data_loaded(self, result):
+        artist, self.prev_id, self.next_id = result
         if artist:
             db_id, row_id, artist_id, common_name, intro, image_paths, notes, marked = artist
-            paths = image_paths.split(';') if image_paths else []
+            paths = split_image_paths(image_paths)
 
             self.row_id = row_id
             self.id_edit.setText(artist_id)
@@ -768,20 +1045,37 @@ class EditArtistDialog(QDialog):
             self.mark_checkbox.setChecked(bool(marked))
             self.img_edit.setImages(paths)
 
-            # 更新按钮状态
-            self.update_nav_buttons()
+        # 更新按钮状态
+        self.set_busy(False)
+        if not artist:
+            self.save_btn.setEnabled(False)
 
-    def update_nav_buttons(self):
-        """更新导航按钮状态"""
-        # 检查是否有上一个记录
-        prev_id = self.main_window.db.get_prev_artist_id(self.db_id)
-        self.prev_btn.setEnabled(prev_id is not None)
-
-        # 检查是否有下一个记录
-        next_id = self.main_window.db.get_next_artist_id(self.db_id)
-        self.next_btn.setEnabled(next_id is not None)
-
-    def save_data(self):
+    def load_metadata(self):
+        """在数据库线程读取当前图片的生成参数（优先使用索引），图片没有变化时不重复读取"""
+        paths = [path for path in self.img_edit.images if path]
+        if paths == self._metadata_paths:
+            return
+        self._metadata_paths = paths
+        if not paths:
+            self.on_metadata_loaded(paths, [])
+            return
+        self.main_window.db.submit(DatabaseManager.get_image_metadata, paths).then(
+            lambda result, paths=paths: self.on_metadata_loaded(paths, result))
+
+    def on_metadata_loaded(self, paths, result):
+        if paths != self._metadata_paths:
+            return  # 读取期间图片又有变化
+        slots = {path: i + 1 for i, path in enumerate(self.img_edit.images) if path}
+        texts = [format_generation_metadata(slots[path], metadata)
+                 for path, metadata in zip(paths, result or []) if metadata]
+        self.metadata_view.setPlainText("\n\n".join(texts))
+        self.metadata_label.setVisible(bool(texts))
+        self.metadata_view.setVisible(bool(texts))
+
+    def save_data(self, then=None):
+        """保存修改，写入完成后执行then（默认关闭对话框）"""
+        if self.row_id is None:
+            return
         artist_id = self.id_edit.text().strip()
         common_name = self.name_edit.text().strip()
 
@@ -793,26 +1087,24 @@ class EditArtistDialog(QDialog):
         notes = self.notes_edit.toPlainText()
         marked = 1 if self.mark_checkbox.isChecked() else 0
 
-        # 重命名图片
-        renamed_paths = self.img_edit.renameImages(artist_id)
-        image_paths = ";".join(p for p in renamed_paths if p)
-
-        # 更新数据库
-        self.main_window.db.update_artist(self.row_id, (
+        # 更新数据库，图片在数据库线程中暂存并和数据库更新一起提交，主界面通过数据库变更通知只更新这一行
+        self.set_busy(True, "保存中...")
+        self.main_window.db.submit(DatabaseManager.update_artist, self.row_id, (
             artist_id,
             common_name,
             intro,
-            image_paths,
+            None,
             notes,
             marked
-        ))
+        ), images=self.img_edit.imagesForSave()).then(lambda _: (then or self.accept)(), self.on_save_failed)
 
-        # 更新主界面
-        self.main_window.load_data()
-        self.accept()
+    def on_save_failed(self, error):
+        self.set_busy(False)
+        QMessageBox.critical(self, "保存失败", f"保存过程中出错: {error}")
 
     def cancel_edit(self):
         # 删除编辑过程中上传的临时图片
+        self.img_edit.discard_pending()
         for path in self.img_edit.getImagePaths():
             if path and os.path.basename(path).startswith("temp_"):
                 try:
@@ -824,29 +1116,505 @@ class EditArtistDialog(QDialog):
 
     def prev_artist(self):
         """切换到上一个画师"""
-        # 先保存当前编辑
-        self.save_data()
-
-        # 获取上一个画师的ID
-        prev_id = self.main_window.db.get_prev_artist_id(self.db_id)
-        if prev_id:
-            # 关闭当前对话框
-            self.accept()
-            # 打开上一个画师的编辑对话框
-            self.main_window.edit_row_by_db_id(prev_id)
+        # 先保存当前编辑，保存完成后再切换
+        if self.prev_id is not None:
+            self.save_data(then=lambda: self.switch_to(self.prev_id))
 
     def next_artist(self):
         """切换到下一个画师"""
-        # 先保存当前编辑
-        self.save_data()
+        if self.next_id is not None:
+            self.save_data(then=lambda: self.switch_to(self.next_id))
+
+    def switch_to(self, db_id):
+        # 关闭当前对话框，打开另一个画师的编辑对话框
+        self.accept()
+        self.main_window.edit_row_by_db_id(db_id)
 
-        # 获取下一个画师的ID
-        next_id = self.main_window.db.get_next_artist_id(self.db_id)
-        if next_id:
-            # 关闭当前对话框
-            self.accept()
-            # 打开下一个画师的编辑对话框
-            self.main_window.edit_row_by_db_id(next_id)
+
+class ArtistRecord:
+    """表格中的一行画师数据"""
+    __slots__ = ("db_id", "row_id", "artist_id", "common_name", "introduction", "image_paths", "notes",
+                 "marked")
+
+    def __init__(self, db_id, row_id, artist_id, common_name, introduction, image_paths, notes, marked):
+        self.db_id = db_id
+        self.row_id = row_id
+        self.artist_id = artist_id or ""
+        self.common_name = common_name or ""
+        self.introduction = introduction or ""
+        self.image_paths = image_paths
+        self.notes = notes or ""
+        self.marked = bool(marked)
+
+    @classmethod
+    def from_db_row(cls, row):
+        db_id, row_id, artist_id, common_name, intro, image_paths, notes, marked = row
+        paths = split_image_paths(image_paths)
+        return cls(db_id, row_id, artist_id, common_name, intro, paths, notes, marked)
+
+    def update_from(self, other):
+        """用新数据覆盖当前记录，返回图片是否可能发生变化（仅修改标记时为False）"""
+        fields = ("artist_id", "common_name", "introduction", "image_paths", "notes")
+        mark_only = (self.marked != other.marked and
+                     all(getattr(self, f) == getattr(other, f) for f in fields))
+        for field in self.__slots__:
+            setattr(self, field, getattr(other, field))
+        return not mark_only
+
+
+class ArtistTableModel(QAbstractTableModel):
+    """画师表格模型，按页从数据库懒加载，单元格由视图和委托按需绘制。
+
+    浏览时按 (排序列, id) 键集分页；搜索时按搜索结果的ID顺序分页。
+    只保存已加载的记录，首屏时间与画师总数无关"""
+    COLUMNS = ["标记", "画师ID", "常用名", "简介", "作品展示", "备注", "操作"]
+    COL_MARK, COL_ID, COL_NAME, COL_INTRO, COL_IMAGES, COL_NOTES, COL_ACTIONS = range(7)
+    TEXT_FIELDS = {
+        COL_ID: "artist_id",
+        COL_NAME: "common_name",
+        COL_INTRO: "introduction",
+        COL_NOTES: "notes",
+    }
+    PAGE_SIZE = 200
+
+    RowIdRole = Qt.UserRole
+    DbIdRole = Qt.UserRole + 1
+    ImagePathsRole = Qt.UserRole + 2
+
+    mark_toggled = pyqtSignal(str, bool)  # row_id, 是否标记
+    fetching_changed = pyqtSignal(bool)  # 是否正在加载下一页
+    search_order_changed = pyqtSignal()  # 搜索状态下修改了排序，需要按新顺序重新搜索
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db  # DatabaseExecutor
+        self._loaded = {}  # row_id -> 已加载的记录
+        self._records = []  # 已加载的记录，按显示顺序
+        self._search_ids = None  # 搜索结果（按显示顺序的数据库ID），None表示未搜索
+        self._search_rank = None  # 数据库ID -> 在搜索结果中的位置
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+        self._exhausted = False  # 已加载到最后一页
+        self._fetching = False
+        self._generation = 0  # 视图重置后丢弃旧的分页结果
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == self.COL_MARK:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self._records[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            field = self.TEXT_FIELDS.get(column)
+            return getattr(record, field) if field else None
+        if role == Qt.CheckStateRole and column == self.COL_MARK:
+            return Qt.Checked if record.marked else Qt.Unchecked
+        if role == self.RowIdRole:
+            return record.row_id
+        if role == self.DbIdRole:
+            return record.db_id
+        if role == self.ImagePathsRole:
+            return record.image_paths
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or index.column() != self.COL_MARK or role != Qt.CheckStateRole:
+            return False
+        record = self._records[index.row()]
+        record.marked = value == Qt.Checked
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        self.mark_toggled.emit(record.row_id, record.marked)
+        return True
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """按列排序，column为-1时恢复数据库顺序。排序由数据库完成，重新从第一页加载"""
+        if column in (self.COL_IMAGES, self.COL_ACTIONS):
+            return
+        if (column, order) == (self._sort_column, self._sort_order):
+            return
+        self._sort_column = column
+        self._sort_order = order
+        if self.search_active:
+            self.search_order_changed.emit()
+        else:
+            self.reload()
+
+    def clear_sort(self):
+        """恢复默认顺序但不重新加载（切换到按相关度排序的搜索结果时使用）"""
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+
+    def reload(self):
+        """清空已加载的数据并从第一页重新加载"""
+        self.beginResetModel()
+        self._loaded = {}
+        self._records = []
+        self._exhausted = False
+        self._generation += 1
+        self._set_fetching(False)
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        """在数据库线程读取下一页，结果返回后追加到末尾"""
+        if parent.isValid() or self._exhausted or self._fetching:
+            return
+        self._set_fetching(True)
+        generation = self._generation
+        if self.search_active:
+            start = len(self._records)
+            future = self.db.submit(DatabaseManager.get_artists_by_ids,
+                                    self._search_ids[start:start + self.PAGE_SIZE])
+        else:
+            after = self._order_key(self._records[-1]) if self._records else None
+            sort_field, descending = self.sort_spec()
+            future = self.db.submit(DatabaseManager.get_artists_page, after, self.PAGE_SIZE,
+                                    sort_field, descending)
+        future.then(lambda rows: self._on_page(generation, rows),
+                    lambda error: self._on_page(generation, None))
+
+    @traced("ArtistTableModel.insert_page", "ui")
+    def _on_page(self, generation, rows):
+        if generation != self._generation:
+            return
+        self._set_fetching(False)
+        if rows is None:
+            return
+        if self.search_active:
+            self._exhausted = len(self._records) + len(rows) >= len(self._search_ids)
+        else:
+            self._exhausted = len(rows) < self.PAGE_SIZE
+
+        records = []
+        for row in rows:
+            record = ArtistRecord.from_db_row(row)
+            # 已经由变更通知插入的记录不重复添加
+            if record.row_id not in self._loaded:
+                records.append(record)
+        if self.search_active:
+            # 按ID查询的结果不保证顺序，已删除的记录不会出现
+            records.sort(key=self._order_key)
+        if records:
+            first = len(self._records)
+            self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+            self._records.extend(records)
+            for record in records:
+                self._loaded[record.row_id] = record
+            self.endInsertRows()
+
+    def _set_fetching(self, fetching):
+        if self._fetching != fetching:
+            self._fetching = fetching
+            self.fetching_changed.emit(fetching)
+
+    @property
+    def search_active(self):
+        return self._search_ids is not None
+
+    @property
+    def fetching(self):
+        """是否有一页数据正在数据库线程读取"""
+        return self._fetching
+
+    def sort_spec(self):
+        """当前排序对应的数据库列和方向，未排序时返回 (None, False)"""
+        if self._sort_column == self.COL_MARK:
+            return "marked", self._sort_order == Qt.DescendingOrder
+        if self._sort_column in self.TEXT_FIELDS:
+            return self.TEXT_FIELDS[self._sort_column], self._sort_order == Qt.DescendingOrder
+        return None, False
+
+    def set_search_results(self, ids):
+        """应用搜索结果（按显示顺序的数据库ID），None表示显示全部"""
+        if ids == self._search_ids:
+            # 结果没有变化时不重置，保留选中和滚动位置
+            return
+        self._search_ids = None if ids is None else list(ids)
+        self._search_rank = None if ids is None else {db_id: rank for rank, db_id in enumerate(ids)}
+        self.reload()
+
+    def _matches(self, record):
+        return self._search_rank is None or record.db_id in self._search_rank
+
+    def _order_key(self, record):
+        if self._search_rank is not None:
+            return self._search_rank.get(record.db_id, len(self._search_rank)),
+        if self._sort_column == self.COL_MARK:
+            return record.marked, record.db_id
+        if self._sort_column in self.TEXT_FIELDS:
+            return getattr(record, self.TEXT_FIELDS[self._sort_column]), record.db_id
+        return record.db_id,
+
+    def _descending(self):
+        # 搜索结果的顺序已经由数据库决定
+        return self._search_rank is None and self._sort_column >= 0 and self._sort_order == Qt.DescendingOrder
+
+    def _within_loaded(self, record):
+        """记录是否落在已加载的范围内；范围之外的记录留给后续分页加载"""
+        if self._exhausted:
+            return True
+        if not self._records:
+            return False
+        key = self._order_key(record)
+        last = self._order_key(self._records[-1])
+        return key >= last if self._descending() else key <= last
+
+    def _insert_position(self, record):
+        """二分查找记录在当前显示顺序中的插入位置"""
+        key = self._order_key(record)
+        descending = self._descending()
+        lo, hi = 0, len(self._records)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = self._order_key(self._records[mid])
+            if (mid_key >= key) if descending else (mid_key <= key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _insert_records(self, records):
+        """按当前顺序插入多条记录，连续位置合并为一次插入"""
+        if not records:
+            return
+        records = sorted(records, key=self._order_key, reverse=self._descending())
+        runs = []
+        for record in records:
+            pos = self._insert_position(record)
+            if runs and runs[-1][0] == pos:
+                runs[-1][1].append(record)
+            else:
+                runs.append((pos, [record]))
+        # 从后往前插入，保证前面的位置不受影响
+        for pos, run in reversed(runs):
+            self.beginInsertRows(QModelIndex(), pos, pos + len(run) - 1)
+            self._records[pos:pos] = run
+            for record in run:
+                self._loaded[record.row_id] = record
+            self.endInsertRows()
+
+    def _remove_positions(self, positions):
+        """删除若干行，连续行合并为一次删除"""
+        for first, last in reversed(self._group_runs(sorted(positions))):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for record in self._records[first:last + 1]:
+                self._loaded.pop(record.row_id, None)
+            del self._records[first:last + 1]
+            self.endRemoveRows()
+
+    @staticmethod
+    def _group_runs(positions):
+        runs = []
+        for pos in positions:
+            if runs and runs[-1][1] == pos - 1:
+                runs[-1][1] = pos
+            else:
+                runs.append([pos, pos])
+        return runs
+
+    def _positions(self):
+        return {record.row_id: row for row, record in enumerate(self._records)}
+
+    def upsert_rows(self, rows):
+        """插入或更新若干条数据库记录，只通知受影响的行。返回需要刷新缩略图的图片路径"""
+        if not rows:
+            return []
+        positions = self._positions()
+        changed_paths = []
+        to_insert = []
+        to_remove = []
+        for row in rows:
+            new_record = ArtistRecord.from_db_row(row)
+            record = self._loaded.get(new_record.row_id)
+            if record is None:
+                if self._matches(new_record) and self._within_loaded(new_record):
+                    to_insert.append(new_record)
+                continue
+
+            old_key = self._order_key(record)
+            if record.update_from(new_record):
+                changed_paths.extend(p for p in record.image_paths if p)
+            pos = positions[record.row_id]
+            visible = self._matches(record)
+            if visible and self._order_key(record) == old_key:
+                self.dataChanged.emit(self.index(pos, 0), self.index(pos, self.columnCount() - 1))
+                continue
+            # 顺序或可见性发生变化：先移除，仍在已加载范围内时按新位置插入
+            to_remove.append(pos)
+            if visible and self._within_loaded(record):
+                to_insert.append(record)
+
+        self._remove_positions(to_remove)
+        self._insert_records(to_insert)
+        return changed_paths
+
+    def remove_row_ids(self, row_ids):
+        positions = self._positions()
+        self._remove_positions([positions[row_id] for row_id in row_ids if row_id in positions])
+
+    def record(self, row):
+        if 0 <= row < len(self._records):
+            return self._records[row]
+        return None
+
+    def total_count(self):
+        """已加载的记录数"""
+        return len(self._records)
+
+    def row_of(self, row_id):
+        """根据行ID获取当前行索引，未加载的记录返回-1"""
+        record = self._loaded.get(row_id)
+        if record is None:
+            return -1
+        try:
+            return self._records.index(record)
+        except ValueError:
+            return -1
+
+
+class ThumbnailStripDelegate(QStyledItemDelegate):
+    """绘制作品展示列的三张缩略图"""
+    image_activated = pyqtSignal(QModelIndex, int)  # 行, 图片位置
+
+    CELL_SIZE = 80
+    SPACING = 5
+
+    def __init__(self, provider, parent=None):
+        super().__init__(parent)
+        self.provider = provider
+
+    def slot_rects(self, rect):
+        total = self.CELL_SIZE * 3 + self.SPACING * 2
+        left = rect.x() + max(0, (rect.width() - total) // 2)
+        top = rect.y() + max(0, (rect.height() - self.CELL_SIZE) // 2)
+        return [QRect(left + i * (self.CELL_SIZE + self.SPACING), top, self.CELL_SIZE, self.CELL_SIZE)
+                for i in range(3)]
+
+    def paint(self, painter, option, index):
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+
+        paths = index.data(ArtistTableModel.ImagePathsRole) or []
+        painter.save()
+        for slot, rect in enumerate(self.slot_rects(option.rect)):
+            painter.fillRect(rect, QColor(248, 248, 248))
+            painter.setPen(QColor(221, 221, 221))
+            painter.drawRect(rect.adjusted(0, 0, -1, -1))
+
+            path = paths[slot] if slot < len(paths) else None
+            if not path:
+                continue
+            state, pixmap = self.provider.lookup(path)
+            if pixmap is not None:
+                # 高DPI缩略图按逻辑尺寸居中
+                ratio = pixmap.devicePixelRatio()
+                x = rect.x() + (rect.width() - round(pixmap.width() / ratio)) // 2
+                y = rect.y() + (rect.height() - round(pixmap.height() / ratio)) // 2
+                painter.drawPixmap(x, y, pixmap)
+            elif state in (ThumbnailProvider.LOADING, ThumbnailProvider.FAILED):
+                painter.fillRect(rect.adjusted(1, 1, -1, -1), QColor(240, 240, 240))
+                painter.setPen(QColor(150, 150, 150))
+                text = "加载中..." if state == ThumbnailProvider.LOADING else "加载失败"
+                painter.drawText(rect, Qt.AlignCenter, text)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return QSize(self.CELL_SIZE * 3 + self.SPACING * 2, self.CELL_SIZE)
+
+    def editorEvent(self, event, model, option, index):
+        """双击查看大图"""
+        if event.type() == QEvent.MouseButtonDblClick:
+            for slot, rect in enumerate(self.slot_rects(option.rect)):
+                if rect.contains(event.pos()):
+                    self.image_activated.emit(index, slot)
+                    return True
+        return super().editorEvent(event, model, option, index)
+
+
+class ActionButtonsDelegate(QStyledItemDelegate):
+    """绘制操作列的编辑/删除按钮，不为每行创建真实控件"""
+    edit_clicked = pyqtSignal(QModelIndex)
+    delete_clicked = pyqtSignal(QModelIndex)
+
+    BUTTONS = ("编辑", "删除")
+    BUTTON_HEIGHT = 35
+    MARGIN = 5
+    SPACING = 6
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pressed = None  # (行, 按钮序号)
+
+    def button_rects(self, rect):
+        area = rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+        width = (area.width() - self.SPACING) // 2
+        top = area.y() + max(0, (area.height() - self.BUTTON_HEIGHT) // 2)
+        return [QRect(area.x() + i * (width + self.SPACING), top, width, self.BUTTON_HEIGHT)
+                for i in range(len(self.BUTTONS))]
+
+    def paint(self, painter, option, index):
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+
+        for i, rect in enumerate(self.button_rects(option.rect)):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = self.BUTTONS[i]
+            button.state = QStyle.State_Enabled
+            if self._pressed == (index.row(), i):
+                button.state |= QStyle.State_Sunken
+            else:
+                button.state |= QStyle.State_Raised
+            style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def sizeHint(self, option, index):
+        return QSize(140, self.BUTTON_HEIGHT + self.MARGIN * 2)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() not in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease, QEvent.MouseButtonDblClick):
+            return super().editorEvent(event, model, option, index)
+
+        clicked = -1
+        for i, rect in enumerate(self.button_rects(option.rect)):
+            if rect.contains(event.pos()):
+                clicked = i
+                break
+
+        if event.type() == QEvent.MouseButtonPress:
+            self._pressed = (index.row(), clicked) if clicked >= 0 else None
+            return clicked >= 0
+        if event.type() == QEvent.MouseButtonRelease:
+            pressed, self._pressed = self._pressed, None
+            if clicked >= 0 and pressed == (index.row(), clicked):
+                if clicked == 0:
+                    self.edit_clicked.emit(index)
+                else:
+                    self.delete_clicked.emit(index)
+                return True
+            return False
+        return clicked >= 0
 
 
 class MainWindow(QMainWindow):
@@ -863,11 +1631,17 @@ class MainWindow(QMainWindow):
         except Exception as e:
             print(f"设置图标失败: {e}")
 
-        self.db = DatabaseManager()
-        # 存储行ID到行索引的映射
-        self.row_id_map = {}
+        # 所有数据库操作都在数据库线程执行
+        self.started_at = time.time()
+        self.db = DatabaseExecutor(parent=self)
+        self.db.changed.connect(self.on_artists_changed)
+        self.db.ready.connect(lambda: startup_timer.mark("db_open"))
+        self.db.open_failed.connect(self.on_database_failed)
+        self.db.start()
         self.initUI()
+        # 第一页数据在数据库线程读取，窗口先显示，数据返回后再填充
         self.load_data()
+        startup_timer.mark("window_created")
 
     def initUI(self):
         central_widget = QWidget()
@@ -877,17 +1651,49 @@ class MainWindow(QMainWindow):
         # 筛选区域 - 改为单行搜索框
         filter_layout = QHBoxLayout()
         self.search_edit = QLineEdit()
-        self.search_edit.setPlaceholderText("搜索画师ID、常用名、简介、备注...")
+        self.search_edit.setPlaceholderText("搜索画师ID、常用名、简介、备注...（以“参数:”开头搜索图片的模型、提示词、种子）")
         self.search_edit.textChanged.connect(self.apply_filters)
+
+        # 输入停顿后再搜索，搜索在后台线程执行
+        self._search_seq = 0
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_worker = SearchWorker(self)
+        self.search_worker.results_ready.connect(self.on_search_results)
+        self.import_future = None
+        self.scan_future = None
+        self.export_worker = None
+        self.refresh_worker = None
+        self.metadata_worker = None
+        self._metadata_rerun = False
         filter_layout.addWidget(QLabel("搜索:"))
         filter_layout.addWidget(self.search_edit)
 
         main_layout.addLayout(filter_layout)
 
-        # 表格设置
-        self.table = QTableWidget()
-        self.table.setColumnCount(7)  # 增加标记列
-        self.table.setHorizontalHeaderLabels(["标记", "画师ID", "常用名", "简介", "作品展示", "备注", "操作"])
+        # 表格设置 - 模型/视图结构，只绘制可见行
+        self.table = QTableView()
+        self.model = ArtistTableModel(self.db, self)
+        self.model.fetching_changed.connect(self.on_fetching_changed)
+        self.model.search_order_changed.connect(self.run_search)
+        self.model.mark_toggled.connect(
+            lambda row_id, marked: self.db.submit(DatabaseManager.set_marked, row_id, marked))
+        self.table.setModel(self.model)
+
+        self.thumbnails = ThumbnailProvider(parent=self)
+        self.thumbnails.thumbnail_ready.connect(lambda _: self.table.viewport().update())
+        self.image_delegate = ThumbnailStripDelegate(self.thumbnails, self.table)
+        self.image_delegate.image_activated.connect(lambda index, slot: self.view_image(index.row(), slot))
+        self.table.setItemDelegateForColumn(ArtistTableModel.COL_IMAGES, self.image_delegate)
+
+        self.action_delegate = ActionButtonsDelegate(self.table)
+        self.action_delegate.edit_clicked.connect(
+            lambda index: self.edit_row_by_db_id(index.data(ArtistTableModel.DbIdRole)))
+        self.action_delegate.delete_clicked.connect(
+            lambda index: self.delete_row_by_id(index.data(ArtistTableModel.RowIdRole)))
+        self.table.setItemDelegateForColumn(ArtistTableModel.COL_ACTIONS, self.action_delegate)
 
         # 设置列宽
         self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)  # 标记列
@@ -909,16 +1715,33 @@ class MainWindow(QMainWindow):
         # 启用Ctrl+C复制功能
         self.table.setSelectionMode(QAbstractItemView.ContiguousSelection)
         self.table.installEventFilter(self)
+        self.table.viewport().installEventFilter(self)
 
-        # 设置行高
+        # 设置行高，固定行高避免逐行计算尺寸
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         self.table.verticalHeader().setDefaultSectionSize(100)
+        # 自适应列宽只采样部分行
+        self.table.horizontalHeader().setResizeContentsPrecision(200)
 
-        # 启用列排序
+        # 启用列排序，初始保持数据库顺序
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
         self.table.setSortingEnabled(True)
-        self.table.horizontalHeader().sectionClicked.connect(self.handle_header_click)
 
         main_layout.addWidget(self.table)
 
+        # 滚动停止后取消已不可见行的缩略图任务，并预取下一屏
+        self.visible_timer = QTimer(self)
+        self.visible_timer.setSingleShot(True)
+        self.visible_timer.setInterval(100)
+        self.visible_timer.timeout.connect(self.update_visible_thumbnails)
+        self.table.verticalScrollBar().valueChanged.connect(self.visible_timer.start)
+
+        # 状态栏显示缩略图队列，便于调整工作线程数
+        self.thumb_stats_timer = QTimer(self)
+        self.thumb_stats_timer.setInterval(1000)
+        self.thumb_stats_timer.timeout.connect(self.show_thumbnail_stats)
+        self.thumb_stats_timer.start()
+
         # 底部按钮
         btn_layout = QHBoxLayout()
         self.add_btn = QPushButton("添加新画师")
@@ -944,109 +1767,160 @@ class MainWindow(QMainWindow):
 
         main_layout.addLayout(btn_layout)
 
-    def handle_header_click(self, logical_index):
-        """处理表头点击排序事件"""
-        # 排序完成后更新行ID映射
-        QTimer.singleShot(100, self.update_row_id_map)
-
-    def update_row_id_map(self):
-        """更新行ID映射关系"""
-        self.row_id_map.clear()
-        for row in range(self.table.rowCount()):
-            item = self.table.item(row, 1)  # 画师ID列
-            if item:
-                row_id = item.data(Qt.UserRole)
-                if row_id:
-                    self.row_id_map[row_id] = row
+        # 数据加载状态
+        self.loading_label = QLabel()
+        self.statusBar().addPermanentWidget(self.loading_label)
+        self.loading_label.hide()
 
     def eventFilter(self, source, event):
-        """处理Ctrl+C快捷键"""
-        if event.type() == QEvent.KeyPress and source is self.table:
+        """处理Ctrl+C快捷键，并记录首次绘制的时间"""
+        if event.type() == QEvent.Paint and source is self.table.viewport():
+            # 绘制事件处理完之后再记录
+            QTimer.singleShot(0, self.on_table_painted)
+        elif event.type() == QEvent.KeyPress and source is self.table:
             if event.key() == Qt.Key_C and (event.modifiers() & Qt.ControlModifier):
                 # 获取选中的行
                 selected_rows = self.table.selectionModel().selectedRows(1)  # 第1列是画师ID列
                 if selected_rows:
                     # 获取所有选中的画师ID
-                    artist_ids = [self.table.item(row.row(), 1).text() for row in selected_rows]
+                    artist_ids = [index.data() for index in selected_rows]
                     # 复制到剪贴板
                     clipboard = QApplication.clipboard()
                     clipboard.setText("\n".join(artist_ids))
                     return True
         return super().eventFilter(source, event)
 
+    @traced("MainWindow.load_data", "ui")
     def load_data(self):
-        artists = self.db.get_all_artists()
-        self.table.setRowCount(len(artists))
-        self.row_id_map.clear()
+        """从第一页开始加载，之后随滚动按页加载"""
+        self.model.reload()
 
-        for row_idx, artist in enumerate(artists):
-            db_id, row_id, artist_id, common_name, intro, image_paths, notes, marked = artist
-            paths = image_paths.split(';') if image_paths else []
-
-            # 存储行ID到行索引的映射
-            self.row_id_map[row_id] = row_idx
-
-            # 标记列 - 复选框
-            mark_item = QTableWidgetItem()
-            mark_item.setFlags(Qt.ItemIsUserCheckable | Qt.ItemIsEnabled)
-            mark_item.setCheckState(Qt.Checked if marked else Qt.Unchecked)
-            mark_item.setData(Qt.UserRole, db_id)  # 存储数据库ID
-            self.table.setItem(row_idx, 0, mark_item)
-
-            # 画师ID - 不可编辑
-            id_item = QTableWidgetItem(artist_id)
-            id_item.setData(Qt.UserRole, row_id)  # 存储row_id
-            id_item.setData(Qt.UserRole + 1, db_id)  # 存储数据库ID
-            id_item.setFlags(id_item.flags() & ~Qt.ItemIsEditable)  # 设置为不可编辑
-            self.table.setItem(row_idx, 1, id_item)
-
-            # 常用名
-            name_item = QTableWidgetItem(common_name)
-            name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)  # 设置为不可编辑
-            self.table.setItem(row_idx, 2, name_item)
-
-            # 简介
-            intro_item = QTableWidgetItem(intro)
-            intro_item.setFlags(intro_item.flags() & ~Qt.ItemIsEditable)  # 设置为不可编辑
-            self.table.setItem(row_idx, 3, intro_item)
-
-            # 作品展示 - 使用只读的图片展示控件
-            img_container = QWidget()
-            img_layout = QHBoxLayout(img_container)
-            img_layout.setContentsMargins(0, 0, 0, 0)
-            img_layout.setSpacing(5)
-
-            for i in range(3):
-                img_widget = ImageDisplayWidget()
-                path = paths[i] if i < len(paths) else None
-                img_widget.setImage(path)
-                img_layout.addWidget(img_widget)
-
-            self.table.setCellWidget(row_idx, 4, img_container)
-
-            # 备注
-            notes_item = QTableWidgetItem(notes)
-            notes_item.setFlags(notes_item.flags() & ~Qt.ItemIsEditable)  # 设置为不可编辑
-            self.table.setItem(row_idx, 5, notes_item)
-
-            # 操作按钮 - 使用row_id确保正确绑定
-            btn_widget = QWidget()
-            btn_layout = QHBoxLayout(btn_widget)
-            btn_layout.setContentsMargins(5, 5, 5, 5)
-
-            edit_btn = QPushButton("编辑")
-            edit_btn.setFixedHeight(35)
-            # 使用lambda传递数据库ID
-            edit_btn.clicked.connect(lambda _, id=db_id: self.edit_row_by_db_id(id))
-
-            delete_btn = QPushButton("删除")
-            delete_btn.setFixedHeight(35)
-            # 使用lambda传递row_id而不是行索引
-            delete_btn.clicked.connect(lambda _, id=row_id: self.delete_row_by_id(id))
-
-            btn_layout.addWidget(edit_btn)
-            btn_layout.addWidget(delete_btn)
-            self.table.setCellWidget(row_idx, 6, btn_widget)
+    def on_fetching_changed(self, fetching):
+        if fetching:
+            self.loading_label.setText(f"正在加载数据... 已加载 {self.model.total_count()} 条")
+            self.loading_label.show()
+            return
+        self.loading_label.hide()
+        # 第一页返回时数据库线程已完成建表和迁移，此时再打开搜索线程的连接；之前的搜索请求会保留并执行
+        if not self.search_worker.isRunning():
+            self.search_worker.start()
+            startup_timer.mark("first_page")
+            # 第一页的行在本信号之后才插入，插入完成后再判断是否为空表
+            QTimer.singleShot(0, self.on_first_page_loaded)
+            self.start_housekeeping()
+
+    def on_first_page_loaded(self):
+        if not self.model.rowCount():
+            # 空表不会再有带数据的绘制
+            self.report_startup()
+
+    def on_table_painted(self):
+        startup_timer.mark("first_paint")
+        if self.model.rowCount():
+            startup_timer.mark("first_rows_painted")
+            self.report_startup()
+
+    def report_startup(self):
+        if startup_timer.reported:
+            return
+        self.table.viewport().removeEventFilter(self)
+        text = startup_timer.report()
+        self.statusBar().showMessage(text, 5000)
+
+    def on_database_failed(self, error):
+        """数据库线程无法打开数据库，所有操作都会失败"""
+        self.statusBar().showMessage(error)
+        QMessageBox.critical(self, "数据库错误", f"{error}\n\n请检查数据库文件是否被其他程序占用或已损坏，然后重新启动。")
+
+    def start_housekeeping(self):
+        """首屏显示之后在后台清理临时图片和旧缩略图，并校验缩略图缓存"""
+        def housekeeping():
+            # 只清理本次启动之前留下的临时图片
+            clean_temp_images(older_than=self.started_at)
+            clean_legacy_thumbnails()
+
+        threading.Thread(target=housekeeping, name="startup-housekeeping", daemon=True).start()
+        self.thumbnails.validate_cache_async()
+        self.index_image_metadata()
+
+    def index_image_metadata(self):
+        """在后台增量索引图片的生成参数；正在索引时合并请求，完成后再检查一次"""
+        if self.metadata_worker is not None:
+            self._metadata_rerun = True
+            return
+        self._metadata_rerun = False
+        worker = MetadataIndexWorker(self)
+        worker.finished_index.connect(self.on_metadata_indexed)
+        self.metadata_worker = worker
+        worker.start()
+
+    def on_metadata_indexed(self, report, error):
+        self.metadata_worker.wait()
+        self.metadata_worker.deleteLater()
+        self.metadata_worker = None
+        if error:
+            print(f"索引生成参数失败: {error}")
+        elif report and report["indexed"]:
+            self.statusBar().showMessage(f"已索引 {report['indexed']} 张图片的生成参数", 5000)
+            # 正在按生成参数搜索时刷新结果
+            if self.model.search_active and \
+                    self.search_edit.text().lstrip().startswith(DatabaseManager.METADATA_SEARCH_PREFIXES):
+                self.search_timer.start()
+        if self._metadata_rerun:
+            self.index_image_metadata()
+
+    def on_artists_changed(self, change, rows):
+        """根据数据库变更只更新受影响的行，rows为数据库线程查询出的最新数据"""
+        if change.kind == ArtistChange.DELETE:
+            self.model.remove_row_ids(change.row_ids)
+            return
+
+        changed_paths = self.model.upsert_rows(rows)
+        # 只丢弃图片发生变化的行的缩略图，其余已解码的缩略图保留
+        for path in changed_paths:
+            self.thumbnails.invalidate(path)
+        # 新增或更换了图片时增量索引生成参数
+        if changed_paths or change.kind == ArtistChange.INSERT:
+            self.index_image_metadata()
+
+        if self.model.search_active:
+            # 数据变化后重新执行当前搜索
+            self.search_timer.start()
+
+    def visible_row_range(self):
+        """返回当前可见行的范围 (first, last)，没有行时返回None"""
+        if self.model.rowCount() == 0:
+            return None
+        first = max(self.table.rowAt(0), 0)
+        last = self.table.rowAt(self.table.viewport().height() - 1)
+        if last < 0:
+            last = self.model.rowCount() - 1
+        return first, last
+
+    def image_paths_of_rows(self, first, last):
+        paths = []
+        for row in range(max(first, 0), min(last, self.model.rowCount() - 1) + 1):
+            paths.extend(p for p in self.model.record(row).image_paths if p)
+        return paths
+
+    def update_visible_thumbnails(self):
+        visible = self.visible_row_range()
+        if visible is None:
+            return
+        first, last = visible
+        page = last - first + 1
+        prefetch = self.image_paths_of_rows(last + 1, last + page)
+        self.thumbnails.retain(self.image_paths_of_rows(first, last) + prefetch)
+        self.thumbnails.prefetch(prefetch)
+
+    def show_thumbnail_stats(self):
+        stats = get_thumbnail_scheduler().stats()
+        if stats["queue_depth"] or stats["running"]:
+            pixmaps = get_pixmap_cache().stats()
+            self.statusBar().showMessage(
+                f"缩略图队列: {stats['queue_depth']}  处理中: {stats['running']}/{stats['workers']}  "
+                f"速度: {stats['throughput']:.1f} 张/秒  "
+                f"内存缓存命中率: {pixmaps['hit_rate']:.0%} ({pixmaps['bytes'] // 1024} KB)", 2000)
 
     def add_artist(self):
         """添加新画师"""
@@ -1130,25 +2004,23 @@ class MainWindow(QMainWindow):
             notes = notes_edit.toPlainText()
             marked = 1 if mark_checkbox.isChecked() else 0
 
-            # 重命名图片
-            renamed_paths = img_edit.renameImages(artist_id)
-            image_paths = ";".join(p for p in renamed_paths if p)
-
             # 生成唯一行ID
             row_id = str(uuid.uuid4())
 
-            # 保存到数据库
-            self.db.add_artist((row_id, artist_id, common_name, intro, image_paths, notes, marked))
-
-            # 添加到表格
-            self.load_data()
-
-            dialog.accept()
+            # 保存到数据库，图片在数据库线程中暂存并一起提交，表格通过数据库变更通知插入新行
+            save_btn.setEnabled(False)
+            self.db.submit(DatabaseManager.add_artist,
+                           (row_id, artist_id, common_name, intro, None, notes, marked),
+                           images=img_edit.imagesForSave()).then(
+                lambda _: dialog.accept(),
+                lambda error: (save_btn.setEnabled(True),
+                               QMessageBox.critical(dialog, "保存失败", f"保存过程中出错: {error}")))
 
         def cancel_edit():
             # 删除编辑过程中上传的临时图片
+            img_edit.discard_pending()
             for path in img_edit.getImagePaths():
-                if path and os.path.basename(path).startswith("temp_"):
+                if is_temp_image(path):
                     try:
                         if os.path.exists(path):
                             os.remove(path)
@@ -1161,36 +2033,9 @@ class MainWindow(QMainWindow):
 
         dialog.exec_()
 
-    def find_existing_images(self, artist_id):
-        """查找图片文件夹中符合命名规则的图片"""
-        if not artist_id:
-            return []
-
-        images = []
-        for i in range(1, 4):
-            possible_paths = [
-                os.path.join(IMAGE_DIR, f"{artist_id}-{i}.png"),
-                os.path.join(IMAGE_DIR, f"{artist_id}-{i}.jpg"),
-                os.path.join(IMAGE_DIR, f"{artist_id}-{i}.jpeg")
-            ]
-
-            found = False
-            for path in possible_paths:
-                if os.path.exists(path):
-                    # 存储相对路径
-                    rel_path = os.path.relpath(path, IMAGE_DIR)
-                    images.append(rel_path)
-                    found = True
-                    break
-
-            if not found:
-                images.append(None)
-
-        return images
-
     def get_row_index_by_id(self, row_id):
         """根据行ID获取当前行索引"""
-        return self.row_id_map.get(row_id, -1)
+        return self.model.row_of(row_id)
 
     def edit_row_by_db_id(self, db_id):
         """根据数据库ID编辑行"""
@@ -1210,73 +2055,112 @@ class MainWindow(QMainWindow):
         )
 
         if reply == QMessageBox.Yes:
-            # 从数据库删除
-            self.db.delete_artist(row_id)
-
-            # 从表格删除
-            self.table.removeRow(row_idx)
-
-            # 从映射中删除
-            if row_id in self.row_id_map:
-                del self.row_id_map[row_id]
-
-            # 更新映射中的行索引
-            for id, idx in list(self.row_id_map.items()):
-                if idx > row_idx:
-                    self.row_id_map[id] = idx - 1
+            # 从数据库删除，表格通过变更通知移除该行
+            self.db.submit(DatabaseManager.delete_artist, row_id)
 
     def apply_filters(self):
-        search_text = self.search_edit.text().lower()
-
-        for row in range(self.table.rowCount()):
-            # 获取各列内容
-            artist_id = self.table.item(row, 1).text().lower() if self.table.item(row, 1) else ""
-            common_name = self.table.item(row, 2).text().lower() if self.table.item(row, 2) else ""
-            intro = self.table.item(row, 3).text().lower() if self.table.item(row, 3) else ""
-            notes = self.table.item(row, 5).text().lower() if self.table.item(row, 5) else ""
-
-            # 检查任意一列是否包含搜索文本
-            match = (search_text in artist_id or
-                     search_text in common_name or
-                     search_text in intro or
-                     search_text in notes)
+        """搜索框内容变化：清空时立即显示全部，否则延迟搜索"""
+        # 连接到textChanged信号，不能用装饰器（包装后的函数会收到多余的参数）
+        with span("MainWindow.apply_filters", "ui"):
+            if not self.search_edit.text().strip():
+                self.search_timer.stop()
+                self._search_seq += 1  # 丢弃尚未返回的搜索结果
+                self.model.set_search_results(None)
+                return
+            self.search_timer.start()
 
-            self.table.setRowHidden(row, not match)
+    def run_search(self):
+        text = self.search_edit.text().strip()
+        if not text:
+            return
+        self._search_seq += 1
+        # 开始搜索时按相关度排序，已在搜索状态时保持用户选择的排序
+        sort_field, descending = self.model.sort_spec() if self.model.search_active else (None, False)
+        self.search_worker.search(self._search_seq, text, sort_field, descending)
+
+    @traced("MainWindow.on_search_results", "ui")
+    def on_search_results(self, seq, ids):
+        if seq != self._search_seq:
+            return  # 已有更新的搜索
+        if not self.model.search_active:
+            # 开始搜索时按相关度排序，只更新表头，不触发重新加载
+            self.model.clear_sort()
+            header = self.table.horizontalHeader()
+            header.blockSignals(True)
+            header.setSortIndicator(-1, Qt.AscendingOrder)
+            header.blockSignals(False)
+            header.viewport().update()
+        self.model.set_search_results(ids)
+
+    def closeEvent(self, event):
+        self.search_worker.stop()
+        if self.import_future is not None:
+            self.import_future.cancel()
+        if self.scan_future is not None:
+            self.scan_future.cancel()
+        if self.export_worker is not None:
+            self.export_worker.requestInterruption()
+            self.export_worker.wait()
+        if self.refresh_worker is not None:
+            self.refresh_worker.requestInterruption()
+            self.refresh_worker.wait()
+        if self.metadata_worker is not None:
+            self.metadata_worker.requestInterruption()
+            self.metadata_worker.wait()
+        # 等待已提交的写入完成
+        self.db.stop()
+        super().closeEvent(event)
+
+    EXPORT_FILTERS = {
+        "Excel文件 (*.xlsx)": ".xlsx",
+        "CSV文件 (*.csv)": ".csv",
+        "JSON Lines文件 (*.jsonl)": ".jsonl",
+        "Parquet文件 (*.parquet)": ".parquet",
+    }
 
     def export_data(self):
-        file, _ = QFileDialog.getSaveFileName(
-            self, "导出数据", "", "Excel文件 (*.xlsx)"
+        file, selected_filter = QFileDialog.getSaveFileName(
+            self, "导出数据", "", ";;".join(self.EXPORT_FILTERS)
         )
 
         if not file:
             return
 
-        try:
-            # 收集所有数据
-            data = []
-            for row in range(self.table.rowCount()):
-                if not self.table.isRowHidden(row):
-                    artist_id = self.table.item(row, 1).text() if self.table.item(row, 1) else ""
-                    common_name = self.table.item(row, 2).text() if self.table.item(row, 2) else ""
-                    intro = self.table.item(row, 3).text() if self.table.item(row, 3) else ""
-                    notes = self.table.item(row, 5).text() if self.table.item(row, 5) else ""
-                    marked = self.table.item(row, 0).checkState() == Qt.Checked
-
-                    data.append({
-                        "画师ID": artist_id,
-                        "常用名": common_name,
-                        "简介": intro,
-                        "备注": notes,
-                        "标记": marked
-                    })
-
-            # 创建DataFrame并导出为Excel
-            df = pd.DataFrame(data)
-            df.to_excel(file, index=False)
-
-            QMessageBox.information(self, "导出成功", "数据已成功导出为Excel文件")
-        except Exception as e:
-            QMessageBox.critical(self, "导出失败", f"导出过程中出错: {str(e)}")
+        if self.export_worker is not None:
+            return
+
+        if os.path.splitext(file)[1].lower() not in EXPORT_WRITERS:
+            file += self.EXPORT_FILTERS.get(selected_filter, ".xlsx")
+
+        # 导出当前搜索结果，顺序与表格一致
+        search_text = self.search_edit.text().strip() if self.model.search_active else None
+        sort_field, descending = self.model.sort_spec()
+
+        progress = QProgressDialog("正在导出数据...", "取消", 0, 0, self)
+        progress.setWindowTitle("导出数据")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+
+        worker = ExportWorker(file, search_text, sort_field, descending, self)
+        worker.progress.connect(lambda done, total: (progress.setMaximum(total), progress.setValue(done)))
+        worker.finished_export.connect(lambda count, error: self.on_export_finished(progress, count, error))
+        progress.canceled.connect(worker.requestInterruption)
+        self.export_worker = worker
+        worker.start()
+
+    def on_export_finished(self, progress, count, error):
+        """导出线程结束后提示结果"""
+        self.export_worker.wait()
+        self.export_worker.deleteLater()
+        self.export_worker = None
+        progress.close()
+
+        if error:
+            QMessageBox.critical(self, "导出失败", f"导出过程中出错: {error}")
+        elif count is None:
+            QMessageBox.information(self, "导出取消", "导出已取消")
+        else:
+            QMessageBox.information(self, "导出成功", f"已导出 {count} 条数据")
 
     def import_data(self):
         file, _ = QFileDialog.getOpenFileName(
@@ -1286,108 +2170,110 @@ class MainWindow(QMainWindow):
         if not file:
             return
 
-        # 直接导入，不显示确认弹窗
-        # 清空当前表格
-        self.table.setRowCount(0)
-        self.row_id_map.clear()
+        if self.import_future is not None:
+            return
 
-        # 导入数据
-        if self.db.import_from_excel(file):
-            self.load_data()
-            QMessageBox.information(self, "导入成功", "数据导入成功")
+        # 直接导入，不显示确认弹窗，在数据库线程中执行
+        progress = QProgressDialog("正在导入数据...", "取消", 0, 0, self)
+        progress.setWindowTitle("导入数据")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+
+        future = self.db.submit(DatabaseManager.import_from_excel, file, with_progress=True)
+        future.progress.connect(lambda done, total: (progress.setMaximum(total), progress.setValue(done)))
+        future.finished.connect(lambda row_ids: self.on_import_finished(progress, row_ids))
+        future.failed.connect(lambda error: self.on_import_finished(progress, [], error))
+        progress.canceled.connect(future.cancel)
+        self.import_future = future
+
+    def on_import_finished(self, progress, row_ids, error=None):
+        """导入结束后提示结果，新行已通过数据库变更通知插入表格。error为导入失败时的错误信息"""
+        cancelled = self.import_future.is_cancelled()
+        self.import_future = None
+        progress.close()
+
+        if cancelled:
+            QMessageBox.information(self, "导入取消", "导入已取消，未写入任何数据")
+        elif error is not None:
+            QMessageBox.critical(self, "导入失败", f"导入过程中出错，未写入任何数据: {error}")
+        elif row_ids:
+            QMessageBox.information(self, "导入成功", f"数据导入成功，共导入 {len(row_ids)} 条")
         else:
-            QMessageBox.critical(self, "导入失败", "导入过程中出错，请检查文件格式")
+            QMessageBox.information(self, "导入完成", "文件中没有可导入的数据，未导入任何数据")
 
     def refresh_images(self):
-        """刷新所有图片并重新生成缩略图"""
-        reply = QMessageBox.question(
-            self, "确认刷新",
-            "这将重新生成所有缩略图，可能需要较长时间。继续吗？",
-            QMessageBox.Yes | QMessageBox.No
-        )
-
-        if reply != QMessageBox.Yes:
+        """在后台重新生成缺失或过期的缩略图，已有的有效缩略图保留"""
+        if self.refresh_worker is not None:
             return
 
-        # 创建进度对话框
-        progress = QProgressDialog("刷新图片中...", "取消", 0, self.table.rowCount(), self)
-        progress.setWindowTitle("图片刷新")
+        progress = QProgressDialog("正在检查缩略图...", "取消", 0, 0, self)
+        progress.setWindowTitle("刷新缩略图")
         progress.setWindowModality(Qt.WindowModal)
-
-        # 清理缩略图目录
-        for thumb_file in glob.glob(os.path.join(THUMB_DIR, "*_thumb.*")):
-            try:
-                os.remove(thumb_file)
-            except:
-                pass
-
-        # 重新生成所有缩略图
-        for row in range(self.table.rowCount()):
-            progress.setValue(row)
-            QApplication.processEvents()  # 处理事件循环，避免界面冻结
-
-            if progress.wasCanceled():
-                break
-
-            # 获取图片容器
-            img_container = self.table.cellWidget(row, 4)
-            if img_container and img_container.layout():
-                for i in range(img_container.layout().count()):
-                    widget = img_container.layout().itemAt(i).widget()
-                    if isinstance(widget, ImageDisplayWidget):
-                        widget.update_image()  # 强制刷新图片
-
-        progress.setValue(self.table.rowCount())
-        QMessageBox.information(self, "完成", "所有缩略图已重新生成")
+        progress.setMinimumDuration(300)
+
+        worker = ThumbnailRefreshWorker(self)
+        worker.progress.connect(lambda done, total: (
+            progress.setLabelText(f"正在生成缩略图 {done}/{total}..."),
+            progress.setMaximum(total), progress.setValue(done)))
+        worker.generated.connect(self.on_thumbnail_refreshed)
+        worker.finished_refresh.connect(lambda result, error: self.on_refresh_finished(progress, result, error))
+        progress.canceled.connect(worker.requestInterruption)
+        self.refresh_worker = worker
+        worker.start()
+
+    def on_thumbnail_refreshed(self, src):
+        """新缩略图已写入缓存，清除该图片的失败标记并重绘"""
+        self.thumbnails.invalidate(src)
+        self.table.viewport().update()
+
+    def on_refresh_finished(self, progress, result, error):
+        self.refresh_worker.wait()
+        self.refresh_worker.deleteLater()
+        self.refresh_worker = None
+        progress.close()
+
+        if error:
+            QMessageBox.critical(self, "刷新失败", f"刷新缩略图时出错: {error}")
+            return
+        generated, failed, cancelled = result
+        msg = f"已生成 {generated} 张缩略图" + (f"，{failed} 张失败" if failed else "")
+        if cancelled:
+            QMessageBox.information(self, "刷新取消", f"刷新已取消，{msg}")
+        else:
+            QMessageBox.information(self, "完成", msg if generated or failed else "所有缩略图都是最新的")
 
     def scan_missing_images(self):
-        """扫描缺失图片并尝试重新匹配"""
-        missing_count = 0
-        found_count = 0
+        """在后台检查全部记录的图片，找到的图片写回数据库，已加载的行通过变更通知更新"""
+        if self.scan_future is not None:
+            return
 
-        # 创建进度对话框
-        progress = QProgressDialog("扫描图片中...", "取消", 0, self.table.rowCount(), self)
+        progress = QProgressDialog("扫描图片中...", "取消", 0, 0, self)
         progress.setWindowTitle("图片扫描")
         progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
 
-        for row in range(self.table.rowCount()):
-            progress.setValue(row)
-            QApplication.processEvents()  # 处理事件循环，避免界面冻结
-
-            if progress.wasCanceled():
-                break
+        future = self.db.submit(DatabaseManager.scan_images, with_progress=True)
+        future.progress.connect(lambda done, total: (progress.setMaximum(total), progress.setValue(done)))
+        future.finished.connect(lambda report: self.on_scan_finished(progress, report))
+        future.failed.connect(lambda error: self.on_scan_finished(progress, None, error))
+        progress.canceled.connect(future.cancel)
+        self.scan_future = future
 
-            artist_id = self.table.item(row, 1).text()
-            if not artist_id:
-                continue
+    def on_scan_finished(self, progress, report, error=None):
+        self.scan_future = None
+        progress.close()
 
-            # 获取图片容器
-            img_container = self.table.cellWidget(row, 4)
-            if img_container and img_container.layout():
-                for i in range(img_container.layout().count()):
-                    widget = img_container.layout().itemAt(i).widget()
-                    if isinstance(widget, ImageDisplayWidget):
-                        if not widget.image_path or not os.path.exists(widget.image_path):
-                            # 尝试查找匹配图片
-                            possible_paths = [
-                                os.path.join(IMAGE_DIR, f"{artist_id}-{i + 1}.png"),
-                                os.path.join(IMAGE_DIR, f"{artist_id}-{i + 1}.jpg"),
-                                os.path.join(IMAGE_DIR, f"{artist_id}-{i + 1}.jpeg")
-                            ]
-
-                            found = False
-                            for path in possible_paths:
-                                if os.path.exists(path):
-                                    widget.setImage(path)
-                                    found = True
-                                    found_count += 1
-                                    break
-
-                            if not found:
-                                missing_count += 1
-
-        progress.setValue(self.table.rowCount())
-        msg = f"扫描完成:\n找到 {found_count} 张图片\n缺失 {missing_count} 张图片"
+        if error:
+            QMessageBox.critical(self, "扫描失败", f"扫描图片时出错: {error}")
+            return
+        if report is None:
+            QMessageBox.information(self, "扫描取消", "扫描已取消，未修改任何数据")
+            return
+        for _, _, path in report["found"]:
+            self.thumbnails.invalidate(path)
+        msg = (f"扫描完成:\n找到并修复 {len(report['found'])} 张图片（{report['updated']} 条记录）\n"
+               f"缺失 {len(report['missing'])} 张图片\n"
+               f"没有记录引用的图片 {len(report['orphaned'])} 张")
         QMessageBox.information(self, "扫描结果", msg)
 
     def show_context_menu(self, position):
@@ -1396,21 +2282,19 @@ class MainWindow(QMainWindow):
 
         if row >= 0:
             # 查看图片选项
-            img_container = self.table.cellWidget(row, 4)
-            if img_container and img_container.layout():
-                img_menu = menu.addMenu("查看图片")
-                for i in range(img_container.layout().count()):
-                    widget = img_container.layout().itemAt(i).widget()
-                    if isinstance(widget, ImageDisplayWidget) and widget.image_path:
-                        action = img_menu.addAction(f"图片 {i + 1}")
-                        action.triggered.connect(lambda _, r=row, idx=i: self.view_image(r, idx))
+            record = self.model.record(row)
+            img_menu = menu.addMenu("查看图片")
+            for i, path in enumerate(record.image_paths):
+                if path:
+                    action = img_menu.addAction(f"图片 {i + 1}")
+                    action.triggered.connect(lambda _, r=row, idx=i: self.view_image(r, idx))
 
             copy_id_action = QAction("复制画师ID", self)
-            copy_id_action.triggered.connect(lambda: self.copy_to_clipboard(row, 1))  # 画师ID在第1列
+            copy_id_action.triggered.connect(lambda: self.copy_to_clipboard(row, ArtistTableModel.COL_ID))
             menu.addAction(copy_id_action)
 
             copy_name_action = QAction("复制常用名", self)
-            copy_name_action.triggered.connect(lambda: self.copy_to_clipboard(row, 2))  # 常用名在第2列
+            copy_name_action.triggered.connect(lambda: self.copy_to_clipboard(row, ArtistTableModel.COL_NAME))
             menu.addAction(copy_name_action)
 
             menu.addSeparator()
@@ -1418,22 +2302,24 @@ class MainWindow(QMainWindow):
         menu.exec_(self.table.viewport().mapToGlobal(position))
 
     def copy_to_clipboard(self, row, column):
-        item = self.table.item(row, column)
-        if item:
-            text = item.text()
+        text = self.model.index(row, column).data()
+        if text:
             clipboard = QApplication.clipboard()
             clipboard.setText(text)
 
     def view_image(self, row, index):
         """查看指定行的图片"""
-        img_container = self.table.cellWidget(row, 4)
-        if img_container and img_container.layout():
-            widget = img_container.layout().itemAt(index).widget()
-            if isinstance(widget, ImageDisplayWidget) and widget.image_path:
-                QDesktopServices.openUrl(QUrl.fromLocalFile(widget.image_path))
+        record = self.model.record(row)
+        if record and index < len(record.image_paths):
+            path = resolve_image_path(record.image_paths[index])
+            if path and os.path.exists(path):
+                QDesktopServices.openUrl(QUrl.fromLocalFile(path))
 
 
 if __name__ == "__main__":
+    # 打包后的程序启动缩略图子进程时需要
+    multiprocessing.freeze_support()
+    ensure_directories()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
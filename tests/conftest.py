@@ -0,0 +1,35 @@
+"""测试在临时数据目录中运行：导入artist_manager之前设置ARTIST_MANAGER_HOME，不会碰到应用目录下的数据"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.environ["ARTIST_MANAGER_HOME"] = tempfile.mkdtemp(prefix="artist_manager_test_")
+
+
+@pytest.fixture
+def app_env(tmp_path):
+    """独立数据目录的子进程环境，用于需要全新进程状态（例如内存中的哈希缓存为空）的测试"""
+    env = dict(os.environ, ARTIST_MANAGER_HOME=str(tmp_path), PYTHONPATH=ROOT_DIR)
+    os.makedirs(tmp_path / "artist_images", exist_ok=True)
+    return env
+
+
+def run_python(env, code):
+    """在新进程中执行代码，返回标准输出"""
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def run_cli(env, *args):
+    """执行命令行批处理，返回输出的事件列表"""
+    result = subprocess.run([sys.executable, "-m", "artist_manager", *args], env=env, capture_output=True,
+                            text=True, timeout=60)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return [json.loads(line) for line in result.stdout.splitlines()]
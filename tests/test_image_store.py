@@ -0,0 +1,61 @@
+import os
+
+from conftest import run_cli, run_python
+
+SAVE_WITH_SYMLINK = """
+import os
+from artist_manager.db import DatabaseManager
+from artist_manager.images import ImageTransaction
+from artist_manager.settings import IMAGE_DIR
+
+def no_link(*args, **kwargs):
+    raise OSError("hard links not supported")
+
+os.link = no_link  # 强制退回到符号链接
+src = os.path.join(IMAGE_DIR, "temp_paste.png")
+with open(src, "wb") as f:
+    f.write(b"image-1")
+db = DatabaseManager()
+tx = ImageTransaction()
+paths = tx.stage([src, None, None], "x1")
+db.add_artist(("r1", "x1", "名", "", ";".join(p or "" for p in paths), "", 0), tx)
+print(db.cursor.execute("SELECT hash FROM artist_images WHERE slot=1").fetchone()[0])
+"""
+
+
+def test_scan_fix_then_gc_keeps_symlinked_objects(app_env):
+    env = dict(app_env, ARTIST_MANAGER_IMAGE_STORE="content")
+    digest = run_python(env, SAVE_WITH_SYMLINK).strip()
+    image_dir = os.path.join(env["ARTIST_MANAGER_HOME"], "artist_images")
+    image = os.path.join(image_dir, "x1-1.png")
+    assert digest and os.path.islink(image)
+
+    # 第二个位置的图片按命名规则被找到，scan --fix 会重写该画师全部位置的记录
+    with open(os.path.join(image_dir, "x1-2.png"), "wb") as f:
+        f.write(b"image-2")
+    events = run_cli(env, "scan", "--fix")
+    assert events[-1]["updated"] == 1
+    hashes = run_python(env, "from artist_manager.db import DatabaseManager\n"
+                             "print(sorted(DatabaseManager().get_image_hashes()))")
+    assert digest in hashes
+
+    events = run_cli(env, "gc")
+    assert [e for e in events if e["event"] == "objects_removed"][0]["objects"] == 0
+    with open(image, "rb") as f:
+        assert f.read() == b"image-1"
+
+
+def test_gc_keeps_objects_referenced_only_by_symlinks(tmp_path):
+    from artist_manager.image_store import ContentImageStore
+
+    store = ContentImageStore(str(tmp_path))
+    src = tmp_path / "temp_a.png"
+    src.write_bytes(b"data")
+    digest, obj = store.add(str(src))
+    os.remove(src)
+    os.symlink(os.path.relpath(obj, tmp_path), tmp_path / "a-1.png")
+    assert store.hash_of(str(tmp_path / "a-1.png"), compute=False) == digest
+
+    assert store.gc(set()) == (0, 0)
+    os.remove(tmp_path / "a-1.png")
+    assert store.gc(set())[0] == 1
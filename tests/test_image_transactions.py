@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+
+from conftest import run_python
+from artist_manager.images import ImageTransaction, recover_image_transactions, JOURNAL_DIR_NAME
+
+# 数据库已提交，替换完第一张图片后进程崩溃
+CRASH_MID_COMMIT = """
+import os
+from artist_manager.db import DatabaseManager
+from artist_manager.images import ImageTransaction
+from artist_manager.settings import IMAGE_DIR
+
+def crash(self):
+    os.replace(self.ops[0]["staged"], self.ops[0]["dest"])
+    os._exit(3)
+
+ImageTransaction.commit = crash
+images = []
+for i in range(2):
+    images.append(os.path.join(IMAGE_DIR, f"temp_{i}.png"))
+    with open(images[-1], "wb") as f:
+        f.write(b"image-%d" % i)
+DatabaseManager().add_artist(("r1", "x1", "名", "", None, "", 0), images=images + [None])
+"""
+
+RECOVER = """
+from artist_manager.db import DatabaseManager
+db = DatabaseManager()
+print(db.cursor.execute("SELECT COUNT(*) FROM image_transactions").fetchone()[0])
+print(db.cursor.execute("SELECT image_paths FROM artists").fetchone()[0])
+"""
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_journal_left_mid_commit_rolls_forward(app_env):
+    result = subprocess.run([sys.executable, "-c", CRASH_MID_COMMIT], env=app_env, capture_output=True, text=True,
+                            timeout=60)
+    assert result.returncode == 3, result.stderr
+    image_dir = os.path.join(app_env["ARTIST_MANAGER_HOME"], "artist_images")
+    journal_dir = os.path.join(image_dir, JOURNAL_DIR_NAME)
+    assert len([name for name in os.listdir(journal_dir) if name.endswith(".json")]) == 1
+    assert not os.path.exists(os.path.join(image_dir, "x1-2.png"))
+
+    # 下次打开数据库时前滚：剩下的暂存文件替换到位，临时图片和日志删除，事务ID清除
+    assert run_python(app_env, RECOVER).split() == ["0", "x1-1.png;x1-2.png"]
+    assert read(os.path.join(image_dir, "x1-1.png")) == b"image-0"
+    assert read(os.path.join(image_dir, "x1-2.png")) == b"image-1"
+    assert sorted(os.listdir(image_dir)) == [JOURNAL_DIR_NAME, "x1-1.png", "x1-2.png"]
+    assert os.listdir(journal_dir) == []
+
+
+def test_uncommitted_journal_rolls_back(tmp_path):
+    src = tmp_path / "temp_paste.png"
+    write(src, b"new")
+    write(tmp_path / "x1-1.png", b"old")
+    tx = ImageTransaction(image_dir=str(tmp_path))
+    assert tx.stage([str(src), None, None], "x1") == ["x1-1.png", None, None]
+    assert not src.exists()
+    # 模拟进程在数据库提交前退出：锁随进程释放，日志留下
+    tx.lock.release()
+
+    assert recover_image_transactions(set(), str(tmp_path)) == set()
+    assert read(src) == b"new"
+    assert read(tmp_path / "x1-1.png") == b"old"
+    assert sorted(os.listdir(tmp_path)) == [JOURNAL_DIR_NAME, "temp_paste.png", "x1-1.png"]
+    assert os.listdir(tmp_path / JOURNAL_DIR_NAME) == []
+
+
+def test_recovery_skips_transactions_still_in_progress(tmp_path):
+    src = tmp_path / "source.png"
+    write(src, b"new")
+    tx = ImageTransaction(image_dir=str(tmp_path))
+    tx.stage([str(src), None, None], "x1")
+    staged = tx.ops[0]["staged"]
+
+    # 锁仍被持有，无论数据库中是否已提交都不处理
+    assert recover_image_transactions({tx.id}, str(tmp_path)) == set()
+    assert recover_image_transactions(set(), str(tmp_path)) == set()
+    assert os.path.exists(staged) and os.path.exists(tx.journal_path)
+
+    tx.commit()
+    assert read(tmp_path / "x1-1.png") == b"new"
+    assert not os.path.exists(tx.journal_path)
+    # 日志已不存在的已提交事务视为已完成
+    assert recover_image_transactions({tx.id}, str(tmp_path)) == {tx.id}
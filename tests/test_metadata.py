@@ -0,0 +1,142 @@
+import json
+import struct
+import zlib
+
+from artist_manager import metadata
+from artist_manager.metadata import (PNG_SIGNATURE, decode_text_chunk, read_generation_metadata, read_png_text)
+
+A1111_PARAMETERS = """masterpiece, 1girl <lora:styleA:0.8>
+smile
+Negative prompt: lowres, bad hands
+Steps: 28, Sampler: DPM++ 2M, CFG scale: 7, Seed: 12345, Size: 832x1216, Model: animeXL, Lora hashes: "styleA: abc, styleB: def\""""
+
+COMFYUI_PROMPT = {
+    "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "base.safetensors"}},
+    "10": {"class_type": "LoraLoader", "inputs": {"lora_name": "style.safetensors", "model": ["4", 0]}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "a cat", "clip": ["10", 1]}},
+    "7": {"class_type": "CLIPTextEncode", "inputs": {"text": ["8", 0], "clip": ["10", 1]}},
+    "8": {"class_type": "PrimitiveString", "inputs": {"string": "blurry"}},
+    "3": {"class_type": "KSampler", "inputs": {"seed": 42, "steps": 20, "cfg": 6.5, "sampler_name": "euler",
+                                               "positive": ["6", 0], "negative": ["7", 0], "model": ["10", 0]}},
+}
+
+
+def chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def text(key, value):
+    return chunk(b"tEXt", key.encode("latin-1") + b"\0" + value.encode("utf-8"))
+
+
+def ztxt(key, data):
+    return chunk(b"zTXt", key.encode("latin-1") + b"\0\0" + data)
+
+
+def itxt(key, data, compressed=False):
+    return chunk(b"iTXt", key.encode("latin-1") + b"\0" + (b"\1\0" if compressed else b"\0\0") + b"\0\0" + data)
+
+
+def write_png(path, *chunks):
+    ihdr = chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0))
+    idat = chunk(b"IDAT", zlib.compress(b"\0\0"))
+    with open(path, "wb") as f:
+        f.write(PNG_SIGNATURE + ihdr + b"".join(chunks) + idat + text("after", "image data") + chunk(b"IEND", b""))
+    return str(path)
+
+
+def test_a1111_parameters(tmp_path):
+    path = write_png(tmp_path / "a.png", text("parameters", A1111_PARAMETERS))
+    result = read_generation_metadata(path)
+    assert result["generator"] == "a1111"
+    assert result["prompt"] == "masterpiece, 1girl <lora:styleA:0.8>\nsmile"
+    assert result["negative_prompt"] == "lowres, bad hands"
+    assert result["model"] == "animeXL; styleA"
+    assert result["seed"] == "12345"
+    assert result["settings"].startswith("Steps: 28")
+
+
+def test_a1111_parameters_in_compressed_itxt(tmp_path):
+    path = write_png(tmp_path / "a.png", itxt("parameters", zlib.compress(A1111_PARAMETERS.encode()), True))
+    assert read_generation_metadata(path)["seed"] == "12345"
+
+
+def test_comfyui_prompt(tmp_path):
+    path = write_png(tmp_path / "c.png", text("prompt", json.dumps(COMFYUI_PROMPT)),
+                     text("workflow", json.dumps({"nodes": []})))
+    result = read_generation_metadata(path)
+    assert result["generator"] == "comfyui"
+    assert result["prompt"] == "a cat"
+    assert result["negative_prompt"] == "blurry"
+    assert result["model"] == "base.safetensors; style.safetensors"
+    assert result["seed"] == "42"
+    assert result["settings"] == "steps: 20, cfg: 6.5, sampler_name: euler"
+
+
+def test_comfyui_workflow_only(tmp_path):
+    workflow = {"nodes": [{"type": "CheckpointLoaderSimple", "widgets_values": ["flux1-dev.safetensors"]},
+                          {"type": "KSampler", "widgets_values": [1, "fixed", 20]}]}
+    path = write_png(tmp_path / "w.png", text("workflow", json.dumps(workflow)))
+    assert read_generation_metadata(path)["model"] == "flux1-dev.safetensors"
+
+
+def test_novelai(tmp_path):
+    comment = {"prompt": "1girl, {best quality}", "uc": "lowres", "steps": 28, "scale": 5, "seed": 987,
+               "sampler": "k_euler_ancestral"}
+    path = write_png(tmp_path / "n.png", text("Software", "NovelAI"), text("Source", "NovelAI Diffusion V4 F0D2"),
+                     text("Comment", json.dumps(comment)))
+    result = read_generation_metadata(path)
+    assert result["generator"] == "novelai"
+    assert result["prompt"] == "1girl, {best quality}"
+    assert result["negative_prompt"] == "lowres"
+    assert result["model"] == "NovelAI Diffusion V4 F0D2"
+    assert result["seed"] == "987"
+    assert result["settings"] == "steps: 28, scale: 5, sampler: k_euler_ancestral"
+
+
+def test_fooocus(tmp_path):
+    parameters = {"prompt": "風景", "negative_prompt": "", "base_model": "juggernautXL.safetensors",
+                  "refiner_model": "None", "seed": "5", "performance": "Speed", "resolution": "(1024, 1024)"}
+    path = write_png(tmp_path / "f.png", text("parameters", json.dumps(parameters, ensure_ascii=False)))
+    result = read_generation_metadata(path)
+    assert result["generator"] == "fooocus"
+    assert result["prompt"] == "風景"
+    assert result["model"] == "juggernautXL.safetensors; None"
+    assert result["seed"] == "5"
+    assert result["settings"] == "performance: Speed, resolution: (1024, 1024)"
+
+
+def test_malformed_text_chunks():
+    assert decode_text_chunk(b"zTXt", b"parameters\0\0not zlib") is None
+    assert decode_text_chunk(b"zTXt", b"parameters\0") is None
+    # 截断的压缩数据不返回部分文本
+    assert decode_text_chunk(b"zTXt", b"parameters\0\0" + zlib.compress(A1111_PARAMETERS.encode())[:-8]) is None
+    assert decode_text_chunk(b"iTXt", b"parameters\0\1\0\0\0not zlib") is None
+    assert decode_text_chunk(b"iTXt", b"parameters\0\1") is None
+    # 缺少语言和翻译关键字的分隔符时文本为空，不抛出异常
+    assert decode_text_chunk(b"iTXt", b"parameters\0\0\0") == ("parameters", "")
+    assert decode_text_chunk(b"tEXt", b"no separator") is None
+    assert decode_text_chunk(b"tEXt", b"\0empty keyword") is None
+
+
+def test_oversized_compressed_chunk_is_skipped(monkeypatch):
+    monkeypatch.setattr(metadata, "MAX_TEXT_CHUNK", 1024)
+    assert decode_text_chunk(b"zTXt", b"parameters\0\0" + zlib.compress(b"x" * 4096)) is None
+
+
+def test_malformed_png_files(tmp_path):
+    path = write_png(tmp_path / "bad.png", ztxt("parameters", b"not zlib"),
+                     itxt("prompt", b"{broken json"), itxt("workflow", b"\x78\x9c garbage", True))
+    assert read_png_text(path) == {"prompt": "{broken json"}
+    assert read_generation_metadata(path) is None
+
+    # 数据块长度超出文件末尾
+    truncated = tmp_path / "truncated.png"
+    truncated.write_bytes(PNG_SIGNATURE + struct.pack(">I", 1000) + b"tEXtparameters\0short")
+    assert read_png_text(str(truncated)) == {}
+
+    jpeg = tmp_path / "image.jpg"
+    jpeg.write_bytes(b"\xff\xd8\xff\xe0" + b"\0" * 32)
+    assert read_generation_metadata(str(jpeg)) is None
+    assert read_generation_metadata(str(tmp_path / "missing.png")) is None
+    assert read_generation_metadata(None) is None
@@ -0,0 +1,86 @@
+import sqlite3
+
+import pytest
+
+from artist_manager import db as db_module
+from artist_manager.db import DatabaseManager, SCHEMA_MIGRATIONS
+
+# 第一个版本的表结构：没有user_version，图片字段丢掉空位置
+BASELINE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artists (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    row_id TEXT UNIQUE,
+    artist_id TEXT,
+    common_name TEXT,
+    introduction TEXT,
+    image_paths TEXT,
+    notes TEXT,
+    marked BOOLEAN DEFAULT 0
+)
+"""
+
+
+def make_baseline(path):
+    conn = sqlite3.connect(path)
+    conn.execute(BASELINE_SCHEMA)
+    conn.executemany("INSERT INTO artists (row_id, artist_id, common_name, introduction, image_paths, notes, marked)"
+                     " VALUES (?, ?, ?, ?, ?, ?, ?)", [
+                         ("r1", "a1", "甲", "简介", "a1-1.png;a1-3.png", None, 1),
+                         ("r2", "b2", "乙", None, "b2-2.jpg", "备注", None),
+                         ("r3", "c3", "丙", "", "", "", 0),
+                     ])
+    conn.commit()
+    conn.close()
+
+
+def test_upgrade_baseline_database(tmp_path):
+    path = str(tmp_path / "artists.db")
+    make_baseline(path)
+
+    db = DatabaseManager(path)
+    try:
+        assert db.cursor.execute("PRAGMA user_version").fetchone()[0] == len(SCHEMA_MIGRATIONS) == 5
+        # 旧字段按文件名推断位置，保留空位置
+        assert db.cursor.execute("SELECT image_paths FROM artists ORDER BY id").fetchall() == [
+            ("a1-1.png;;a1-3.png",), (";b2-2.jpg",), ("",)]
+        assert db.cursor.execute("SELECT a.row_id, i.slot, i.path FROM artist_images i "
+                                 "JOIN artists a ON a.id = i.artist_id ORDER BY a.id, i.slot").fetchall() == [
+            ("r1", 1, "a1-1.png"), ("r1", 3, "a1-3.png"), ("r2", 2, "b2-2.jpg")]
+        # 排序列的NULL统一为空串
+        assert db.cursor.execute("SELECT notes, introduction, marked FROM artists WHERE row_id='r2'").fetchone() \
+            == ("备注", "", 0)
+        tables = {row[0] for row in db.cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        assert {"artist_images", "image_transactions", "image_metadata"} <= tables
+        assert db.search_artist_ids("乙") == [2]
+        assert [row[2] for row in db.get_artists_by_image("a1-3.png")] == ["a1"]
+    finally:
+        db.conn.close()
+
+    # 再次打开不会重复迁移
+    db = DatabaseManager(path)
+    try:
+        assert db.cursor.execute("SELECT COUNT(*) FROM artist_images").fetchone()[0] == 3
+    finally:
+        db.conn.close()
+
+
+def test_failed_migration_rolls_back_everything(tmp_path, monkeypatch):
+    path = str(tmp_path / "artists.db")
+    make_baseline(path)
+
+    def broken(cursor):
+        cursor.execute("CREATE TABLE half_done (x)")
+        raise sqlite3.OperationalError("boom")
+
+    monkeypatch.setattr(db_module, "SCHEMA_MIGRATIONS", SCHEMA_MIGRATIONS + (broken,))
+    with pytest.raises(sqlite3.OperationalError):
+        DatabaseManager(path)
+
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name IN ('half_done', 'artist_images')").fetchall() \
+            == []
+        assert conn.execute("SELECT image_paths FROM artists WHERE row_id='r1'").fetchone() == ("a1-1.png;a1-3.png",)
+    finally:
+        conn.close()
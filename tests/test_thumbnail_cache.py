@@ -0,0 +1,41 @@
+from artist_manager.thumbs import ThumbnailCache
+
+
+def make_source(tmp_path, name="a-1.png", data=b"source"):
+    src = tmp_path / "images" / name
+    src.parent.mkdir(exist_ok=True)
+    src.write_bytes(data)
+    return str(src)
+
+
+def store(cache, src):
+    name = cache.name_for(src)
+    assert cache.store_thumbnail(src, name, {level: b"thumb%d" % level for level in cache.levels})
+    return name
+
+
+def test_validate_keeps_thumbnails_written_by_another_process(tmp_path):
+    thumb_dir = str(tmp_path / "thumbs")
+    gui = ThumbnailCache(thumb_dir, 1 << 20)
+    cli = ThumbnailCache(thumb_dir, 1 << 20)
+    src = make_source(tmp_path)
+    name = store(cli, src)
+
+    # 界面启动时载入的索引中没有这张缩略图
+    assert gui.validate() == []
+    assert cli.read(name) == b"thumb300"
+    assert gui.lookup(src) == name
+    assert gui.read(name, 80) == b"thumb80"
+
+
+def test_validate_removes_stale_entries_and_orphans(tmp_path):
+    thumb_dir = tmp_path / "thumbs"
+    cache = ThumbnailCache(str(thumb_dir), 1 << 20)
+    src = make_source(tmp_path)
+    name = store(cache, src)
+    (thumb_dir / "orphan@80.png").write_bytes(b"x")
+
+    make_source(tmp_path, data=b"changed content")
+    assert cache.validate() == [cache._normalize(src)]
+    assert cache.read(name) is None
+    assert not (thumb_dir / "orphan@80.png").exists()
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+
+from conftest import ROOT_DIR
+from artist_manager.thumbs import PackThumbnailStore
+
+WRITER = """
+import sys
+from artist_manager.thumbs import PackThumbnailStore
+store = PackThumbnailStore(sys.argv[1])
+prefix = sys.argv[2]
+for i in range(300):
+    store.write(f"{prefix}-{i}", (prefix * (i % 50 + 1)).encode())
+    if i % 3 == 0:
+        store.delete(f"{prefix}-{i}")
+    if i % 100 == 99:
+        store.compact()
+store.close()
+"""
+
+
+def test_concurrent_writers_share_one_pack(tmp_path):
+    path = str(tmp_path / "thumbs.pack")
+    writers = [subprocess.Popen([sys.executable, "-c", WRITER, path, prefix], cwd=ROOT_DIR)
+               for prefix in ("a", "b", "c")]
+    assert [p.wait(timeout=120) for p in writers] == [0, 0, 0]
+
+    store = PackThumbnailStore(path)
+    try:
+        expected = {f"{prefix}-{i}": (prefix * (i % 50 + 1)).encode()
+                    for prefix in ("a", "b", "c") for i in range(300) if i % 3}
+        assert store.names() == set(expected)
+        for name, data in expected.items():
+            assert store.read(name) == data
+    finally:
+        store.close()
+
+
+def test_reads_records_appended_by_another_instance(tmp_path):
+    path = str(tmp_path / "thumbs.pack")
+    first = PackThumbnailStore(path)
+    second = PackThumbnailStore(path)
+    try:
+        first.write("x", b"one")
+        assert second.read("x") == b"one"
+        second.write("y", b"two")
+        first.compact()
+        # 另一个实例已替换文件，写入前重新打开，不会写进旧文件
+        second.write("z", b"three")
+        assert first.read("z") == b"three"
+        assert first.read("y") == b"two"
+    finally:
+        first.close()
+        second.close()
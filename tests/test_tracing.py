@@ -0,0 +1,18 @@
+from artist_manager.tracing import MAX_SAMPLES, Tracer
+
+
+def test_summary_is_exact_while_samples_stay_bounded(tmp_path):
+    tracer = Tracer(str(tmp_path / "trace.json"))
+    count = MAX_SAMPLES * 3
+    for i in range(count):
+        tracer.record("op", "test", 0.0, (i + 1) / 1000)
+
+    stats = tracer.durations["op"]
+    assert len(stats.samples) == MAX_SAMPLES
+    summary = tracer.summary()["op"]
+    assert summary["count"] == count
+    assert abs(summary["total_ms"] - count * (count + 1) / 2) < 1e-3 * count
+    assert abs(summary["max_ms"] - count) < 1e-6
+    assert sum(summary["histogram"]) == count
+    # 样本是均匀抽取的，中位数接近真实值
+    assert abs(summary["p50_ms"] - count / 2) < count * 0.1